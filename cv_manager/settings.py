@@ -1,6 +1,7 @@
 """
 Django settings for CV Manager project.
 """
+import json
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -73,17 +74,196 @@ WHATSAPP_VERIFY_TOKEN = os.getenv('WHATSAPP_VERIFY_TOKEN', 'your-verify-token')
 WHATSAPP_ACCESS_TOKEN = os.getenv('WHATSAPP_ACCESS_TOKEN')
 WHATSAPP_PHONE_NUMBER_ID = os.getenv('WHATSAPP_PHONE_NUMBER_ID')
 
+# Media downloads are streamed into memory and spill to MEDIA_TEMP_DIR only
+# above MEDIA_SPILL_THRESHOLD bytes; larger than WHATSAPP_MEDIA_MAX_BYTES is rejected
+WHATSAPP_MEDIA_MAX_BYTES = int(os.getenv('WHATSAPP_MEDIA_MAX_BYTES', str(10 * 1024 * 1024)))
+MEDIA_SPILL_THRESHOLD = int(os.getenv('MEDIA_SPILL_THRESHOLD', str(2 * 1024 * 1024)))
+MEDIA_TEMP_DIR = os.getenv('MEDIA_TEMP_DIR', str(MEDIA_ROOT / 'temp'))
+
+# Total size quota for spilled media and the age after which leftover files are deleted
+MEDIA_SPOOL_MAX_BYTES = int(os.getenv('MEDIA_SPOOL_MAX_BYTES', str(500 * 1024 * 1024)))
+MEDIA_SPOOL_MAX_AGE = int(os.getenv('MEDIA_SPOOL_MAX_AGE', '3600'))
+
+# Outgoing messages are queued durably and sent in the background, throttled
+# per sending phone number (shared by every process using the same database)
+# and retried on 429/5xx
+WHATSAPP_OUTBOUND_QUEUE = os.getenv('WHATSAPP_OUTBOUND_QUEUE', 'True') == 'True'
+WHATSAPP_OUTBOUND_DB_PATH = os.getenv('WHATSAPP_OUTBOUND_DB_PATH', str(MEDIA_ROOT / 'queue' / 'outbound.sqlite3'))
+WHATSAPP_SEND_RATE_PER_SECOND = float(os.getenv('WHATSAPP_SEND_RATE_PER_SECOND', '20'))
+WHATSAPP_SEND_BURST = int(os.getenv('WHATSAPP_SEND_BURST', '20'))
+WHATSAPP_SEND_WORKERS = int(os.getenv('WHATSAPP_SEND_WORKERS', '4'))
+WHATSAPP_SEND_MAX_ATTEMPTS = int(os.getenv('WHATSAPP_SEND_MAX_ATTEMPTS', '8'))
+
+# Outbound HTTP (Graph API, Adobe): pooled keep-alive sessions with retries
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '10'))
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '20'))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '30'))
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '3'))
+HTTP_BACKOFF_BASE = float(os.getenv('HTTP_BACKOFF_BASE', '0.5'))
+HTTP_BACKOFF_MAX = float(os.getenv('HTTP_BACKOFF_MAX', '30'))
+
 # Gemini API Configuration
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+GEMINI_MODEL_NAME = os.getenv('GEMINI_MODEL_NAME', 'gemini-2.5-flash')
+# JSON object passed to GenerativeModel, e.g. {"temperature": 0, "max_output_tokens": 512}
+GEMINI_GENERATION_CONFIG = json.loads(os.getenv('GEMINI_GENERATION_CONFIG', '{}'))
+# Ask Gemini for JSON matching the field schema (JSON mode needs a
+# google-generativeai release that supports response_mime_type; older ones
+# rely on the prompt). Replies are always repaired and validated locally
+GEMINI_STRUCTURED_OUTPUT = os.getenv('GEMINI_STRUCTURED_OUTPUT', 'True') == 'True'
+
+# Local regex/heuristic extraction before Gemini; fields scoring at least the
+# threshold are accepted locally and only the rest are sent to Gemini
+CV_LOCAL_EXTRACTION_ENABLED = os.getenv('CV_LOCAL_EXTRACTION_ENABLED', 'True') == 'True'
+CV_LOCAL_EXTRACTION_THRESHOLD = float(os.getenv('CV_LOCAL_EXTRACTION_THRESHOLD', '0.85'))
+
+# Estimated token budget for CV text in the Gemini prompt (0 disables trimming)
+GEMINI_INPUT_TOKEN_BUDGET = int(os.getenv('GEMINI_INPUT_TOKEN_BUDGET', '3000'))
+
+# Gemini quota, shared by every worker process through GEMINI_QUOTA_DB_PATH.
+# Calls that would wait longer than GEMINI_RATE_LIMIT_MAX_WAIT seconds are
+# rescheduled on the job queue.
+GEMINI_QUOTA_DB_PATH = os.getenv('GEMINI_QUOTA_DB_PATH', str(MEDIA_ROOT / 'queue' / 'gemini_quota.sqlite3'))
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv('GEMINI_REQUESTS_PER_MINUTE', '10'))
+GEMINI_TOKENS_PER_MINUTE = int(os.getenv('GEMINI_TOKENS_PER_MINUTE', '250000'))
+GEMINI_REQUESTS_PER_DAY = int(os.getenv('GEMINI_REQUESTS_PER_DAY', '1500'))
+GEMINI_RATE_LIMIT_MAX_WAIT = float(os.getenv('GEMINI_RATE_LIMIT_MAX_WAIT', '20'))
+
+# Deadline per Gemini extraction (seconds). Optionally a second (hedged)
+# request starts once the first is slower than GEMINI_HEDGE_PERCENTILE of recent
+# calls, capped at GEMINI_HEDGE_MEDIAN_MULTIPLE times the median so a heavy tail
+# cannot pull the threshold into itself (0 disables the cap); hedges only use
+# free quota and at most GEMINI_HEDGE_MAX_RATIO of calls
+GEMINI_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', '60'))
+# Blocking calls in flight per process; extractions are deferred when all are busy
+GEMINI_CALL_THREADS = int(os.getenv('GEMINI_CALL_THREADS', '16'))
+GEMINI_HEDGE_ENABLED = os.getenv('GEMINI_HEDGE_ENABLED', 'False') == 'True'
+GEMINI_HEDGE_PERCENTILE = float(os.getenv('GEMINI_HEDGE_PERCENTILE', '90'))
+GEMINI_HEDGE_MEDIAN_MULTIPLE = float(os.getenv('GEMINI_HEDGE_MEDIAN_MULTIPLE', '3'))
+GEMINI_HEDGE_MIN_SAMPLES = int(os.getenv('GEMINI_HEDGE_MIN_SAMPLES', '20'))
+GEMINI_HEDGE_MAX_RATIO = float(os.getenv('GEMINI_HEDGE_MAX_RATIO', '0.1'))
+
+# Cache of Gemini extraction results keyed by CV text hash
+GEMINI_CACHE_DB_PATH = os.getenv('GEMINI_CACHE_DB_PATH', str(MEDIA_ROOT / 'cache' / 'gemini.sqlite3'))
+GEMINI_CACHE_MEMORY_ENTRIES = int(os.getenv('GEMINI_CACHE_MEMORY_ENTRIES', '512'))
+GEMINI_CACHE_MAX_BYTES = int(os.getenv('GEMINI_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+GEMINI_CACHE_MAX_AGE_SECONDS = int(os.getenv('GEMINI_CACHE_MAX_AGE_SECONDS', str(30 * 24 * 3600)))
 
 # Adobe PDF Services Configuration
 ADOBE_CLIENT_ID = os.getenv('ADOBE_CLIENT_ID')
 ADOBE_CLIENT_SECRET = os.getenv('ADOBE_CLIENT_SECRET')
+# The IMS access token is cached per process and refreshed this many seconds before it expires
+ADOBE_TOKEN_REFRESH_MARGIN = int(os.getenv('ADOBE_TOKEN_REFRESH_MARGIN', '300'))
+
+# PDF extraction engines in fallback order (see webhook/services/pdf_engines.py);
+# unavailable engines are skipped, e.g. 'adobe' without credentials
+PDF_ENGINES = [
+    name.strip() for name in os.getenv('PDF_ENGINES', 'adobe,pypdf2').split(',') if name.strip()
+]
+
+# PDF parsing runs in a pool of worker processes with hard per-document limits;
+# a worker is replaced after PDF_WORKER_MAX_TASKS documents
+PDF_POOL_ENABLED = os.getenv('PDF_POOL_ENABLED', 'True') == 'True'
+PDF_POOL_WORKERS = int(os.getenv('PDF_POOL_WORKERS', str(os.cpu_count() or 1)))
+PDF_EXTRACTION_TIMEOUT = float(os.getenv('PDF_EXTRACTION_TIMEOUT', '30'))
+PDF_WORKER_MEMORY_MB = int(os.getenv('PDF_WORKER_MEMORY_MB', '512'))
+PDF_WORKER_MAX_TASKS = int(os.getenv('PDF_WORKER_MAX_TASKS', '50'))
+PDF_POOL_START_METHOD = os.getenv('PDF_POOL_START_METHOD', 'spawn')
+
+# Stop reading PDF pages once these fields are found locally, or when a page
+# or character budget is reached (0 for no limit); later pages are not parsed.
+# The contact fields sit on the first page of nearly every CV; add linkedin or
+# skills to keep reading until those are found too (fields missing from the list
+# are only extracted from the pages read)
+PDF_EARLY_STOP_FIELDS = [
+    field.strip() for field in os.getenv('PDF_EARLY_STOP_FIELDS', 'name,email,phone').split(',')
+    if field.strip()
+]
+PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', '10'))
+PDF_MAX_CHARS = int(os.getenv('PDF_MAX_CHARS', '40000'))
 
 # Google Sheets Configuration
 GOOGLE_SHEETS_CREDENTIALS_PATH = os.getenv('GOOGLE_SHEETS_CREDENTIALS_PATH', 'credentials.json')
 GOOGLE_SHEET_ID = os.getenv('GOOGLE_SHEET_ID')
 
+# Retry delay after a failed Sheets connection attempt
+SHEETS_INIT_RETRY_SECONDS = int(os.getenv('SHEETS_INIT_RETRY_SECONDS', '30'))
+
+# Write-behind batching of Sheets appends (rows are buffered durably in SQLite)
+SHEETS_BATCH_WRITES = os.getenv('SHEETS_BATCH_WRITES', 'True') == 'True'
+SHEETS_BUFFER_DB_PATH = os.getenv('SHEETS_BUFFER_DB_PATH', str(MEDIA_ROOT / 'queue' / 'sheets_buffer.sqlite3'))
+SHEETS_FLUSH_MAX_ROWS = int(os.getenv('SHEETS_FLUSH_MAX_ROWS', '20'))
+SHEETS_FLUSH_MAX_DELAY = float(os.getenv('SHEETS_FLUSH_MAX_DELAY', '5'))
+# Reload the email/phone -> row index after this many seconds to pick up rows written
+# by other workers and manual edits (unknown candidates are appended without a read;
+# rows about to be updated are read back and a mismatch forces a reload)
+SHEETS_INDEX_REFRESH_SECONDS = int(os.getenv('SHEETS_INDEX_REFRESH_SECONDS', '300'))
+
+# Startup
+# Background threads (service warm-up, job workers, async runner, outbound
+# sender) start in server processes only, never in management commands:
+# 'auto' detects gunicorn/uvicorn/daphne/hypercorn and runserver, 'True' or
+# 'False' force it (e.g. for other servers)
+BACKGROUND_SERVICES = os.getenv('BACKGROUND_SERVICES', 'auto')
+# Connect to Gemini/Sheets in a background thread when the server starts;
+# /webhook/ready/ reports when they are done
+SERVICES_BACKGROUND_INIT = os.getenv('SERVICES_BACKGROUND_INIT', 'True') == 'True'
+# Files shared by worker processes to skip repeated startup work
+STARTUP_CACHE_DIR = os.getenv('STARTUP_CACHE_DIR', str(MEDIA_ROOT / 'cache'))
+
+# Background processing
+# When enabled the webhook acknowledges Meta immediately and CVs are processed
+# by a pool of worker threads
+WEBHOOK_BACKGROUND_PROCESSING = os.getenv('WEBHOOK_BACKGROUND_PROCESSING', 'False') == 'True'
+WEBHOOK_WORKER_COUNT = int(os.getenv('WEBHOOK_WORKER_COUNT', '4'))
+WEBHOOK_QUEUE_MAX_SIZE = int(os.getenv('WEBHOOK_QUEUE_MAX_SIZE', '1000'))
+# Maximum senders of one webhook batch processed concurrently in synchronous mode
+WEBHOOK_BATCH_CONCURRENCY = int(os.getenv('WEBHOOK_BATCH_CONCURRENCY', '8'))
+# 'thread' runs workers inside the web process, 'external' leaves jobs to
+# `python manage.py run_cv_workers`
+WEBHOOK_WORKER_MODE = os.getenv('WEBHOOK_WORKER_MODE', 'thread')
+
+# Async webhook (webhook/async_views.py); only enable when served by an ASGI
+# server, e.g. `make run-asgi`. Messages are always persisted in the job queue
+# before they are acknowledged; in 'thread' worker mode the server runs them
+# as asyncio tasks, at most ASYNC_MAX_IN_FLIGHT at once (blocking steps use the
+# CPU/IO thread pools), in 'external' mode run_cv_workers does
+WEBHOOK_ASYNC = os.getenv('WEBHOOK_ASYNC', 'False') == 'True'
+ASYNC_MAX_IN_FLIGHT = int(os.getenv('ASYNC_MAX_IN_FLIGHT', '200'))
+ASYNC_CPU_THREADS = int(os.getenv('ASYNC_CPU_THREADS', str(os.cpu_count() or 2)))
+ASYNC_IO_THREADS = int(os.getenv('ASYNC_IO_THREADS', '32'))
+ASYNC_HTTP_MAX_CONNECTIONS = int(os.getenv('ASYNC_HTTP_MAX_CONNECTIONS', '100'))
+
+# Per-sender coalescing: text/PDF messages from one sender are buffered until
+# COALESCE_QUIET_SECONDS pass without a new one (at most COALESCE_MAX_WINDOW_SECONDS)
+# and processed as one CV. Buffered messages are delayed jobs in the job queue,
+# so they survive restarts and are run by the job workers (run_cv_workers in
+# 'external' worker mode) even without WEBHOOK_BACKGROUND_PROCESSING
+COALESCE_ENABLED = os.getenv('COALESCE_ENABLED', 'False') == 'True'
+COALESCE_QUIET_SECONDS = float(os.getenv('COALESCE_QUIET_SECONDS', '10'))
+COALESCE_MAX_WINDOW_SECONDS = float(os.getenv('COALESCE_MAX_WINDOW_SECONDS', '60'))
+COALESCE_MAX_PARTS = int(os.getenv('COALESCE_MAX_PARTS', '20'))
+COALESCE_MAX_CHARS = int(os.getenv('COALESCE_MAX_CHARS', '50000'))
+
+# Durable job queue (SQLite in WAL mode)
+JOB_QUEUE_DB_PATH = os.getenv('JOB_QUEUE_DB_PATH', str(MEDIA_ROOT / 'queue' / 'jobs.sqlite3'))
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', '300'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '5'))
+JOB_RETRY_BASE_DELAY = int(os.getenv('JOB_RETRY_BASE_DELAY', '30'))
+
+# Redelivery dedup keyed on WhatsApp message id
+DEDUP_DB_PATH = os.getenv('DEDUP_DB_PATH', str(MEDIA_ROOT / 'queue' / 'dedup.sqlite3'))
+DEDUP_TTL_SECONDS = int(os.getenv('DEDUP_TTL_SECONDS', '86400'))
+DEDUP_MEMORY_ENTRIES = int(os.getenv('DEDUP_MEMORY_ENTRIES', '10000'))
+
+# Content-addressed store of received PDFs (SHA-256 -> extracted text and result)
+# so re-forwarded copies skip download, parsing and Gemini
+DOCUMENT_STORE_ENABLED = os.getenv('DOCUMENT_STORE_ENABLED', 'True') == 'True'
+DOCUMENT_STORE_DB_PATH = os.getenv('DOCUMENT_STORE_DB_PATH', str(MEDIA_ROOT / 'cache' / 'documents.sqlite3'))
+DOCUMENT_STORE_MAX_ENTRIES = int(os.getenv('DOCUMENT_STORE_MAX_ENTRIES', '5000'))
+DOCUMENT_STORE_MAX_BYTES = int(os.getenv('DOCUMENT_STORE_MAX_BYTES', str(100 * 1024 * 1024)))
+
 # CSRF exemption for webhook endpoints
 CSRF_TRUSTED_ORIGINS = os.getenv('CSRF_TRUSTED_ORIGINS', 'https://*.onrender.com').split(',')
 
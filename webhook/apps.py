@@ -1,6 +1,42 @@
+import os
+import sys
 from django.apps import AppConfig
+from django.conf import settings
+
+# Programs that serve the web application
+SERVER_PROGRAMS = ('gunicorn', 'uvicorn', 'daphne', 'hypercorn')
+
+
+def is_server_process():
+    """
+    Whether this process serves requests (not a management command)
+
+    Returns:
+        bool: Decided by BACKGROUND_SERVICES, or detected from the command line
+            when it is 'auto'
+    """
+    if settings.BACKGROUND_SERVICES != 'auto':
+        return settings.BACKGROUND_SERVICES == 'True'
+
+    program = os.path.abspath(sys.argv[0]) if sys.argv and sys.argv[0] else ''
+    # `python -m uvicorn` runs uvicorn/__main__.py
+    names = (os.path.basename(program), os.path.basename(os.path.dirname(program)))
+    if any(name.startswith(SERVER_PROGRAMS) for name in names):
+        return True
+
+    # runserver serves from the autoreloader's child process
+    if sys.argv[1:2] == ['runserver']:
+        return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
+    return False
 
 
 class WebhookConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'webhook'
+
+    def ready(self):
+        # Job workers and the outbound sender belong to server processes;
+        # commands such as run_cv_workers start their own
+        if is_server_process():
+            from .views import start_background_services
+            start_background_services()
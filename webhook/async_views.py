@@ -0,0 +1,157 @@
+"""
+Async WhatsApp Webhook Views
+ASGI counterpart of views.py: the webhook persists each message in the job
+store and acknowledges Meta immediately, then an AsyncJobRunner runs the
+pipeline stages of views.run_stages as asyncio tasks, so one process keeps
+hundreds of CVs in flight. Network calls (Graph API, Gemini) are awaited
+natively; PDF parsing and blocking libraries (SQLite, gspread) run in
+thread pools
+"""
+import asyncio
+import functools
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.conf import settings
+from . import views
+from .views import whatsapp_service, gemini_service, message_deduplicator, extract_batch, forget_messages
+from .services.job_queue import AsyncJobRunner
+from .services.async_http_client import get_async_http_client
+
+logger = logging.getLogger(__name__)
+
+# PDF extraction (waiting on the process pool) and other CPU-bound steps
+cpu_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_CPU_THREADS,
+    thread_name_prefix='cv-async-cpu'
+)
+# Blocking I/O libraries without async support (SQLite, gspread)
+io_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_IO_THREADS,
+    thread_name_prefix='cv-async-io'
+)
+
+
+async def _offload(executor, fn, *args, **kwargs):
+    """Run a blocking call in a thread pool"""
+    return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+
+
+class AsyncPipelineIO(views.PipelineIO):
+    """Pipeline I/O for the event loop: network calls are awaited, blocking work runs in thread pools"""
+
+    async def call(self, fn, *args, **kwargs):
+        return await _offload(io_executor, fn, *args, **kwargs)
+
+    async def cpu(self, fn, *args, **kwargs):
+        return await _offload(cpu_executor, fn, *args, **kwargs)
+
+    async def get_media_info(self, media_id):
+        return await whatsapp_service.get_media_info_async(media_id)
+
+    async def download_media(self, media_id, media_info):
+        return await whatsapp_service.download_media_async(media_id, media_info)
+
+    async def extract_cv_data(self, cv_text):
+        return await gemini_service.extract_cv_data_async(cv_text, io_executor)
+
+    async def send(self, to_number, message):
+        """Queue a message on the outbound queue, or send it directly when disabled"""
+        if whatsapp_service.outbound:
+            return await self.call(whatsapp_service.queue_message, to_number, message)
+        return await whatsapp_service.send_message_async(to_number, message)
+
+
+pipeline_io = AsyncPipelineIO()
+
+
+async def run_pipeline(message, value, state=None, checkpoint=None):
+    """Async CV pipeline: the stages of views.run_pipeline with non-blocking I/O"""
+    await views.run_stages(message, state, checkpoint, pipeline_io)
+
+
+# Runs queued jobs on its own event loop thread, at most ASYNC_MAX_IN_FLIGHT at once
+runner = AsyncJobRunner(
+    views.job_queue,
+    run_pipeline,
+    max_in_flight=settings.ASYNC_MAX_IN_FLIGHT,
+    executor=io_executor
+)
+
+
+@csrf_exempt
+async def whatsapp_webhook(request):
+    """
+    Handle WhatsApp webhook verification and incoming messages
+    """
+    if request.method == 'GET':
+        # Webhook verification
+        return views.verify_webhook(request)
+    elif request.method == 'POST':
+        # Handle incoming messages
+        return await handle_incoming_message(request)
+
+    return HttpResponse(status=405)
+
+
+async def handle_incoming_message(request):
+    """
+    Persist incoming WhatsApp messages and acknowledge them
+    """
+    try:
+        body = json.loads(request.body.decode('utf-8'))
+        logger.info(f'Received webhook: {json.dumps(body, indent=2)}')
+
+        batch, status = extract_batch(body)
+        if not batch:
+            return JsonResponse({'status': status})
+
+        # Skip redeliveries of messages we already accepted
+        duplicates = await _offload(
+            io_executor,
+            lambda: [message_deduplicator.is_duplicate(message.get('id')) for message, _ in batch]
+        )
+        batch = [item for item, duplicate in zip(batch, duplicates) if not duplicate]
+
+        if not batch:
+            logger.info('Ignoring duplicate webhook delivery')
+            return JsonResponse({'status': 'duplicate'})
+
+        # Accepted messages are durable before Meta gets its 200 (text/PDF
+        # fragments wait there until the sender goes quiet)
+        for index, (message, value) in enumerate(batch):
+            try:
+                queued = await _offload(io_executor, views.job_queue.enqueue, message, value)
+            except Exception:
+                await _offload(io_executor, forget_messages, batch[index:])
+                raise
+            if not queued:
+                # Meta redelivers after a 503; let the unqueued messages through again
+                await _offload(io_executor, forget_messages, batch[index:])
+                return JsonResponse({'status': 'queue_full'}, status=503)
+
+        # Run them in this process unless dedicated workers (run_cv_workers) do
+        if settings.WEBHOOK_WORKER_MODE == 'thread':
+            runner.start()
+        runner.wakeup()
+        return JsonResponse({'status': 'queued'})
+
+    except Exception as e:
+        logger.error(f'Error handling webhook: {str(e)}', exc_info=True)
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+
+def get_stats():
+    """
+    Get async pipeline statistics
+
+    Returns:
+        dict: Async runner stats (started, in-flight and peak jobs; outcomes
+            are under job_queue) plus async HTTP per-host stats
+    """
+    stats = runner.get_stats()
+    stats['http'] = get_async_http_client().get_stats()
+    return stats
+
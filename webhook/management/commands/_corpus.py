@@ -0,0 +1,96 @@
+"""
+Shared helpers for the benchmark management commands
+"""
+import glob
+import os
+
+LINES_PER_PAGE = 45
+
+
+def load_corpus(corpus):
+    """
+    Read every .txt CV and extract text from every .pdf CV in a directory
+
+    Returns:
+        list: (path, cv_text) tuples
+    """
+    cvs = []
+    for path in sorted(glob.glob(os.path.join(corpus, '*.txt'))):
+        with open(path, 'r') as f:
+            cvs.append((path, f.read()))
+
+    pdf_paths = sorted(glob.glob(os.path.join(corpus, '*.pdf')))
+    if pdf_paths:
+        from webhook.services.pdf_service import PDFService
+        pdf_service = PDFService()
+        for path in pdf_paths:
+            cv_text = pdf_service.extract_text(path)
+            if cv_text:
+                cvs.append((path, cv_text))
+
+    return cvs
+
+
+def paginate(cv_text, pages):
+    """
+    Split a text CV into page lines, padded with filler pages
+
+    Args:
+        cv_text: CV text placed on the first pages
+        pages: Minimum number of pages
+
+    Returns:
+        list: Lines of each page
+    """
+    lines = cv_text.splitlines()
+    page_lines = [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+    for page in range(len(page_lines) + 1, pages + 1):
+        page_lines.append(['PROJECTS'] + [
+            f'- Delivered project milestone {page}.{index} on time and within budget'
+            for index in range(LINES_PER_PAGE - 1)
+        ])
+    return page_lines
+
+
+def render_pdf(cv_text, pages):
+    """
+    Render a text CV as a simple multi-page PDF (see paginate)
+
+    Returns:
+        bytes: PDF document
+    """
+    page_lines = paginate(cv_text, pages)
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    kids = []
+    for text_lines in page_lines:
+        commands = ['BT /F1 10 Tf 14 TL 50 800 Td']
+        for line in text_lines:
+            escaped = line.encode('latin-1', 'replace').decode('latin-1')
+            escaped = escaped.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+            commands.append(f'({escaped}) Tj T*')
+        commands.append('ET')
+        stream = '\n'.join(commands).encode('latin-1')
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+            b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % (len(objects))
+        )
+        kids.append(len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % kid for kid in kids), len(kids)
+    )
+
+    output = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(output)
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    output += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    output += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(output)
@@ -0,0 +1,118 @@
+"""
+Management command to measure prompt compaction on a CV corpus
+"""
+import time
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from webhook.services.local_extractor import LocalExtractor, CV_FIELDS
+from webhook.services.text_compactor import compact_cv_text, estimate_tokens
+from ._corpus import load_corpus
+
+
+class Command(BaseCommand):
+    help = 'Compare raw and compacted CV text: tokens, extraction accuracy and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'corpus',
+            type=str,
+            nargs='?',
+            default='sample_cvs',
+            help='Directory with .txt (and .pdf) CVs'
+        )
+        parser.add_argument(
+            '--budget',
+            type=int,
+            default=settings.GEMINI_INPUT_TOKEN_BUDGET,
+            help='Token budget for the compacted text'
+        )
+        parser.add_argument(
+            '--pages',
+            type=int,
+            default=0,
+            help='Also test a synthetic long CV padded to this many pages'
+        )
+        parser.add_argument(
+            '--live',
+            action='store_true',
+            help='Call Gemini with raw and compacted text and compare results'
+        )
+
+    def handle(self, *args, **options):
+        cvs = load_corpus(options['corpus'])
+        if options['pages'] and cvs:
+            cvs.append(('synthetic', self._make_long_cv(cvs[0][1], options['pages'])))
+
+        if not cvs:
+            self.stdout.write(self.style.ERROR(f'No CVs found in {options["corpus"]}'))
+            return
+
+        extractor = LocalExtractor(threshold=0)
+        raw_total = 0
+        compact_total = 0
+        mismatches = 0
+
+        for path, cv_text in cvs:
+            started = time.perf_counter()
+            compacted = compact_cv_text(cv_text, CV_FIELDS, options['budget'])
+            compact_ms = (time.perf_counter() - started) * 1000
+
+            raw_tokens = estimate_tokens(cv_text)
+            compact_tokens = estimate_tokens(compacted)
+            raw_total += raw_tokens
+            compact_total += compact_tokens
+
+            # Accuracy proxy: every field found in the raw text survives compaction
+            raw_fields = extractor.extract(cv_text)
+            compact_fields = extractor.extract(compacted)
+            lost = [
+                field for field in CV_FIELDS
+                if raw_fields[field]['value'] != compact_fields[field]['value']
+            ]
+            mismatches += len(lost)
+
+            self.stdout.write(
+                f'{path}: {raw_tokens} -> {compact_tokens} tokens '
+                f'({compact_ms:.2f} ms){"  ⚠️ changed: " + ", ".join(lost) if lost else ""}'
+            )
+
+            if options['live']:
+                self._compare_live(cv_text, compacted)
+
+        self.stdout.write('\n' + '=' * 50)
+        saved = 1 - compact_total / raw_total if raw_total else 0
+        self.stdout.write(f'Input tokens: {raw_total} -> {compact_total} ({saved:.0%} saved)')
+        if mismatches:
+            self.stdout.write(self.style.WARNING(f'Fields changed by compaction: {mismatches}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No extracted field changed after compaction'))
+
+    def _compare_live(self, cv_text, compacted):
+        """Extract with Gemini from both texts (cache and local tier disabled)"""
+        from webhook.services.gemini_service import GeminiService
+
+        results = []
+        for label, text, budget in (('raw', cv_text, 0), ('compacted', compacted, 0)):
+            service = GeminiService()
+            service.local_extractor = None
+            service.input_token_budget = budget
+            service.cache.get = lambda key: None
+            started = time.perf_counter()
+            cv_data = service.extract_cv_data(text)
+            elapsed = (time.perf_counter() - started) * 1000
+            results.append(cv_data)
+            self.stdout.write(f'  {label:9} {elapsed:.0f} ms  {cv_data}')
+
+        if results[0] != results[1]:
+            self.stdout.write(self.style.WARNING('  Gemini results differ'))
+
+    def _make_long_cv(self, cv_text, pages):
+        """Pad a CV with repeated filler pages, headers and footers"""
+        parts = [cv_text]
+        for page in range(2, pages + 1):
+            filler = '\n'.join(
+                f'- Delivered project milestone {page}.{index} on time and within budget'
+                for index in range(40)
+            )
+            parts.append(f'Curriculum Vitae\n\nPROJECTS\n{filler}\n\nPage {page} of {pages}')
+        return '\n\n'.join(parts)
@@ -0,0 +1,67 @@
+"""
+Management command to measure per-call Gemini client setup overhead
+"""
+import subprocess
+import sys
+import time
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from webhook.services.gemini_service import GeminiService
+
+
+class Command(BaseCommand):
+    help = 'Compare per-call model setup with the reused per-process model handle'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=200,
+            help='Number of simulated calls'
+        )
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        try:
+            import google.generativeai as genai
+        except ImportError:
+            self.stdout.write(self.style.ERROR('❌ google-generativeai not installed'))
+            return
+
+        # The SDK import is only paid once per process (later imports hit
+        # sys.modules), so time it cold in a fresh interpreter
+        result = subprocess.run(
+            [sys.executable, '-c',
+             'import time; started = time.perf_counter(); import google.generativeai; '
+             'print(time.perf_counter() - started)'],
+            capture_output=True, text=True, check=True
+        )
+        cold_import = float(result.stdout.strip())
+
+        # Before: configure and build a model on every call
+        started = time.perf_counter()
+        for _ in range(iterations):
+            genai.configure(api_key=settings.GEMINI_API_KEY)
+            genai.GenerativeModel(settings.GEMINI_MODEL_NAME)
+        per_call_setup = (time.perf_counter() - started) / iterations
+
+        # After: one warm model handle per worker process
+        service = GeminiService()
+        started = time.perf_counter()
+        service.warm_up()
+        warm_up_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            service._get_model()
+        reused = (time.perf_counter() - started) / iterations
+
+        self.stdout.write(f'Iterations: {iterations}')
+        self.stdout.write(f'Cold SDK import (once per process): {cold_import * 1000:.3f} ms')
+        self.stdout.write(f'Per-call setup (before): {per_call_setup * 1000:.3f} ms/call')
+        self.stdout.write(f'One-time warm up (after): {warm_up_time * 1000:.3f} ms')
+        self.stdout.write(f'Reused model (after):    {reused * 1000:.4f} ms/call')
+        self.stdout.write(self.style.SUCCESS(
+            f'Saved {max(per_call_setup - reused, 0) * 1000:.3f} ms of setup per CV'
+        ))
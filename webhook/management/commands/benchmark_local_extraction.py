@@ -0,0 +1,88 @@
+"""
+Management command to benchmark the local extraction tier against a CV corpus
+"""
+import time
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from webhook.services.local_extractor import LocalExtractor, CV_FIELDS
+from webhook.services.gemini_service import build_prompt, estimate_tokens
+from ._corpus import load_corpus
+
+
+class Command(BaseCommand):
+    help = 'Measure how many Gemini calls and how much latency the local extractor saves'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'corpus',
+            type=str,
+            nargs='?',
+            default='sample_cvs',
+            help='Directory with .txt (and .pdf) CVs'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=settings.CV_LOCAL_EXTRACTION_THRESHOLD,
+            help='Confidence threshold for accepting local values'
+        )
+        parser.add_argument(
+            '--gemini-ms',
+            type=float,
+            default=2500.0,
+            help='Assumed latency of one Gemini call in milliseconds'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=100,
+            help='Local extraction runs per CV for timing'
+        )
+
+    def handle(self, *args, **options):
+        extractor = LocalExtractor(threshold=options['threshold'])
+        cvs = load_corpus(options['corpus'])
+
+        if not cvs:
+            self.stdout.write(self.style.ERROR(f'No CVs found in {options["corpus"]}'))
+            return
+
+        calls_avoided = 0
+        tokens_before = 0
+        tokens_after = 0
+        local_ms_total = 0.0
+
+        for path, cv_text in cvs:
+            started = time.perf_counter()
+            for _ in range(options['repeat']):
+                candidates = extractor.extract(cv_text)
+            local_ms = (time.perf_counter() - started) / options['repeat'] * 1000
+            local_ms_total += local_ms
+
+            resolved, unresolved = extractor.resolve(cv_text)
+            full_tokens = estimate_tokens(build_prompt(cv_text, CV_FIELDS))
+            tokens_before += full_tokens
+            if unresolved:
+                tokens_after += estimate_tokens(build_prompt(cv_text, unresolved))
+            else:
+                calls_avoided += 1
+
+            self.stdout.write(f'\n{path}  ({local_ms:.3f} ms local)')
+            for field in CV_FIELDS:
+                candidate = candidates[field]
+                marker = '✅' if field in resolved else '➡️ Gemini'
+                self.stdout.write(
+                    f"  {field:9} {candidate['confidence']:.2f}  {marker}  {candidate['value']}"
+                )
+
+        total = len(cvs)
+        saved_ms = calls_avoided * options['gemini_ms'] - local_ms_total
+        self.stdout.write('\n' + '=' * 50)
+        self.stdout.write(f'CVs: {total}')
+        self.stdout.write(f'Gemini calls avoided: {calls_avoided}/{total}')
+        self.stdout.write(f'Prompt tokens: {tokens_before} -> {tokens_after}')
+        self.stdout.write(f'Average local extraction: {local_ms_total / total:.3f} ms')
+        self.stdout.write(self.style.SUCCESS(
+            f'Estimated latency saved: {saved_ms / total:.0f} ms per CV '
+            f'(assuming {options["gemini_ms"]:.0f} ms per Gemini call)'
+        ))
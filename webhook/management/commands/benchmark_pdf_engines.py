@@ -0,0 +1,199 @@
+"""
+Management command to compare the installed PDF extraction engines
+"""
+import difflib
+import glob
+import multiprocessing
+import os
+import re
+import time
+from django.core.management.base import BaseCommand
+from webhook.services.local_extractor import LocalExtractor, CV_FIELDS
+from webhook.services.pdf_engines import ENGINES, available_engines
+from ._corpus import paginate, render_pdf
+
+MAX_COMPARED_WORDS = 5000
+
+
+def _measure_engine(name, documents, repeat):
+    """
+    Extract every document with one engine (runs in a fresh process)
+
+    Returns:
+        dict: Per-document texts, pages and median ms, plus the process peak RSS in MB
+    """
+    import resource
+    from webhook.services.pdf_service import read_pdf_pages
+
+    results = []
+    for _, data, _ in documents:
+        timings = []
+        result = {'text': '', 'pages_read': 0}
+        error = None
+        for _ in range(max(repeat, 1)):
+            started = time.perf_counter()
+            try:
+                result = read_pdf_pages(data, engine=name)
+            except Exception as e:
+                error = f'{type(e).__name__}: {str(e)}'
+                break
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        results.append({
+            'text': result['text'],
+            'pages': result['pages_read'],
+            'ms': timings[len(timings) // 2] if timings else None,
+            'error': error,
+        })
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {'documents': results, 'peak_rss_mb': peak_kb / 1024}
+
+
+def _words(text):
+    return re.findall(r'\w+', (text or '').lower())[:MAX_COMPARED_WORDS]
+
+
+class Command(BaseCommand):
+    help = 'Run every installed PDF engine over a corpus: pages/s, peak RSS and text quality'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'corpus',
+            type=str,
+            nargs='?',
+            default='sample_cvs',
+            help='Directory with .pdf CVs (.txt CVs are rendered to synthetic PDFs)'
+        )
+        parser.add_argument(
+            '--engines',
+            type=str,
+            default='',
+            help='Comma separated engines to compare (default: every installed local engine)'
+        )
+        parser.add_argument(
+            '--reference',
+            type=str,
+            default='pypdf2',
+            help='Engine whose text is the reference for PDFs without a matching .txt'
+        )
+        parser.add_argument(
+            '--pages',
+            type=int,
+            default=8,
+            help='Pad synthetic PDFs to this many pages'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Runs per document (the median is reported)'
+        )
+
+    def handle(self, *args, **options):
+        documents = self._load_documents(options['corpus'], options['pages'])
+        if not documents:
+            self.stdout.write(self.style.ERROR(f'No CVs found in {options["corpus"]}'))
+            return
+
+        names = [name.strip() for name in options['engines'].split(',') if name.strip()]
+        engines = [engine for engine in available_engines(names or None) if not engine.remote]
+        missing = sorted(set(names or ENGINES) - {engine.name for engine in engines})
+        if missing:
+            self.stdout.write(f'Skipping unavailable or remote engines: {", ".join(missing)}')
+        if not engines:
+            self.stdout.write(self.style.ERROR('No local PDF engine is installed'))
+            return
+
+        # Each engine runs in its own process so peak RSS is not shared
+        context = multiprocessing.get_context('spawn')
+        measurements = {}
+        for engine in engines:
+            with context.Pool(1) as pool:
+                measurements[engine.name] = pool.apply(
+                    _measure_engine, (engine.name, documents, options['repeat'])
+                )
+
+        reference = measurements.get(options['reference'])
+        extractor = LocalExtractor(threshold=0)
+
+        self.stdout.write(
+            f'\n{"engine":10} {"pages/s":>9} {"total ms":>9} {"peak RSS":>8} '
+            f'{"similarity":>10} {"fields":>7} {"errors":>6}'
+        )
+        for name, measurement in measurements.items():
+            pages = 0
+            total_ms = 0.0
+            similarities = []
+            fields_matched = 0
+            fields_total = 0
+            errors = 0
+
+            for index, (_, _, truth) in enumerate(documents):
+                result = measurement['documents'][index]
+                if result['error']:
+                    errors += 1
+                    continue
+                pages += result['pages']
+                total_ms += result['ms']
+
+                if truth is None and reference and not reference['documents'][index]['error']:
+                    truth = reference['documents'][index]['text']
+                if truth is None:
+                    continue
+
+                similarities.append(
+                    difflib.SequenceMatcher(None, _words(truth), _words(result['text']), autojunk=False).ratio()
+                )
+                truth_fields = extractor.extract(truth)
+                engine_fields = extractor.extract(result['text'])
+                for field in CV_FIELDS:
+                    if truth_fields[field]['value']:
+                        fields_total += 1
+                        fields_matched += truth_fields[field]['value'] == engine_fields[field]['value']
+
+            pages_per_second = pages / (total_ms / 1000) if total_ms else 0
+            similarity = f'{sum(similarities) / len(similarities):.1%}' if similarities else 'n/a'
+            fields = f'{fields_matched}/{fields_total}' if fields_total else 'n/a'
+            self.stdout.write(
+                f'{name:10} {pages_per_second:9.1f} {total_ms:9.1f} {measurement["peak_rss_mb"]:8.1f} '
+                f'{similarity:>10} {fields:>7} {errors:>6}'
+            )
+
+        for name, measurement in measurements.items():
+            for index, result in enumerate(measurement['documents']):
+                if result['error']:
+                    self.stdout.write(self.style.WARNING(f'{name} failed on {documents[index][0]}: {result["error"]}'))
+
+        self.stdout.write(
+            '\nSimilarity compares words with the matching .txt CV (or the reference engine); '
+            'fields counts CV fields the local extractor reads identically.'
+        )
+
+    def _load_documents(self, corpus, pages):
+        """
+        Collect (label, pdf bytes, ground truth text or None) tuples
+
+        Real PDFs use a .txt file with the same name as ground truth when present.
+        """
+        documents = []
+        for path in sorted(glob.glob(os.path.join(corpus, '*.pdf'))):
+            with open(path, 'rb') as f:
+                data = f.read()
+            truth = None
+            truth_path = os.path.splitext(path)[0] + '.txt'
+            if os.path.exists(truth_path):
+                with open(truth_path, 'r') as f:
+                    truth = f.read()
+            documents.append((path, data, truth))
+
+        for path in sorted(glob.glob(os.path.join(corpus, '*.txt'))):
+            if os.path.exists(os.path.splitext(path)[0] + '.pdf'):
+                continue
+            with open(path, 'r') as f:
+                cv_text = f.read()
+            # The rendered lines are the ground truth of a synthetic PDF
+            truth = '\n'.join('\n'.join(lines) for lines in paginate(cv_text, pages))
+            documents.append((f'{path} (synthetic pdf)', render_pdf(cv_text, pages), truth))
+
+        return documents
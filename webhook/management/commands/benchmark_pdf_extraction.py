@@ -0,0 +1,109 @@
+"""
+Management command to compare full and early-stop PDF extraction
+"""
+import glob
+import os
+import time
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from webhook.services.local_extractor import LocalExtractor, CV_FIELDS
+from webhook.services.pdf_service import read_pdf_pages
+from ._corpus import render_pdf
+
+
+class Command(BaseCommand):
+    help = 'Compare full and early-stop PDF text extraction: pages parsed, latency and fields found'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'corpus',
+            type=str,
+            nargs='?',
+            default='sample_cvs',
+            help='Directory with .pdf CVs (.txt CVs are rendered to synthetic PDFs)'
+        )
+        parser.add_argument(
+            '--pages',
+            type=int,
+            default=8,
+            help='Pad synthetic PDFs to this many pages'
+        )
+        parser.add_argument(
+            '--engine',
+            type=str,
+            default='pypdf2',
+            help='PDF engine to run (see benchmark_pdf_engines)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Runs per document (the median is reported)'
+        )
+
+    def handle(self, *args, **options):
+        documents = []
+        for path in sorted(glob.glob(os.path.join(options['corpus'], '*.pdf'))):
+            with open(path, 'rb') as f:
+                documents.append((path, f.read()))
+        for path in sorted(glob.glob(os.path.join(options['corpus'], '*.txt'))):
+            with open(path, 'r') as f:
+                documents.append((f'{path} (synthetic pdf)', render_pdf(f.read(), options['pages'])))
+
+        if not documents:
+            self.stdout.write(self.style.ERROR(f'No CVs found in {options["corpus"]}'))
+            return
+
+        early_options = {
+            'engine': options['engine'],
+            'max_pages': settings.PDF_MAX_PAGES,
+            'max_chars': settings.PDF_MAX_CHARS,
+            'stop_fields': tuple(settings.PDF_EARLY_STOP_FIELDS),
+            'threshold': settings.CV_LOCAL_EXTRACTION_THRESHOLD,
+        }
+        extractor = LocalExtractor(threshold=0)
+        full_total = 0
+        early_total = 0
+        changed = 0
+
+        for path, data in documents:
+            full_ms, full = self._time(data, {'engine': options['engine']}, options['repeat'])
+            early_ms, early = self._time(data, early_options, options['repeat'])
+            full_total += full_ms
+            early_total += early_ms
+
+            # Accuracy proxy: the local extractor finds the same fields in both texts
+            full_fields = extractor.extract(full['text'])
+            early_fields = extractor.extract(early['text'])
+            lost = [
+                field for field in CV_FIELDS
+                if full_fields[field]['value'] != early_fields[field]['value']
+            ]
+            changed += len(lost)
+
+            self.stdout.write(
+                f'{path}: full {full["pages_read"]} pages {full_ms:.1f} ms, '
+                f'early-stop {early["pages_read"]} pages {early_ms:.1f} ms '
+                f'(stopped: {early["stopped"] or "end"})'
+                f'{"  ⚠️ changed: " + ", ".join(lost) if lost else ""}'
+            )
+
+        self.stdout.write('\n' + '=' * 50)
+        speedup = full_total / early_total if early_total else 0
+        self.stdout.write(f'Total: full {full_total:.1f} ms, early-stop {early_total:.1f} ms ({speedup:.1f}x)')
+        if changed:
+            self.stdout.write(self.style.WARNING(f'Fields changed by early stop: {changed}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No extracted field changed with early stop'))
+
+    def _time(self, data, extract_options, repeat):
+        """Median extraction time in ms and the last result"""
+        timings = []
+        result = None
+        for _ in range(max(repeat, 1)):
+            started = time.perf_counter()
+            result = read_pdf_pages(data, **extract_options)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return timings[len(timings) // 2], result
+
@@ -0,0 +1,101 @@
+"""
+Management command to measure worker import, boot and readiness time
+"""
+import json
+import os
+import subprocess
+import sys
+from django.core.management.base import BaseCommand
+from django.conf import settings
+
+# Runs in a fresh interpreter to mimic a new gunicorn worker
+BOOT_SCRIPT = """
+import json, os, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cv_manager.settings')
+from cv_manager.wsgi import application
+imported = time.perf_counter()
+from django.test import Client
+client = Client()
+client.get('/webhook/health/')
+first_response = time.perf_counter()
+ready = None
+failed = []
+deadline = first_response + {timeout}
+while time.perf_counter() < deadline:
+    response = client.get('/webhook/ready/')
+    if response.status_code == 200:
+        ready = time.perf_counter()
+        break
+    failed = [name for name, status in response.json()['services'].items() if status == 'failed']
+    if failed:
+        break
+    time.sleep(0.05)
+print(json.dumps({{
+    'import_ms': (imported - started) * 1000,
+    'first_response_ms': (first_response - started) * 1000,
+    'ready_ms': (ready - started) * 1000 if ready else None,
+    'failed': failed,
+}}))
+"""
+
+
+class Command(BaseCommand):
+    help = 'Measure per-worker import time, time to first response and time to readiness'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=3,
+            help='Number of simulated worker boots'
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=30.0,
+            help='Seconds to wait for /webhook/ready/'
+        )
+
+    def handle(self, *args, **options):
+        env = dict(os.environ)
+        env['ALLOWED_HOSTS'] = ','.join(settings.ALLOWED_HOSTS + ['testserver'])
+        # `python -c` is not detected as a server process, so readiness would
+        # never be reached without starting the background services explicitly
+        env['BACKGROUND_SERVICES'] = 'True'
+        script = BOOT_SCRIPT.format(timeout=options['timeout'])
+
+        results = []
+        for run in range(1, options['runs'] + 1):
+            completed = subprocess.run(
+                [sys.executable, '-c', script],
+                cwd=str(settings.BASE_DIR),
+                env=env,
+                capture_output=True,
+                text=True
+            )
+            if completed.returncode != 0:
+                self.stdout.write(self.style.ERROR(f'Run {run} failed:\n{completed.stderr[-2000:]}'))
+                return
+
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            results.append(result)
+            if result['ready_ms']:
+                ready = f'{result["ready_ms"]:.0f} ms'
+            elif result.get('failed'):
+                ready = f'failed ({", ".join(result["failed"])})'
+            else:
+                ready = 'not ready'
+            self.stdout.write(
+                f'Run {run}: import {result["import_ms"]:.0f} ms, '
+                f'first response {result["first_response_ms"]:.0f} ms, ready {ready}'
+            )
+
+        def average(key):
+            values = [result[key] for result in results if result[key] is not None]
+            return f'{sum(values) / len(values):.0f} ms' if values else 'n/a'
+
+        self.stdout.write('\n' + '=' * 50)
+        self.stdout.write(f'Average import: {average("import_ms")}')
+        self.stdout.write(f'Average first response: {average("first_response_ms")}')
+        self.stdout.write(self.style.SUCCESS(f'Average ready: {average("ready_ms")}'))
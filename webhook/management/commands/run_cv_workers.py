@@ -0,0 +1,39 @@
+"""
+Management command to run CV processing workers in a separate process
+"""
+from django.core.management.base import BaseCommand
+from django.conf import settings
+
+
+class Command(BaseCommand):
+    help = 'Process queued CV jobs from the durable job queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.WEBHOOK_WORKER_COUNT,
+            help='Number of worker threads'
+        )
+
+    def handle(self, *args, **options):
+        if settings.WEBHOOK_WORKER_MODE != 'external':
+            self.stdout.write(self.style.WARNING(
+                'WEBHOOK_WORKER_MODE is not "external"; web processes will also run workers'
+            ))
+
+        from webhook.views import job_queue, whatsapp_service
+
+        # Send replies left in the outbound queue by a previous process
+        if whatsapp_service.outbound and whatsapp_service.outbound.pending():
+            whatsapp_service.outbound.start()
+
+        job_queue.worker_count = options['workers']
+        self.stdout.write(self.style.SUCCESS(
+            f'Starting {job_queue.worker_count} CV workers on {settings.JOB_QUEUE_DB_PATH}'
+        ))
+
+        try:
+            job_queue.run_forever()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('\nStopping CV workers'))
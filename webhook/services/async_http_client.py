@@ -0,0 +1,198 @@
+"""
+Async HTTP Client
+httpx-based counterpart of HTTPClient for the ASGI pipeline: pooled
+keep-alive connections, timeouts, jittered retries on 5xx/429 (honoring
+Retry-After) and per-host latency metrics. Non-idempotent requests follow
+the same rules as HTTPClient
+"""
+import asyncio
+import contextlib
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+from django.conf import settings
+from .http_client import RETRY_STATUSES, UNPROCESSED_STATUSES, _is_idempotent, _retry_after_seconds
+from .metrics import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncHTTPClient:
+    """Pooled httpx.AsyncClient shared by the async integrations of one event loop"""
+
+    def __init__(self, max_connections=100, max_keepalive=20, connect_timeout=5.0,
+                 read_timeout=30.0, max_retries=3, backoff_base=0.5, backoff_max=30.0):
+        """
+        Args:
+            max_connections: Concurrent connections across all hosts
+            max_keepalive: Idle keep-alive connections to keep
+            connect_timeout: Seconds to establish a connection
+            read_timeout: Seconds to wait for response data
+            max_retries: Retries after the first attempt on 5xx/429/connection errors
+            backoff_base: First backoff in seconds, doubled per retry with jitter
+            backoff_max: Longest single wait, including Retry-After
+        """
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._client = None
+        self._client_loop = None
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._counters = {}
+
+    def _get_client(self):
+        """Get the httpx client for the running event loop"""
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive
+                ),
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def request(self, method, url, **kwargs):
+        """
+        Send a request, retrying transient failures
+
+        Args:
+            method: HTTP method
+            url: Target URL
+            **kwargs: Passed to httpx; idempotent overrides the method's
+                default (see HTTPClient.request)
+
+        Returns:
+            httpx.Response: Final response (callers still check the status)
+
+        Raises:
+            httpx.TransportError: When every attempt fails to connect
+        """
+        async with self._send(method, url, False, kwargs) as response:
+            return response
+
+    def stream(self, method, url, **kwargs):
+        """
+        Send a request and stream the response body (async context manager)
+
+        The body is read with response.aiter_bytes(); only the status is retried.
+        """
+        return self._send(method, url, True, kwargs)
+
+    @contextlib.asynccontextmanager
+    async def _send(self, method, url, stream, kwargs):
+        import httpx
+
+        client = self._get_client()
+        host = urlsplit(url).netloc
+        idempotent = _is_idempotent(method, kwargs.pop('idempotent', None))
+        retry_statuses = RETRY_STATUSES if idempotent else UNPROCESSED_STATUSES
+        # Failures before the request was sent are always safe to retry
+        unsent = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            request = client.build_request(method, url, **kwargs)
+            try:
+                response = await client.send(request, stream=stream)
+            except (httpx.ConnectError, httpx.TimeoutException) as e:
+                self._record(host, time.monotonic() - started, 'errors')
+                if attempt >= self.max_retries or not (idempotent or isinstance(e, unsent)):
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f'{method} {host} failed ({str(e)}), retrying in {delay:.1f}s')
+            else:
+                self._record(host, time.monotonic() - started, f'status_{response.status_code // 100}xx')
+                retry_after = _retry_after_seconds(response)
+                retry = (
+                    response.status_code in retry_statuses
+                    and attempt < self.max_retries
+                    and (retry_after is None or retry_after <= self.backoff_max)
+                )
+                if not retry:
+                    try:
+                        yield response
+                    finally:
+                        await response.aclose()
+                    return
+
+                delay = retry_after if retry_after is not None else self._backoff(attempt)
+                logger.warning(
+                    f'{method} {host} returned {response.status_code}, retrying in {delay:.1f}s'
+                )
+                await response.aclose()
+
+            self._record(host, None, 'retries')
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def get(self, url, **kwargs):
+        """Send a GET request (see request)"""
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        """Send a POST request (see request)"""
+        return await self.request('POST', url, **kwargs)
+
+    def _backoff(self, attempt):
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _record(self, host, seconds, counter):
+        """Update per-host latency and counters"""
+        with self._lock:
+            if seconds is not None:
+                self._latency.setdefault(host, LatencyTracker()).record(seconds)
+            counters = self._counters.setdefault(host, {})
+            counters[counter] = counters.get(counter, 0) + 1
+
+    def get_stats(self):
+        """
+        Get per-host latency and request counters
+
+        Returns:
+            dict: host -> counters and latency summary
+        """
+        with self._lock:
+            hosts = set(self._latency) | set(self._counters)
+            return {
+                host: {
+                    **self._counters.get(host, {}),
+                    'latency': self._latency[host].get_stats() if host in self._latency else None,
+                }
+                for host in sorted(hosts)
+            }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_async_http_client():
+    """Get the shared async HTTP client configured from settings"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = AsyncHTTPClient(
+                    max_connections=settings.ASYNC_HTTP_MAX_CONNECTIONS,
+                    max_keepalive=settings.HTTP_POOL_MAXSIZE,
+                    connect_timeout=settings.HTTP_CONNECT_TIMEOUT,
+                    read_timeout=settings.HTTP_READ_TIMEOUT,
+                    max_retries=settings.HTTP_MAX_RETRIES,
+                    backoff_base=settings.HTTP_BACKOFF_BASE,
+                    backoff_max=settings.HTTP_BACKOFF_MAX
+                )
+    return _client
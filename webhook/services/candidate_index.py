@@ -0,0 +1,130 @@
+"""
+Candidate Index
+In-memory map from normalized email and phone to the sheet row holding
+that candidate, so upserts do not need to read the whole sheet
+"""
+import re
+import threading
+import time
+
+
+def normalize_email(email):
+    """Lowercase and trim an email address"""
+    email = (email or '').strip().lower()
+    return email if '@' in email else None
+
+
+def normalize_phone(phone):
+    """Keep the last 10 digits so numbers match with or without country code"""
+    digits = re.sub(r'\D', '', phone or '')
+    return digits[-10:] if len(digits) >= 7 else None
+
+
+class CandidateIndex:
+    """Thread-safe email/phone -> row number index"""
+
+    def __init__(self, refresh_seconds=3600):
+        """
+        Args:
+            refresh_seconds: Age after which the index should be reloaded from
+                the sheet to pick up manual edits (0 to never reload)
+        """
+        self.refresh_seconds = refresh_seconds
+        self._emails = {}
+        self._phones = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def needs_load(self):
+        """Whether the index has not been loaded yet or is due for a refresh"""
+        with self._lock:
+            if self._loaded_at is None:
+                return True
+            return bool(self.refresh_seconds) and time.monotonic() - self._loaded_at > self.refresh_seconds
+
+    def invalidate(self):
+        """Force a reload on the next lookup"""
+        with self._lock:
+            self._loaded_at = None
+
+    def load(self, rows, first_row=1):
+        """
+        Rebuild the index from (email, phone) rows
+
+        Args:
+            rows: Iterable of [email, phone] lists as read from the sheet
+            first_row: Sheet row number of the first item in rows
+        """
+        emails = {}
+        phones = {}
+        for offset, values in enumerate(rows):
+            row_number = first_row + offset
+            email = normalize_email(values[0] if len(values) > 0 else None)
+            phone = normalize_phone(values[1] if len(values) > 1 else None)
+            if email:
+                emails[email] = row_number
+            if phone:
+                phones[phone] = row_number
+
+        with self._lock:
+            self._emails = emails
+            self._phones = phones
+            self._loaded_at = time.monotonic()
+
+    def lookup(self, email, phone):
+        """
+        Find the row of an existing candidate
+
+        Returns:
+            int: Row number or None
+        """
+        email = normalize_email(email)
+        phone = normalize_phone(phone)
+        with self._lock:
+            row_number = self._emails.get(email) if email else None
+            if row_number is None and phone:
+                row_number = self._phones.get(phone)
+
+            if row_number is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return row_number
+
+    def keys(self, email, phone):
+        """Normalized keys identifying a candidate"""
+        return [
+            key for key in (
+                ('email', normalize_email(email)),
+                ('phone', normalize_phone(phone)),
+            )
+            if key[1]
+        ]
+
+    def add(self, email, phone, row_number):
+        """Record the row of a newly appended or updated candidate"""
+        email = normalize_email(email)
+        phone = normalize_phone(phone)
+        with self._lock:
+            if email:
+                self._emails[email] = row_number
+            if phone:
+                self._phones[phone] = row_number
+
+    def get_stats(self):
+        """
+        Get index size and lookup counters
+
+        Returns:
+            dict: Indexed emails/phones and duplicate hits/misses
+        """
+        with self._lock:
+            return {
+                'loaded': self._loaded_at is not None,
+                'emails': len(self._emails),
+                'phones': len(self._phones),
+                'duplicate_hits': self.hits,
+                'misses': self.misses,
+            }
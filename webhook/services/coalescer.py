@@ -0,0 +1,136 @@
+"""
+Message Coalescer
+Combines the text and document messages of each sender that arrive within a
+quiet period into one message, so a CV pasted in several fragments (or text
+followed by a PDF) is extracted and stored once. The windows live in the job
+store: fragments are persisted as delayed jobs and merged when the first one
+is claimed
+"""
+import logging
+import threading
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Message type of a combined message; its 'parts' hold the original messages
+COALESCED_TYPE = 'coalesced'
+COALESCED_TYPES = ('text', 'document')
+
+
+def merge_messages(parts):
+    """
+    Combine one sender's buffered messages
+
+    Args:
+        parts: (message, value) tuples in arrival order
+
+    Returns:
+        tuple: (message, value); a single part is returned unchanged
+    """
+    if len(parts) == 1:
+        return parts[0]
+
+    first = parts[0][0]
+    message = {
+        'id': first.get('id'),
+        'from': first.get('from'),
+        'timestamp': parts[-1][0].get('timestamp'),
+        'type': COALESCED_TYPE,
+        'parts': [part for part, _ in parts],
+    }
+    return message, parts[-1][1]
+
+
+def _chars(message):
+    """Text length of a message (documents count as none)"""
+    return len(message.get('text', {}).get('body', '')) if message.get('type') == 'text' else 0
+
+
+class MessageCoalescer:
+    """Window policy for per-sender aggregation in the job store"""
+
+    def __init__(self, quiet_seconds=10.0, max_window_seconds=60.0, max_parts=20, max_chars=50000):
+        """
+        Args:
+            quiet_seconds: A window closes after this long without a new message
+            max_window_seconds: A window closes this long after its first message
+            max_parts: Messages per window before it is closed early
+            max_chars: Buffered text per window before it is closed early
+        """
+        self.quiet_seconds = quiet_seconds
+        self.max_window_seconds = max_window_seconds
+        self.max_parts = max_parts
+        self.max_chars = max_chars
+        self._lock = threading.Lock()
+        self.received = 0
+        self.flushed = 0
+        self.merged = 0
+        self.forced = 0
+
+    def accepts(self, message):
+        """Whether a message is buffered in its sender's window"""
+        return message.get('type') in COALESCED_TYPES
+
+    def deadline(self, messages, opened_at, now):
+        """
+        When a window closes after a message was added to it
+
+        Args:
+            messages: The window's messages, including the new one
+            opened_at: Arrival time of the window's first message
+            now: Arrival time of the new message
+
+        Returns:
+            float: Timestamp at which the window's jobs become runnable
+        """
+        with self._lock:
+            self.received += 1
+            if len(messages) >= self.max_parts or sum(_chars(message) for message in messages) >= self.max_chars:
+                self.forced += 1
+                return now
+        return min(now + self.quiet_seconds, opened_at + self.max_window_seconds)
+
+    def fits(self, messages, message):
+        """Whether a window's messages can absorb one more"""
+        return (len(messages) < self.max_parts and
+                sum(_chars(part) for part in messages) + _chars(message) <= self.max_chars)
+
+    def merge(self, parts):
+        """Combine a closed window's (message, value) parts into one"""
+        with self._lock:
+            self.flushed += 1
+            self.merged += len(parts) - 1
+        if len(parts) > 1:
+            logger.info(f'Coalesced {len(parts)} messages from {parts[0][0].get("from")}')
+        return merge_messages(parts)
+
+    def get_stats(self):
+        """
+        Get this process's window statistics (open windows are in the job
+        store stats)
+
+        Returns:
+            dict: Messages received, windows flushed (early ones counted as
+                forced) and messages merged into another
+        """
+        with self._lock:
+            return {
+                'received': self.received,
+                'windows_flushed': self.flushed,
+                'forced_flushes': self.forced,
+                'messages_merged': self.merged,
+                'quiet_seconds': self.quiet_seconds,
+                'max_window_seconds': self.max_window_seconds,
+            }
+
+
+def create_coalescer():
+    """Build a coalescer configured from settings, or None when disabled"""
+    if not settings.COALESCE_ENABLED:
+        return None
+    return MessageCoalescer(
+        quiet_seconds=settings.COALESCE_QUIET_SECONDS,
+        max_window_seconds=settings.COALESCE_MAX_WINDOW_SECONDS,
+        max_parts=settings.COALESCE_MAX_PARTS,
+        max_chars=settings.COALESCE_MAX_CHARS
+    )
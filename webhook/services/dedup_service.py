@@ -0,0 +1,131 @@
+"""
+Dedup Service
+Detects repeated webhook deliveries of the same WhatsApp message
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from .lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class MessageDeduplicator:
+    """Remembers processed message ids in an LRU backed by a SQLite table"""
+
+    def __init__(self, db_path, ttl_seconds=86400, max_memory_entries=10000):
+        """
+        Args:
+            db_path: Path to the SQLite database file
+            ttl_seconds: How long a message id is remembered
+            max_memory_entries: Size of the in-memory LRU in front of the table
+        """
+        self.db_path = str(db_path)
+        self.ttl_seconds = ttl_seconds
+        self._recent = LRUCache(max_entries=max_memory_entries, ttl=ttl_seconds)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._marks = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self):
+        """Get the SQLite connection for the current thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS seen_messages '
+                '(message_id TEXT PRIMARY KEY, expires_at REAL NOT NULL)'
+            )
+            self._local.conn = conn
+        return conn
+
+    def is_duplicate(self, message_id):
+        """
+        Check whether a message was already accepted and mark it as seen
+
+        Args:
+            message_id: WhatsApp message id (message['id'])
+
+        Returns:
+            bool: True if the message was seen within the TTL
+        """
+        if not message_id:
+            return False
+
+        if self._recent.get(message_id):
+            self._record(hit=True)
+            return True
+
+        now = time.time()
+        try:
+            conn = self._connection()
+            # Insert, or take over an expired row; no change means a live duplicate
+            cursor = conn.execute(
+                'INSERT INTO seen_messages (message_id, expires_at) VALUES (?, ?) '
+                'ON CONFLICT(message_id) DO UPDATE SET expires_at = excluded.expires_at '
+                'WHERE seen_messages.expires_at <= ?',
+                (message_id, now + self.ttl_seconds, now)
+            )
+            duplicate = cursor.rowcount == 0
+            self._purge_if_due(conn, now)
+        except Exception as e:
+            logger.error(f'Error checking message dedup store: {str(e)}', exc_info=True)
+            duplicate = False
+
+        self._recent.set(message_id, True)
+        self._record(hit=duplicate)
+        return duplicate
+
+    def forget(self, message_id):
+        """
+        Unmark a message so its redelivery is processed
+
+        Used when a marked message could not be accepted (e.g. the queue was
+        full), so Meta's retry of the delivery is not dropped as a duplicate.
+        """
+        if not message_id:
+            return
+
+        self._recent.pop(message_id)
+        try:
+            self._connection().execute('DELETE FROM seen_messages WHERE message_id = ?', (message_id,))
+        except Exception as e:
+            logger.error(f'Error unmarking message {message_id}: {str(e)}', exc_info=True)
+
+    def _record(self, hit):
+        """Update hit/miss counters"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _purge_if_due(self, conn, now):
+        """Delete expired ids every 1000 new messages"""
+        with self._lock:
+            self._marks += 1
+            if self._marks % 1000:
+                return
+        conn.execute('DELETE FROM seen_messages WHERE expires_at <= ?', (now,))
+
+    def get_stats(self):
+        """
+        Get dedup counters
+
+        Returns:
+            dict: hits (duplicates skipped), misses and memory tier stats
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'memory': self._recent.get_stats(),
+            }
@@ -0,0 +1,181 @@
+"""
+Document Store
+Content-addressed store mapping the SHA-256 of a received PDF to its
+extracted text and extraction result, so re-forwarded copies of the same
+file skip the download, PDF parsing and Gemini
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentStore:
+    """SQLite-backed digest -> (cv_text, cv_data) store with LRU eviction"""
+
+    def __init__(self, db_path, max_entries=5000, max_bytes=100 * 1024 * 1024):
+        """
+        Args:
+            db_path: Path to the SQLite database
+            max_entries: Maximum number of documents kept
+            max_bytes: Upper bound for the stored text and results
+        """
+        self.db_path = str(db_path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.downloads_saved = 0
+        self.bytes_saved = 0
+        self.pdf_parses_saved = 0
+        self.gemini_calls_saved = 0
+
+    def _connection(self):
+        """Get the SQLite connection for the current thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS documents ('
+                'digest TEXT PRIMARY KEY, cv_text TEXT NOT NULL, cv_data TEXT, '
+                'result_version TEXT, pdf_bytes INTEGER NOT NULL, size INTEGER NOT NULL, '
+                'created_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS documents_accessed_idx ON documents (accessed_at)'
+            )
+            self._local.conn = conn
+        return conn
+
+    def get(self, digest, result_version, downloaded=True):
+        """
+        Look up a document by content digest
+
+        Args:
+            digest: SHA-256 hex digest of the PDF bytes
+            result_version: Current extraction version; a stored result from
+                another version is not returned
+            downloaded: Whether the bytes were already downloaded (for stats)
+
+        Returns:
+            dict: cv_text and cv_data (None when no current result is stored),
+                or None when the document is unknown
+        """
+        if not digest:
+            return None
+
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                'SELECT cv_text, cv_data, result_version, pdf_bytes FROM documents WHERE digest = ?',
+                (digest,)
+            ).fetchone()
+            if row:
+                conn.execute('UPDATE documents SET accessed_at = ? WHERE digest = ?', (time.time(), digest))
+        except Exception as e:
+            logger.error(f'Error reading document store: {str(e)}', exc_info=True)
+            row = None
+
+        if not row:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        cv_text, cv_data, version, pdf_bytes = row
+        cv_data = json.loads(cv_data) if cv_data and version == result_version else None
+        with self._lock:
+            self.hits += 1
+            self.pdf_parses_saved += 1
+            self.bytes_saved += pdf_bytes
+            if not downloaded:
+                self.downloads_saved += 1
+            if cv_data is not None:
+                self.gemini_calls_saved += 1
+        return {'cv_text': cv_text, 'cv_data': cv_data}
+
+    def put_text(self, digest, cv_text, pdf_bytes):
+        """Store the extracted text of a document"""
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute(
+                'INSERT INTO documents (digest, cv_text, pdf_bytes, size, created_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (digest) DO UPDATE SET cv_text = excluded.cv_text, '
+                'size = excluded.size, accessed_at = excluded.accessed_at',
+                (digest, cv_text, pdf_bytes, len(cv_text), now, now)
+            )
+            self._evict(conn)
+        except Exception as e:
+            logger.error(f'Error writing document store: {str(e)}', exc_info=True)
+
+    def put_result(self, digest, cv_data, result_version):
+        """Attach the extraction result to a stored document"""
+        payload = json.dumps(cv_data)
+        try:
+            self._connection().execute(
+                'UPDATE documents SET cv_data = ?, result_version = ?, '
+                'size = LENGTH(cv_text) + ?, accessed_at = ? WHERE digest = ?',
+                (payload, result_version, len(payload), time.time(), digest)
+            )
+        except Exception as e:
+            logger.error(f'Error writing document store: {str(e)}', exc_info=True)
+
+    def _evict(self, conn):
+        """Drop least recently used documents until under both caps"""
+        count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM documents').fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        evicted = 0
+        rows = conn.execute('SELECT digest, size FROM documents ORDER BY accessed_at').fetchall()
+        for digest, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            conn.execute('DELETE FROM documents WHERE digest = ?', (digest,))
+            count -= 1
+            total -= size
+            evicted += 1
+
+        with self._lock:
+            self.evictions += evicted
+
+    def get_stats(self):
+        """
+        Get store statistics
+
+        Returns:
+            dict: Entries, bytes, hits/misses, evictions and the downloads,
+                PDF bytes, parses and Gemini calls saved
+        """
+        try:
+            entries, size = self._connection().execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM documents'
+            ).fetchone()
+        except Exception as e:
+            logger.error(f'Error reading document store stats: {str(e)}', exc_info=True)
+            entries, size = None, None
+
+        with self._lock:
+            return {
+                'entries': entries,
+                'bytes': size,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'downloads_saved': self.downloads_saved,
+                'pdf_bytes_saved': self.bytes_saved,
+                'pdf_parses_saved': self.pdf_parses_saved,
+                'gemini_calls_saved': self.gemini_calls_saved,
+            }
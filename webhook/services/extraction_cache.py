@@ -0,0 +1,179 @@
+"""
+Extraction Cache
+Two-tier (memory LRU + on-disk SQLite) cache for CV extraction results,
+keyed by a hash of the normalized CV text and the prompt/model version
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from .lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_cv_text(cv_text):
+    """Collapse whitespace so trivially different copies of a CV share a key"""
+    return re.sub(r'\s+', ' ', cv_text or '').strip()
+
+
+class ExtractionCache:
+    """Cache of structured CV data with size- and age-based eviction"""
+
+    def __init__(self, db_path, memory_entries=512, max_disk_bytes=50 * 1024 * 1024,
+                 max_age_seconds=30 * 24 * 3600):
+        """
+        Args:
+            db_path: Path to the SQLite database for the disk tier
+            memory_entries: Number of results kept in the memory tier
+            max_disk_bytes: Upper bound for the stored results on disk
+            max_age_seconds: Entries older than this are treated as missing
+        """
+        self.db_path = str(db_path)
+        self.max_disk_bytes = max_disk_bytes
+        self.max_age_seconds = max_age_seconds
+        self._memory = LRUCache(max_entries=memory_entries, ttl=max_age_seconds)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self.disk_evictions = 0
+
+    def _connection(self):
+        """Get the SQLite connection for the current thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS extractions ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, '
+                'created_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS extractions_accessed_idx ON extractions (accessed_at)'
+            )
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(cv_text, version):
+        """
+        Build the cache key for a CV
+
+        Args:
+            cv_text: Raw CV text
+            version: Prompt/model version string; changing it invalidates entries
+        """
+        digest = hashlib.sha256()
+        digest.update(version.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(normalize_cv_text(cv_text).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        Look up a cached extraction result
+
+        Returns:
+            dict: Cached CV data or None
+        """
+        value = self._memory.get(key)
+        if value is not None:
+            return dict(value)
+
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                'SELECT value FROM extractions WHERE key = ? AND created_at > ?',
+                (key, now - self.max_age_seconds)
+            ).fetchone()
+            if row:
+                conn.execute('UPDATE extractions SET accessed_at = ? WHERE key = ?', (now, key))
+        except Exception as e:
+            logger.error(f'Error reading extraction cache: {str(e)}', exc_info=True)
+            row = None
+
+        with self._lock:
+            if row:
+                self.disk_hits += 1
+            else:
+                self.disk_misses += 1
+
+        if not row:
+            return None
+
+        value = json.loads(row[0])
+        self._memory.set(key, value)
+        return dict(value)
+
+    def set(self, key, value):
+        """Store an extraction result in both tiers"""
+        self._memory.set(key, dict(value))
+
+        now = time.time()
+        payload = json.dumps(value)
+        try:
+            conn = self._connection()
+            conn.execute(
+                'INSERT OR REPLACE INTO extractions (key, value, size, created_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, payload, len(payload), now, now)
+            )
+            self._evict(conn, now)
+        except Exception as e:
+            logger.error(f'Error writing extraction cache: {str(e)}', exc_info=True)
+
+    def _evict(self, conn, now):
+        """Drop expired entries, then least recently used ones until under the size cap"""
+        conn.execute('DELETE FROM extractions WHERE created_at <= ?', (now - self.max_age_seconds,))
+
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM extractions').fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+
+        evicted = 0
+        rows = conn.execute('SELECT key, size FROM extractions ORDER BY accessed_at').fetchall()
+        for key, size in rows:
+            if total <= self.max_disk_bytes:
+                break
+            conn.execute('DELETE FROM extractions WHERE key = ?', (key,))
+            total -= size
+            evicted += 1
+
+        with self._lock:
+            self.disk_evictions += evicted
+
+    def get_stats(self):
+        """
+        Get cache statistics for both tiers
+
+        Returns:
+            dict: Memory tier stats and disk tier hits, misses, entries and bytes
+        """
+        try:
+            entries, size = self._connection().execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extractions'
+            ).fetchone()
+        except Exception as e:
+            logger.error(f'Error reading extraction cache stats: {str(e)}', exc_info=True)
+            entries, size = None, None
+
+        with self._lock:
+            return {
+                'memory': self._memory.get_stats(),
+                'disk': {
+                    'hits': self.disk_hits,
+                    'misses': self.disk_misses,
+                    'evictions': self.disk_evictions,
+                    'entries': entries,
+                    'bytes': size,
+                    'max_bytes': self.max_disk_bytes,
+                },
+            }
@@ -2,19 +2,230 @@
 Gemini Service
 Handles CV data extraction using Google's Gemini API
 """
+import asyncio
+import dataclasses
+import inspect
 import logging
 import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from django.conf import settings
+from .extraction_cache import ExtractionCache
+from .rate_limiter import RateLimiter, QuotaExceeded
+from .local_extractor import LocalExtractor, CV_FIELDS
+from .text_compactor import compact_cv_text, estimate_tokens
+from .metrics import LatencyTracker
+from .json_repair import parse_json_object, JSONRepairError
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever the prompt or local extractor changes so cached extractions are invalidated
+PROMPT_VERSION = '2'
+
+# Rough size of the JSON answer, used when reserving tokens per minute
+EXPECTED_OUTPUT_TOKENS = 200
+
+FIELD_DESCRIPTIONS = {
+    'name': 'name (string): Full name of the candidate',
+    'email': 'email (string): Email address',
+    'phone': 'phone (string): Phone number',
+    'linkedin': 'linkedin (string): LinkedIn profile URL',
+    'skills': 'skills (string): Comma-separated list of skills',
+}
+REQUIRED_FIELDS = ('name', 'email', 'phone')
+# Repairs the previous parser (leading markdown fence only) already handled
+LEGACY_REPAIRS = (['fence'],)
+
+PROMPT_TEMPLATE = """
+You are a CV/Resume parser. Extract the following information from the CV text below and return it in valid JSON format.
+{field_sections}
+Important:
+- Return ONLY valid JSON, no additional text
+- If a field is not found, use null
+- For phone, include country code if present
+- For skills, extract up to 10 most relevant skills
+
+CV Text:
+{cv_text}
+
+Return JSON in this exact format:
+{json_format}
+"""
+
+
+def build_prompt(cv_text, fields=CV_FIELDS):
+    """
+    Build the extraction prompt for the requested fields
+    
+    Args:
+        cv_text: CV text to embed
+        fields: Field names Gemini should extract
+    """
+    sections = ''
+    required = [FIELD_DESCRIPTIONS[field] for field in fields if field in REQUIRED_FIELDS]
+    optional = [FIELD_DESCRIPTIONS[field] for field in fields if field not in REQUIRED_FIELDS]
+    if required:
+        sections += '\nRequired fields:\n' + ''.join(f'- {line}\n' for line in required)
+    if optional:
+        sections += '\nOptional fields:\n' + ''.join(f'- {line}\n' for line in optional)
+    
+    json_format = '{\n' + ',\n'.join(f'  "{field}": "..."' for field in fields) + '\n}'
+    return PROMPT_TEMPLATE.format(
+        field_sections=sections,
+        cv_text=cv_text,
+        json_format=json_format
+    )
+
+
+def response_schema(fields):
+    """Response schema (Gemini OpenAPI subset) of the JSON answer for the requested fields"""
+    return {
+        'type': 'OBJECT',
+        'properties': {field: {'type': 'STRING', 'nullable': True} for field in fields},
+        'required': list(fields),
+    }
+
+
+def validate_cv_response(data, fields):
+    """
+    Check a parsed answer against the response schema, coercing what can be
+    
+    Lists (e.g. skills) are joined with commas and numbers become strings;
+    other values are dropped.
+    
+    Returns:
+        tuple: (dict with the requested fields, number of schema violations)
+    """
+    cv_data = {}
+    violations = 0
+    for field in fields:
+        value = data.get(field)
+        if isinstance(value, str):
+            value = value.strip() or None
+        elif value is not None:
+            violations += 1
+            if isinstance(value, list) and all(isinstance(item, (str, int, float)) for item in value):
+                value = ', '.join(str(item).strip() for item in value if str(item).strip()) or None
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = str(value)
+            else:
+                value = None
+        cv_data[field] = value
+    return cv_data, violations
+
+
+class GeminiTimeout(RuntimeError):
+    """No Gemini response arrived before the deadline"""
+
 
 class GeminiService:
     """Service for extracting structured CV data using Gemini AI"""
     
     def __init__(self):
         self.api_key = settings.GEMINI_API_KEY
+        self.model_name = settings.GEMINI_MODEL_NAME
+        self.generation_config = settings.GEMINI_GENERATION_CONFIG
+        self._model = None
+        self._model_pid = None
+        self._model_lock = threading.Lock()
+        self.cache = ExtractionCache(
+            settings.GEMINI_CACHE_DB_PATH,
+            memory_entries=settings.GEMINI_CACHE_MEMORY_ENTRIES,
+            max_disk_bytes=settings.GEMINI_CACHE_MAX_BYTES,
+            max_age_seconds=settings.GEMINI_CACHE_MAX_AGE_SECONDS
+        )
+        self.local_extractor = (
+            LocalExtractor(threshold=settings.CV_LOCAL_EXTRACTION_THRESHOLD)
+            if settings.CV_LOCAL_EXTRACTION_ENABLED else None
+        )
+        self.input_token_budget = settings.GEMINI_INPUT_TOKEN_BUDGET
+        self.tier_counts = {'local': 0, 'gemini': 0}
+        self.tokens_raw = 0
+        self.tokens_sent = 0
+        self.latency = LatencyTracker()
+        self.call_latency = LatencyTracker()
+        self._stats_lock = threading.Lock()
+        self.timeout = settings.GEMINI_TIMEOUT
+        self.call_threads = settings.GEMINI_CALL_THREADS
+        self.hedge_enabled = settings.GEMINI_HEDGE_ENABLED
+        self.hedge_percentile = settings.GEMINI_HEDGE_PERCENTILE
+        self.hedge_median_multiple = settings.GEMINI_HEDGE_MEDIAN_MULTIPLE
+        self.hedge_min_samples = settings.GEMINI_HEDGE_MIN_SAMPLES
+        self.hedge_max_ratio = settings.GEMINI_HEDGE_MAX_RATIO
+        self._call_executor = None
+        self._call_executor_pid = None
+        self._call_slots = None
+        self._timeout_support = None
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.hedges_skipped = 0
+        self.timeouts = 0
+        self.busy_rejections = 0
+        self.structured_output = settings.GEMINI_STRUCTURED_OUTPUT
+        self._structured_support = None
+        self.parse_counts = {'clean': 0, 'repaired': 0, 'failed': 0}
+        self.repair_counts = {}
+        self.schema_violations = 0
+        self.recalls_avoided = 0
+        self.rate_limiter = RateLimiter(
+            settings.GEMINI_QUOTA_DB_PATH,
+            requests_per_minute=settings.GEMINI_REQUESTS_PER_MINUTE,
+            tokens_per_minute=settings.GEMINI_TOKENS_PER_MINUTE,
+            requests_per_day=settings.GEMINI_REQUESTS_PER_DAY,
+            max_wait=settings.GEMINI_RATE_LIMIT_MAX_WAIT
+        )
+    
+    def _get_model(self):
+        """
+        Get the long-lived Gemini model for this worker process
+        
+        The SDK is imported and configured once per process; a forked worker
+        builds its own handle instead of reusing the parent's connections.
+        
+        Returns:
+            GenerativeModel: Configured model
+        """
+        pid = os.getpid()
+        if self._model is not None and self._model_pid == pid:
+            return self._model
+        
+        with self._model_lock:
+            if self._model is None or self._model_pid != pid:
+                import google.generativeai as genai
+                
+                genai.configure(api_key=self.api_key)
+                self._model = genai.GenerativeModel(
+                    self.model_name,
+                    generation_config=self.generation_config or None
+                )
+                self._model_pid = pid
+                logger.info(f'Using model: {self.model_name}')
+        
+        return self._model
+    
+    def is_ready(self):
+        """Whether the model handle for this process has been created"""
+        return self._model is not None and self._model_pid == os.getpid()
+    
+    def warm_up(self):
+        """
+        Create the model handle ahead of the first CV
         
+        Returns:
+            bool: True if the model is ready
+        """
+        try:
+            self._get_model()
+            return True
+        except ImportError:
+            logger.error('google-generativeai not installed. Install with: pip install google-generativeai')
+        except Exception as e:
+            logger.error(f'Error creating model: {str(e)}', exc_info=True)
+        return False
+    
     def extract_cv_data(self, cv_text):
         """
         Extract structured data from CV text using Gemini API
@@ -24,78 +235,477 @@ class GeminiService:
             
         Returns:
             dict: Structured CV data with keys: name, email, phone, linkedin, skills
+            
+        Raises:
+            QuotaExceeded: When the call does not fit the rate limits; the
+                caller should retry after exc.retry_after seconds
+            GeminiTimeout: When no response arrived within GEMINI_TIMEOUT
         """
+        cache_key, local_data, fields, result = self._lookup(cv_text)
+        if not fields:
+            return result
+        
+        response_text = None
         try:
-            import google.generativeai as genai
-            
-            # Configure Gemini
-            genai.configure(api_key=self.api_key)
-            
-            # Use gemini-2.5-flash (faster and higher free tier quota)
-            # Flash models have 1500 requests/day vs Pro's 50 requests/day
-            try:
-                model = genai.GenerativeModel('gemini-2.5-flash')
-                logger.info('Using model: gemini-2.5-flash')
-            except Exception as model_error:
-                logger.error(f'Error creating model: {model_error}')
+            model = self._model_or_none()
+            if model is None:
                 return None
+            prompt, tokens = self._build_request(cv_text, fields)
             
-            # Create prompt for structured extraction
-            prompt = f"""
-You are a CV/Resume parser. Extract the following information from the CV text below and return it in valid JSON format.
-
-Required fields:
-- name (string): Full name of the candidate
-- email (string): Email address
-- phone (string): Phone number
-
-Optional fields:
-- linkedin (string): LinkedIn profile URL
-- skills (string): Comma-separated list of skills
-
-Important:
-- Return ONLY valid JSON, no additional text
-- If a field is not found, use null
-- For phone, include country code if present
-- For skills, extract up to 10 most relevant skills
-
-CV Text:
-{cv_text}
-
-Return JSON in this exact format:
-{{
-  "name": "...",
-  "email": "...",
-  "phone": "...",
-  "linkedin": "...",
-  "skills": "..."
-}}
-"""
+            # Wait for (or reserve) a slot within the RPM/TPM/daily budgets
+            self.rate_limiter.acquire(tokens)
+            
+            # Generate response (hedged and bounded by the deadline)
+            response_text = self._generate(model, prompt, tokens, self._request_config(fields))
             
-            # Generate response
-            response = model.generate_content(prompt)
-            response_text = response.text.strip()
+            return self._parse_response(response_text, cache_key, local_data)
             
-            # Clean response (remove markdown code blocks if present)
-            if response_text.startswith('```'):
-                response_text = response_text.split('```')[1]
-                if response_text.startswith('json'):
-                    response_text = response_text[4:]
-                response_text = response_text.strip()
+        except Exception as e:
+            return self._handle_error(e, response_text)
+    
+    async def extract_cv_data_async(self, cv_text, executor=None):
+        """
+        Async variant of extract_cv_data for the ASGI pipeline
+        
+        The Gemini call is awaited natively; cache lookups and rate-limit
+        waits run in the given executor so they never block the event loop.
+        
+        Raises:
+            QuotaExceeded: As extract_cv_data
+            GeminiTimeout: As extract_cv_data
+        """
+        loop = asyncio.get_running_loop()
+        cache_key, local_data, fields, result = await loop.run_in_executor(executor, self._lookup, cv_text)
+        if not fields:
+            return result
+        
+        response_text = None
+        try:
+            model = self._model_or_none()
+            if model is None:
+                return None
+            prompt, tokens = self._build_request(cv_text, fields)
+            await loop.run_in_executor(executor, self.rate_limiter.acquire, tokens)
             
-            # Parse JSON
-            cv_data = json.loads(response_text)
+            response_text = await self._generate_async(model, prompt, tokens, self._request_config(fields))
             
-            logger.info(f'Extracted CV data: {cv_data}')
-            return cv_data
+            return await loop.run_in_executor(
+                executor, self._parse_response, response_text, cache_key, local_data
+            )
             
+        except Exception as e:
+            return self._handle_error(e, response_text)
+    
+    def _lookup(self, cv_text):
+        """
+        Resolve a CV from the cache or the local tier
+        
+        Returns:
+            tuple: (cache_key, local_data, fields still needed from Gemini,
+                result when no field is left)
+        """
+        cache_key = self.cache.make_key(cv_text, self.result_version())
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logger.info('Using cached CV extraction result')
+            return cache_key, {}, [], cached
+        
+        # Resolve fixed-pattern fields locally and only ask Gemini for the rest
+        local_data = {}
+        fields = list(CV_FIELDS)
+        if self.local_extractor:
+            local_data, fields = self.local_extractor.resolve(cv_text)
+            if not fields:
+                logger.info(f'All CV fields resolved locally: {local_data}')
+                self._record_tier('local')
+                cv_data = {field: local_data.get(field) for field in CV_FIELDS}
+                self.cache.set(cache_key, cv_data)
+                return cache_key, local_data, [], dict(cv_data)
+            logger.info(f'Escalating fields to Gemini: {", ".join(fields)}')
+        
+        return cache_key, local_data, fields, None
+    
+    def _model_or_none(self):
+        """Get the model, logging (and returning None for) creation errors"""
+        # Defaults to gemini-2.5-flash (faster and higher free tier quota)
+        # Flash models have 1500 requests/day vs Pro's 50 requests/day
+        try:
+            return self._get_model()
         except ImportError:
-            logger.error('google-generativeai not installed. Install with: pip install google-generativeai')
+            raise
+        except Exception as model_error:
+            logger.error(f'Error creating model: {model_error}')
             return None
-        except json.JSONDecodeError as e:
-            logger.error(f'Failed to parse Gemini response as JSON: {str(e)}')
-            logger.error(f'Response text: {response_text}')
+    
+    def _build_request(self, cv_text, fields):
+        """
+        Compact the CV to the token budget and create the prompt
+        
+        Returns:
+            tuple: (prompt, estimated tokens for the rate limiter)
+        """
+        compacted = compact_cv_text(cv_text, fields, self.input_token_budget)
+        prompt = build_prompt(compacted, fields)
+        with self._stats_lock:
+            self.tokens_raw += estimate_tokens(cv_text)
+            self.tokens_sent += estimate_tokens(compacted)
+        return prompt, estimate_tokens(prompt) + EXPECTED_OUTPUT_TOKENS
+    
+    def _get_call_executor(self):
+        """Threads running blocking Gemini calls so callers can stop waiting at the deadline"""
+        pid = os.getpid()
+        with self._model_lock:
+            if self._call_executor is None or self._call_executor_pid != pid:
+                self._call_executor = ThreadPoolExecutor(
+                    max_workers=self.call_threads,
+                    thread_name_prefix='gemini-call'
+                )
+                self._call_slots = threading.BoundedSemaphore(self.call_threads)
+                self._call_executor_pid = pid
+        return self._call_executor
+    
+    def _submit(self, model, prompt, config, timeout):
+        """
+        Start a call on a free call thread
+        
+        Calls never queue behind the executor (queue time would count against
+        the deadline), so a call is only submitted when a thread is free.
+        
+        Returns:
+            Future: The running call, or None when every call thread is busy
+        """
+        executor = self._get_call_executor()
+        slots = self._call_slots
+        if not slots.acquire(blocking=False):
             return None
+        
+        def call():
+            try:
+                return self._call(model, prompt, config, timeout)
+            finally:
+                slots.release()
+        
+        return executor.submit(call)
+    
+    def _request_options(self, model, timeout):
+        """SDK request options enforcing the timeout, when the installed SDK accepts them"""
+        if self._timeout_support is None:
+            try:
+                self._timeout_support = 'request_options' in inspect.signature(model.generate_content).parameters
+            except (TypeError, ValueError):
+                self._timeout_support = False
+            if not self._timeout_support:
+                logger.info(
+                    'Installed google-generativeai has no per-request timeout; late calls finish in the background'
+                )
+        return {'request_options': {'timeout': timeout}} if self._timeout_support else {}
+    
+    def _request_config(self, fields):
+        """
+        Per-request generation config asking for schema-conforming JSON
+        
+        Returns:
+            dict: Config merged into the model's, or None when structured
+                output is disabled or the installed SDK does not support it
+        """
+        if not self.structured_output:
+            return None
+        
+        if self._structured_support is None:
+            try:
+                from google.generativeai.types import generation_types
+                supported = {field.name for field in dataclasses.fields(generation_types.GenerationConfig)}
+            except Exception:
+                supported = set()
+            self._structured_support = supported & {'response_mime_type', 'response_schema'}
+            if 'response_mime_type' not in self._structured_support:
+                logger.info('Installed google-generativeai has no JSON mode; relying on the prompt and local repair')
+        
+        config = {}
+        if 'response_mime_type' in self._structured_support:
+            config['response_mime_type'] = 'application/json'
+        if 'response_schema' in self._structured_support:
+            config['response_schema'] = response_schema(fields)
+        return config or None
+    
+    def _call(self, model, prompt, config=None, timeout=None):
+        """One Gemini request, timed for the hedging threshold"""
+        started = time.monotonic()
+        kwargs = self._request_options(model, timeout) if timeout else {}
+        if config:
+            kwargs['generation_config'] = config
+        try:
+            response = model.generate_content(prompt, **kwargs)
+        except Exception as e:
+            raise self._timeout_error(e, started, timeout)
+        self.call_latency.record(time.monotonic() - started)
+        return response.text.strip()
+    
+    async def _call_async(self, model, prompt, config=None, timeout=None):
+        started = time.monotonic()
+        kwargs = self._request_options(model, timeout) if timeout else {}
+        if config:
+            kwargs['generation_config'] = config
+        try:
+            response = await model.generate_content_async(prompt, **kwargs)
         except Exception as e:
-            logger.error(f'Error extracting CV data with Gemini: {str(e)}', exc_info=True)
+            raise self._timeout_error(e, started, timeout)
+        self.call_latency.record(time.monotonic() - started)
+        return response.text.strip()
+    
+    def _timeout_error(self, error, started, timeout):
+        """Report an SDK error raised once the request timeout ran out as a GeminiTimeout"""
+        if timeout and time.monotonic() - started >= timeout:
+            timeout_error = GeminiTimeout(f'No Gemini response within {self.timeout:g}s')
+            timeout_error.__cause__ = error
+            return timeout_error
+        return error
+    
+    def _hedge_delay(self):
+        """
+        Seconds after which a hedged request is started, or None
+        
+        When more than (100 - GEMINI_HEDGE_PERCENTILE)% of calls are slow, the
+        percentile lands inside the slow tail and would never trigger a hedge;
+        capping it at a multiple of the median keeps the threshold below the
+        tail whatever its size.
+        """
+        if not self.hedge_enabled or self.call_latency.count < self.hedge_min_samples:
             return None
+        delay = self.call_latency.percentile(self.hedge_percentile)
+        if self.hedge_median_multiple:
+            delay = min(delay, self.hedge_median_multiple * self.call_latency.percentile(50))
+        return delay if delay < self.timeout else None
+    
+    def _start_hedge(self, tokens):
+        """
+        Whether a hedged request may start: hedges stay under
+        GEMINI_HEDGE_MAX_RATIO of requests and only use quota that is free now
+        """
+        with self._stats_lock:
+            allowed = self.hedges < self.hedge_max_ratio * self.requests
+        if allowed and self.rate_limiter.try_acquire(tokens):
+            with self._stats_lock:
+                self.hedges += 1
+            return True
+        with self._stats_lock:
+            self.hedges_skipped += 1
+        return False
+    
+    def _finish(self, started, attempts, winner, error=None):
+        """Record the outcome of a (possibly hedged) extraction"""
+        self.latency.record(time.monotonic() - started)
+        with self._stats_lock:
+            self.requests += 1
+            if attempts and winner == attempts[-1] and len(attempts) > 1:
+                self.hedge_wins += 1
+            if isinstance(error, GeminiTimeout):
+                self.timeouts += 1
+    
+    def _generate(self, model, prompt, tokens, config=None):
+        """
+        Run the request with a deadline, hedging it when it is slow
+        
+        The SDK enforces the remaining time as a per-request timeout when it
+        supports one; otherwise a late request finishes on its call thread
+        while the caller stops waiting for it. When every call thread is
+        held by such requests, the call is deferred instead of queued.
+        
+        Returns:
+            str: Response text of the first request that succeeded
+        
+        Raises:
+            GeminiTimeout: When no request succeeded before the deadline
+            QuotaExceeded: When no call thread is free
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        first = self._submit(model, prompt, config, self.timeout)
+        if first is None:
+            # The request reserved by the caller is never sent
+            self.rate_limiter.refund(tokens)
+            with self._stats_lock:
+                self.busy_rejections += 1
+            raise QuotaExceeded(f'All {self.call_threads} Gemini call threads are busy', retry_after=self.timeout)
+        attempts = [first]
+        pending = set(attempts)
+        hedge_delay = self._hedge_delay()
+        error = None
+        
+        while pending:
+            hedge_at = started + hedge_delay if hedge_delay is not None and len(attempts) == 1 else deadline
+            done, pending = wait(
+                pending, timeout=max(min(hedge_at, deadline) - time.monotonic(), 0),
+                return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                if future.exception() is None:
+                    self._finish(started, attempts, future)
+                    return future.result()
+                error = future.exception()
+            
+            if time.monotonic() >= deadline:
+                break
+            if not done and hedge_delay is not None:
+                # The first request is slower than usual: race a second one
+                if self._start_hedge(tokens):
+                    hedge = self._submit(model, prompt, config, deadline - time.monotonic())
+                    if hedge is None:
+                        self.rate_limiter.refund(tokens)
+                        with self._stats_lock:
+                            self.hedges -= 1
+                            self.hedges_skipped += 1
+                    else:
+                        logger.info(f'Hedging Gemini request after {time.monotonic() - started:.1f}s')
+                        attempts.append(hedge)
+                        pending.add(hedge)
+                hedge_delay = None
+        
+        if error is None or pending:
+            error = GeminiTimeout(f'No Gemini response within {self.timeout:g}s')
+        self._finish(started, attempts, None, error)
+        raise error
+    
+    async def _generate_async(self, model, prompt, tokens, config=None):
+        """Async variant of _generate; losing and late requests are cancelled"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        attempts = [asyncio.ensure_future(self._call_async(model, prompt, config, self.timeout))]
+        pending = set(attempts)
+        hedge_delay = self._hedge_delay()
+        error = None
+        
+        try:
+            while pending:
+                hedge_at = started + hedge_delay if hedge_delay is not None and len(attempts) == 1 else deadline
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(min(hedge_at, deadline) - time.monotonic(), 0),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        self._finish(started, attempts, task)
+                        return task.result()
+                    error = task.exception()
+                
+                if time.monotonic() >= deadline:
+                    break
+                if not done and hedge_delay is not None:
+                    if self._start_hedge(tokens):
+                        logger.info(f'Hedging Gemini request after {time.monotonic() - started:.1f}s')
+                        attempts.append(asyncio.ensure_future(
+                            self._call_async(model, prompt, config, deadline - time.monotonic())
+                        ))
+                        pending.add(attempts[-1])
+                    hedge_delay = None
+        finally:
+            for task in attempts:
+                task.cancel()
+        
+        if error is None or pending:
+            error = GeminiTimeout(f'No Gemini response within {self.timeout:g}s')
+        self._finish(started, attempts, None, error)
+        raise error
+    
+    def _parse_response(self, response_text, cache_key, local_data):
+        """Parse the Gemini reply, merge it with the local fields and cache it"""
+        # Recover the JSON object (fences, prose, truncation...) and validate it
+        fields = [field for field in CV_FIELDS if field not in local_data]
+        gemini_data, repairs = parse_json_object(response_text)
+        gemini_data, violations = validate_cv_response(gemini_data, fields)
+        self._record_parse(repairs, violations)
+        if repairs:
+            logger.info(f'Repaired Gemini JSON: {", ".join(repairs)}')
+        
+        # Merge with the locally resolved fields
+        cv_data = {
+            field: local_data[field] if field in local_data else gemini_data.get(field)
+            for field in CV_FIELDS
+        }
+        self._record_tier('gemini')
+        
+        logger.info(f'Extracted CV data: {cv_data}')
+        self.cache.set(cache_key, cv_data)
+        return dict(cv_data)
+    
+    def _handle_error(self, error, response_text):
+        """Re-raise quota and deadline errors; log anything else and return None"""
+        if isinstance(error, (QuotaExceeded, GeminiTimeout)):
+            raise error
+        if isinstance(error, ImportError):
+            logger.error('google-generativeai not installed. Install with: pip install google-generativeai')
+        elif isinstance(error, JSONRepairError):
+            with self._stats_lock:
+                self.parse_counts['failed'] += 1
+            logger.error(f'Failed to parse Gemini response as JSON: {str(error)}')
+            logger.error(f'Response text: {response_text}')
+        else:
+            logger.error(f'Error extracting CV data with Gemini: {str(error)}', exc_info=error)
+        return None
+    
+    def _record_parse(self, repairs, violations):
+        """Count clean and repaired replies, repair kinds and schema violations"""
+        with self._stats_lock:
+            self.parse_counts['repaired' if repairs else 'clean'] += 1
+            for repair in repairs:
+                self.repair_counts[repair] = self.repair_counts.get(repair, 0) + 1
+            self.schema_violations += violations
+            # Each reply the old fence-only parser rejected would have failed the CV
+            if repairs and repairs not in LEGACY_REPAIRS:
+                self.recalls_avoided += 1
+    
+    def _record_tier(self, tier):
+        """Count which tier of the cascade produced a result"""
+        with self._stats_lock:
+            self.tier_counts[tier] += 1
+    
+    def result_version(self):
+        """Version string for cached results: prompt, model, generation config, local tier and budget"""
+        config = json.dumps(self.generation_config or {}, sort_keys=True)
+        local = self.local_extractor.threshold if self.local_extractor else 'off'
+        structured = 'on' if self.structured_output else 'off'
+        return (
+            f'{PROMPT_VERSION}:{self.model_name}:{config}:local={local}:'
+            f'budget={self.input_token_budget}:structured={structured}'
+        )
+    
+    def get_stats(self):
+        """Get extraction cascade, cache and quota statistics"""
+        with self._stats_lock:
+            tiers = dict(self.tier_counts)
+            tokens = {'cv_tokens_raw': self.tokens_raw, 'cv_tokens_sent': self.tokens_sent}
+            hedging = {
+                'enabled': self.hedge_enabled,
+                'requests': self.requests,
+                'hedges': self.hedges,
+                'hedge_rate': round(self.hedges / self.requests, 4) if self.requests else None,
+                'hedge_wins': self.hedge_wins,
+                'hedges_skipped': self.hedges_skipped,
+                'threshold_ms': None,
+                'timeouts': self.timeouts,
+                'timeout_seconds': self.timeout,
+                'busy_rejections': self.busy_rejections,
+            }
+            replies = sum(self.parse_counts.values())
+            parsing = {
+                'structured_output': self.structured_output,
+                **self.parse_counts,
+                'failure_rate': round(self.parse_counts['failed'] / replies, 4) if replies else None,
+                'repairs': dict(self.repair_counts),
+                'schema_violations': self.schema_violations,
+                'recalls_avoided': self.recalls_avoided,
+            }
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is not None:
+            hedging['threshold_ms'] = round(hedge_delay * 1000, 2)
+        return {
+            'tiers': tiers,
+            'input_tokens': tokens,
+            'latency': self.latency.get_stats(),
+            'call_latency': self.call_latency.get_stats(),
+            'hedging': hedging,
+            'parsing': parsing,
+            'local_extractor': self.local_extractor.get_stats() if self.local_extractor else None,
+            'cache': self.cache.get_stats(),
+            'quota': self.rate_limiter.get_stats(),
+        }
@@ -0,0 +1,215 @@
+"""
+HTTP Client
+Shared per-process pooled keep-alive session with timeouts, jittered
+retries on 5xx/429 (honoring Retry-After) and per-host latency metrics.
+Non-idempotent requests (POST) are only retried when the server cannot
+have acted on them: connection failures and 429
+"""
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from django.conf import settings
+from .metrics import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Safe to repeat: the server never processed the request
+UNPROCESSED_STATUSES = {429}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+
+def _is_idempotent(method, idempotent):
+    """Whether a request may be repeated after an ambiguous failure"""
+    return method.upper() in IDEMPOTENT_METHODS if idempotent is None else idempotent
+
+
+def _retry_after_seconds(response):
+    """Parse a Retry-After header given in seconds or as an HTTP date"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+        return max(parsed.timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _not_sent(error):
+    """Whether a requests exception happened before the request reached the server"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(error, requests.ConnectionError) and isinstance(reason, NewConnectionError)
+
+
+class HTTPClient:
+    """Pooled requests session shared by all outbound integrations"""
+
+    def __init__(self, pool_connections=10, pool_maxsize=20, connect_timeout=5.0,
+                 read_timeout=30.0, max_retries=3, backoff_base=0.5, backoff_max=30.0):
+        """
+        Args:
+            pool_connections: Number of per-host connection pools to keep
+            pool_maxsize: Keep-alive connections per host
+            connect_timeout: Seconds to establish a connection
+            read_timeout: Seconds to wait for response data
+            max_retries: Retries after the first attempt on 5xx/429/connection errors
+            backoff_base: First backoff in seconds, doubled per retry with jitter
+            backoff_max: Longest single wait, including Retry-After
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._session = None
+        self._session_pid = None
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._counters = {}
+
+    def _get_session(self):
+        """Get the session for this process (a forked worker gets its own pool)"""
+        pid = os.getpid()
+        if self._session is None or self._session_pid != pid:
+            with self._lock:
+                if self._session is None or self._session_pid != pid:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=self.pool_connections,
+                        pool_maxsize=self.pool_maxsize
+                    )
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+                    self._session_pid = pid
+        return self._session
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request through the pooled session, retrying transient failures
+
+        Args:
+            method: HTTP method
+            url: Target URL
+            **kwargs: Passed to requests (timeout defaults to the configured one);
+                max_retries overrides the configured retries for this call and
+                idempotent overrides the method's default (GET/HEAD/OPTIONS/
+                PUT/DELETE are idempotent). Non-idempotent requests are only
+                retried on connection failures and 429, never after a read
+                timeout or 5xx, which may have been processed
+
+        Returns:
+            requests.Response: Final response (callers still check the status)
+
+        Raises:
+            requests.RequestException: When every attempt fails to connect
+        """
+        max_retries = kwargs.pop('max_retries', self.max_retries)
+        idempotent = _is_idempotent(method, kwargs.pop('idempotent', None))
+        retry_statuses = RETRY_STATUSES if idempotent else UNPROCESSED_STATUSES
+        kwargs.setdefault('timeout', self.timeout)
+        host = urlsplit(url).netloc
+        session = self._get_session()
+
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(host, time.monotonic() - started, 'errors')
+                if attempt >= max_retries or not (idempotent or _not_sent(e)):
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f'{method} {host} failed ({str(e)}), retrying in {delay:.1f}s')
+            else:
+                self._record(host, time.monotonic() - started, f'status_{response.status_code // 100}xx')
+                if response.status_code not in retry_statuses or attempt >= max_retries:
+                    return response
+
+                retry_after = _retry_after_seconds(response)
+                if retry_after is not None and retry_after > self.backoff_max:
+                    return response
+                delay = retry_after if retry_after is not None else self._backoff(attempt)
+                logger.warning(
+                    f'{method} {host} returned {response.status_code}, retrying in {delay:.1f}s'
+                )
+                response.close()
+
+            self._record(host, None, 'retries')
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        """Send a GET request (see request)"""
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """Send a POST request (see request)"""
+        return self.request('POST', url, **kwargs)
+
+    def _backoff(self, attempt):
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _record(self, host, seconds, counter):
+        """Update per-host latency and counters"""
+        with self._lock:
+            if seconds is not None:
+                self._latency.setdefault(host, LatencyTracker()).record(seconds)
+            counters = self._counters.setdefault(host, {})
+            counters[counter] = counters.get(counter, 0) + 1
+
+    def get_stats(self):
+        """
+        Get per-host latency and request counters
+
+        Returns:
+            dict: host -> counters and latency summary
+        """
+        with self._lock:
+            hosts = set(self._latency) | set(self._counters)
+            return {
+                host: {
+                    **self._counters.get(host, {}),
+                    'latency': self._latency[host].get_stats() if host in self._latency else None,
+                }
+                for host in sorted(hosts)
+            }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """Get the shared HTTP client configured from settings"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HTTPClient(
+                    pool_connections=settings.HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=settings.HTTP_POOL_MAXSIZE,
+                    connect_timeout=settings.HTTP_CONNECT_TIMEOUT,
+                    read_timeout=settings.HTTP_READ_TIMEOUT,
+                    max_retries=settings.HTTP_MAX_RETRIES,
+                    backoff_base=settings.HTTP_BACKOFF_BASE,
+                    backoff_max=settings.HTTP_BACKOFF_MAX
+                )
+    return _client
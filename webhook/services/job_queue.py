@@ -0,0 +1,355 @@
+"""
+Job Queue Service
+Runs CV processing jobs on a background worker pool so the webhook can
+acknowledge Meta immediately. Jobs are persisted in a JobStore so they
+survive worker restarts and resume from their last completed stage.
+AsyncJobRunner runs the same jobs as asyncio tasks for the ASGI pipeline.
+"""
+import asyncio
+import functools
+import logging
+import threading
+import time
+from .metrics import LatencyTracker
+from .rate_limiter import QuotaExceeded
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """Durable worker pool for webhook messages"""
+
+    def __init__(self, handler, store, worker_count=4, max_size=1000,
+                 max_attempts=5, retry_base_delay=30, retry_max_delay=3600,
+                 poll_interval=2.0, retention_seconds=7 * 24 * 3600):
+        """
+        Args:
+            handler: Callable invoked as handler(message, value, state, checkpoint).
+                It should raise to have the job retried.
+            store: JobStore used to persist jobs
+            worker_count: Number of worker threads
+            max_size: Maximum number of pending jobs (0 for unbounded)
+            max_attempts: Attempts before a job is moved to the dead-letter table
+            retry_base_delay: First retry delay in seconds, doubled per attempt
+            retry_max_delay: Upper bound for the retry delay in seconds
+            poll_interval: Seconds between polls for due or abandoned jobs
+            retention_seconds: How long finished jobs are kept in the store
+        """
+        self.handler = handler
+        self.store = store
+        self.worker_count = worker_count
+        self.max_size = max_size
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self._last_purge = 0
+        self._wakeup = threading.Event()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._busy = 0
+        self._processed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._deferred = 0
+        self._job_latency = LatencyTracker()
+
+    def start(self):
+        """Start the worker threads if they are not running yet"""
+        with self._lock:
+            if self._workers:
+                return
+
+            for index in range(self.worker_count):
+                worker = threading.Thread(
+                    target=self._worker_loop,
+                    name=f'cv-worker-{index}',
+                    daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+
+        logger.info(f'Started {self.worker_count} CV worker threads')
+
+    def enqueue(self, message, value):
+        """
+        Persist a message for background processing
+
+        Args:
+            message: WhatsApp message dict
+            value: Webhook change value the message belongs to
+
+        Returns:
+            bool: True if the job was accepted
+        """
+        if self.max_size and self.store.count_pending() >= self.max_size:
+            with self._lock:
+                self._rejected += 1
+            logger.error(f'Job queue full, rejecting message {message.get("id")}')
+            return False
+
+        job_id = self.store.add(message, value)
+        logger.info(f'Queued job {job_id} for message {message.get("id")}')
+        self._wakeup.set()
+        return True
+
+    def defer(self, message, value, state, delay):
+        """
+        Persist a partially processed message to run after a delay
+
+        Used when a synchronous run hits a quota limit or a failing stage;
+        completed stages in state are not repeated.
+        """
+        job_id = self.store.add(message, value, state=state, delay=delay)
+        logger.info(f'Deferred message {message.get("id")} as job {job_id} for {delay:.0f}s')
+        return job_id
+
+    def run_forever(self):
+        """Run the worker pool in the foreground (used by run_cv_workers)"""
+        self.start()
+        while True:
+            time.sleep(60)
+
+    def _worker_loop(self):
+        """Claim jobs from the store and run the handler"""
+        while True:
+            try:
+                job = self.store.claim()
+            except Exception as e:
+                logger.error(f'Error claiming job: {str(e)}', exc_info=True)
+                job = None
+
+            if job is None:
+                self.purge_if_due()
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            self._run_job(job)
+
+    def purge_if_due(self):
+        """Drop old finished jobs at most once an hour"""
+        with self._lock:
+            if time.monotonic() - self._last_purge < 3600 and self._last_purge:
+                return
+            self._last_purge = time.monotonic()
+
+        try:
+            self.store.purge_finished(self.retention_seconds)
+        except Exception as e:
+            logger.error(f'Error purging finished jobs: {str(e)}', exc_info=True)
+
+    def _run_job(self, job):
+        """Run a single claimed job and record its outcome"""
+        started_at = time.monotonic()
+        with self._lock:
+            self._busy += 1
+
+        try:
+            try:
+                self.handler(job['message'], job['value'], job['state'], self.checkpointer(job))
+            except Exception as e:
+                self.finish(job, started_at, e)
+            else:
+                self.finish(job, started_at)
+        finally:
+            with self._lock:
+                self._busy -= 1
+
+    def checkpointer(self, job):
+        """Callable persisting a claimed job's state after each completed stage"""
+        def checkpoint(state):
+            self.store.checkpoint(job['id'], state)
+        return checkpoint
+
+    def finish(self, job, started_at, error=None):
+        """
+        Record the outcome of a job run
+
+        Args:
+            job: Claimed job
+            started_at: time.monotonic() when the run started
+            error: Exception raised by the handler; QuotaExceeded defers the
+                job, anything else schedules a retry or dead-letters it
+        """
+        try:
+            if error is None:
+                self.store.complete(job['id'])
+                with self._lock:
+                    self._processed += 1
+            elif isinstance(error, QuotaExceeded):
+                with self._lock:
+                    self._deferred += 1
+                self.store.defer(job['id'], error.retry_after)
+                logger.warning(f'Job {job["id"]} deferred for {error.retry_after:.0f}s: {str(error)}')
+            else:
+                with self._lock:
+                    self._failed += 1
+                self._handle_failure(job, str(error))
+                logger.error(f'Error in background job {job["id"]}: {str(error)}', exc_info=error)
+        finally:
+            self._job_latency.record(time.monotonic() - started_at)
+
+    def _handle_failure(self, job, error):
+        """Schedule a retry with exponential backoff or dead-letter the job"""
+        if job['attempts'] >= self.max_attempts:
+            self.store.bury(job['id'], error)
+            logger.error(f'Job {job["id"]} moved to dead letters after {job["attempts"]} attempts')
+            return
+
+        delay = min(self.retry_max_delay, self.retry_base_delay * 2 ** (job['attempts'] - 1))
+        self.store.retry(job['id'], error, delay)
+        logger.warning(f'Job {job["id"]} will be retried in {delay}s')
+
+    def get_stats(self):
+        """
+        Get queue depth, worker usage and latency statistics
+
+        Returns:
+            dict: Queue statistics
+        """
+        with self._lock:
+            stats = {
+                'workers': len(self._workers),
+                'busy_workers': self._busy,
+                'processed': self._processed,
+                'failed': self._failed,
+                'rejected': self._rejected,
+                'deferred': self._deferred,
+                'job_latency': self._job_latency.get_stats(),
+            }
+
+        stats['store'] = self.store.get_stats()
+        stats['queue_depth'] = stats['store']['by_status'].get('pending', 0)
+        return stats
+
+
+class AsyncJobRunner:
+    """
+    Runs a JobQueue's jobs as asyncio tasks on a dedicated event loop thread
+
+    Jobs are claimed from the same store, so they are persisted before the
+    webhook acknowledges them, keep per-sender order, resume from their last
+    checkpoint and follow the queue's retry and dead-letter policy.
+    """
+
+    def __init__(self, queue, handler, max_in_flight=200, executor=None):
+        """
+        Args:
+            queue: JobQueue providing the store, retry policy and statistics
+            handler: Coroutine function invoked as
+                handler(message, value, state, checkpoint); it should raise
+                to have the job retried
+            max_in_flight: Jobs running at once
+            executor: Thread pool for the blocking store calls (None for the
+                event loop's default executor)
+        """
+        self.queue = queue
+        self.handler = handler
+        self.max_in_flight = max_in_flight
+        self.executor = executor
+        self._lock = threading.Lock()
+        self._thread = None
+        self._loop = None
+        self._wakeup = None
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._started = 0
+
+    def start(self):
+        """Start the event loop thread if it is not running yet"""
+        with self._lock:
+            if self._thread:
+                return
+            self._thread = threading.Thread(target=self._main, name='cv-async-runner', daemon=True)
+            self._thread.start()
+        logger.info(f'Started async CV runner ({self.max_in_flight} jobs in flight)')
+
+    def wakeup(self):
+        """Check for new jobs now instead of at the next poll (thread-safe)"""
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            pass
+
+    def _main(self):
+        asyncio.run(self._run())
+
+    async def _offload(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(fn, *args))
+
+    async def _run(self):
+        """Claim jobs while fewer than max_in_flight are running"""
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        tasks = set()
+        while True:
+            if len(tasks) >= self.max_in_flight:
+                await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                continue
+
+            try:
+                job = await self._offload(self.queue.store.claim)
+            except Exception as e:
+                logger.error(f'Error claiming job: {str(e)}', exc_info=True)
+                job = None
+
+            if job is not None:
+                task = asyncio.ensure_future(self._run_job(job))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                continue
+
+            try:
+                await self._offload(self.queue.purge_if_due)
+            except RuntimeError:
+                # The executor refuses new work once the interpreter is exiting
+                return
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.queue.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _run_job(self, job):
+        """Run a single claimed job and record its outcome"""
+        started_at = time.monotonic()
+        with self._lock:
+            self._started += 1
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+
+        try:
+            try:
+                await self.handler(job['message'], job['value'], job['state'], self.queue.checkpointer(job))
+            except Exception as e:
+                await self._offload(self.queue.finish, job, started_at, e)
+            else:
+                await self._offload(self.queue.finish, job, started_at)
+        except Exception as e:
+            logger.error(f'Error recording outcome of job {job["id"]}: {str(e)}', exc_info=True)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            # A slot is free and the sender's next job may be runnable now
+            self._wakeup.set()
+
+    def get_stats(self):
+        """
+        Get runner statistics (job outcomes are in the queue's stats)
+
+        Returns:
+            dict: Jobs started, in flight (current and peak) and the limit
+        """
+        with self._lock:
+            return {
+                'running': self._thread is not None,
+                'started': self._started,
+                'in_flight': self._in_flight,
+                'peak_in_flight': self._peak_in_flight,
+                'max_in_flight': self.max_in_flight,
+            }
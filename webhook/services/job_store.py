@@ -0,0 +1,325 @@
+"""
+Job Store
+Durable SQLite-backed storage for CV processing jobs
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    message_id TEXT,
+    sender TEXT,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT '{}',
+    stage TEXT NOT NULL DEFAULT 'received',
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    lease_expires_at REAL,
+    last_error TEXT,
+    coalesce INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_idx ON jobs (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS jobs_sender_idx ON jobs (sender, status);
+CREATE TABLE IF NOT EXISTS dead_letters (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id INTEGER NOT NULL,
+    message_id TEXT,
+    sender TEXT,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    last_error TEXT,
+    failed_at REAL NOT NULL
+);
+"""
+
+
+class JobStore:
+    """SQLite (WAL mode) store recording every accepted message and its stage"""
+
+    def __init__(self, db_path, lease_seconds=300, coalescer=None):
+        """
+        Args:
+            db_path: Path to the SQLite database file
+            lease_seconds: How long a claimed job is owned by a worker before
+                it is considered abandoned and handed to another worker
+            coalescer: MessageCoalescer whose windows the store keeps (None
+                runs every message on its own)
+        """
+        self.db_path = str(db_path)
+        self.lease_seconds = lease_seconds
+        self.coalescer = coalescer
+        self._local = threading.local()
+
+    def _connection(self):
+        """Get the SQLite connection for the current thread, creating the schema on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            try:
+                # Stores created before coalescing windows were persisted
+                conn.execute('ALTER TABLE jobs ADD COLUMN coalesce INTEGER NOT NULL DEFAULT 0')
+            except sqlite3.OperationalError:
+                pass
+            self._local.conn = conn
+        return conn
+
+    def add(self, message, value, state=None, delay=0):
+        """
+        Record a newly accepted message
+
+        A new text or document message joins its sender's coalescing window:
+        it is stored as a delayed job and the window's deadline moves for
+        every fragment in it; the first one absorbs the rest when claimed.
+
+        Args:
+            message: WhatsApp message dict
+            value: Webhook change value the message belongs to
+            state: Stage results already computed for the message
+            delay: Seconds before the job becomes runnable
+
+        Returns:
+            int: Job id
+        """
+        now = time.time()
+        payload = json.dumps({'message': message, 'value': value})
+        if state or delay or not (self.coalescer and self.coalescer.accepts(message)):
+            state = state or {}
+            cursor = self._connection().execute(
+                'INSERT INTO jobs (message_id, sender, payload, state, stage, next_attempt_at, '
+                'created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (message.get('id'), message.get('from'), payload, json.dumps(state),
+                 state.get('stage', 'received'), now + delay, now, now)
+            )
+            return cursor.lastrowid
+
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            window = conn.execute(
+                "SELECT created_at, payload FROM jobs WHERE sender = ? AND status = 'pending' "
+                "AND coalesce = 1 ORDER BY id",
+                (message.get('from'),)
+            ).fetchall()
+            opened_at = window[0]['created_at'] if window else now
+            messages = [json.loads(row['payload'])['message'] for row in window] + [message]
+            deadline = self.coalescer.deadline(messages, opened_at, now)
+            conn.execute(
+                "UPDATE jobs SET next_attempt_at = ?, updated_at = ? WHERE sender = ? "
+                "AND status = 'pending' AND coalesce = 1",
+                (deadline, now, message.get('from'))
+            )
+            cursor = conn.execute(
+                'INSERT INTO jobs (message_id, sender, payload, next_attempt_at, coalesce, '
+                'created_at, updated_at) VALUES (?, ?, ?, ?, 1, ?, ?)',
+                (message.get('id'), message.get('from'), payload, deadline, now, now)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return cursor.lastrowid
+
+    def claim(self):
+        """
+        Claim the next runnable job
+
+        A job is runnable when it is pending and due, or when a previous
+        worker's lease on it expired (e.g. the process was killed). Jobs
+        wait while an earlier job from the same sender is unfinished so
+        each sender's messages are processed in order. A buffered fragment
+        absorbs the rest of its coalescing window when it is claimed.
+
+        Returns:
+            dict: Job with id, message, value, state and attempts, or None
+        """
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs AS job WHERE "
+                "((job.status = 'pending' AND job.next_attempt_at <= ?) OR "
+                "(job.status = 'running' AND job.lease_expires_at <= ?)) "
+                "AND NOT EXISTS (SELECT 1 FROM jobs AS earlier WHERE "
+                "earlier.sender = job.sender AND earlier.id < job.id "
+                "AND earlier.status IN ('pending', 'running')) "
+                "ORDER BY job.id LIMIT 1",
+                (now, now)
+            ).fetchone()
+
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+
+            payload = json.loads(row['payload'])
+            # coalesce is cleared once a job is claimed, so it marks unstarted fragments
+            if row['coalesce'] and self.coalescer:
+                payload = self._absorb_window(conn, row, payload, now)
+
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, coalesce = 0, "
+                "lease_expires_at = ?, updated_at = ? WHERE id = ?",
+                (now + self.lease_seconds, now, row['id'])
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        if row['status'] == 'running':
+            logger.warning(f'Recovering abandoned job {row["id"]} at stage {row["stage"]}')
+
+        return {
+            'id': row['id'],
+            'message': payload['message'],
+            'value': payload['value'],
+            'state': json.loads(row['state']),
+            'attempts': row['attempts'] + 1,
+        }
+
+    def _absorb_window(self, conn, row, payload, now):
+        """
+        Merge the sender's later buffered fragments into the job being
+        claimed (caller holds the transaction)
+
+        Returns:
+            dict: The job's payload, now holding the combined message
+        """
+        parts = [(payload['message'], payload['value'])]
+        absorbed = []
+        for later in conn.execute(
+            "SELECT id, payload, coalesce FROM jobs WHERE sender = ? AND id > ? "
+            "AND status = 'pending' ORDER BY id",
+            (row['sender'], row['id'])
+        ).fetchall():
+            # Only the unbroken run of fragments after the job belongs to its window
+            fragment = json.loads(later['payload'])
+            if not later['coalesce'] or not self.coalescer.fits([part for part, _ in parts], fragment['message']):
+                break
+            parts.append((fragment['message'], fragment['value']))
+            absorbed.append(later['id'])
+
+        message, value = self.coalescer.merge(parts)
+        if not absorbed:
+            return payload
+
+        payload = {'message': message, 'value': value}
+        conn.execute('UPDATE jobs SET payload = ? WHERE id = ?', (json.dumps(payload), row['id']))
+        conn.executemany(
+            "UPDATE jobs SET status = 'merged', last_error = ?, updated_at = ? WHERE id = ?",
+            [(f'Merged into job {row["id"]}', now, job_id) for job_id in absorbed]
+        )
+        return payload
+
+    def checkpoint(self, job_id, state):
+        """Persist the job state after a completed stage and renew the lease"""
+        now = time.time()
+        self._connection().execute(
+            'UPDATE jobs SET state = ?, stage = ?, lease_expires_at = ?, updated_at = ? WHERE id = ?',
+            (json.dumps(state), state.get('stage', 'received'), now + self.lease_seconds, now, job_id)
+        )
+
+    def complete(self, job_id):
+        """Mark a job as finished"""
+        self._connection().execute(
+            "UPDATE jobs SET status = 'done', lease_expires_at = NULL, updated_at = ? WHERE id = ?",
+            (time.time(), job_id)
+        )
+
+    def retry(self, job_id, error, delay):
+        """Release a failed job so it runs again after the given delay"""
+        now = time.time()
+        self._connection().execute(
+            "UPDATE jobs SET status = 'pending', last_error = ?, next_attempt_at = ?, "
+            "lease_expires_at = NULL, updated_at = ? WHERE id = ?",
+            (error, now + delay, now, job_id)
+        )
+
+    def defer(self, job_id, delay):
+        """Reschedule a job without counting the current run as a failed attempt"""
+        now = time.time()
+        self._connection().execute(
+            "UPDATE jobs SET status = 'pending', attempts = MAX(attempts - 1, 0), "
+            "next_attempt_at = ?, lease_expires_at = NULL, updated_at = ? WHERE id = ?",
+            (now + delay, now, job_id)
+        )
+
+    def bury(self, job_id, error):
+        """Move a job that keeps failing to the dead-letter table"""
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'INSERT INTO dead_letters '
+                '(job_id, message_id, sender, payload, state, stage, attempts, last_error, failed_at) '
+                'SELECT id, message_id, sender, payload, state, stage, attempts, ?, ? FROM jobs WHERE id = ?',
+                (error, now, job_id)
+            )
+            conn.execute(
+                "UPDATE jobs SET status = 'dead', last_error = ?, lease_expires_at = NULL, "
+                "updated_at = ? WHERE id = ?",
+                (error, now, job_id)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def count_pending(self):
+        """Number of jobs waiting to run"""
+        row = self._connection().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'pending'"
+        ).fetchone()
+        return row[0]
+
+    def purge_finished(self, older_than):
+        """Delete completed jobs older than the given age in seconds"""
+        self._connection().execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'dead', 'merged') AND updated_at < ?",
+            (time.time() - older_than,)
+        )
+
+    def get_stats(self):
+        """
+        Get job counts by status and stage
+
+        Returns:
+            dict: Job store statistics
+        """
+        conn = self._connection()
+        by_status = dict(conn.execute(
+            'SELECT status, COUNT(*) FROM jobs GROUP BY status'
+        ).fetchall())
+        by_stage = dict(conn.execute(
+            "SELECT stage, COUNT(*) FROM jobs WHERE status IN ('pending', 'running') GROUP BY stage"
+        ).fetchall())
+        dead_letters = conn.execute('SELECT COUNT(*) FROM dead_letters').fetchone()[0]
+        windows = conn.execute(
+            "SELECT COUNT(DISTINCT sender), COUNT(*) FROM jobs WHERE status = 'pending' "
+            "AND coalesce = 1"
+        ).fetchone()
+        return {
+            'by_status': by_status,
+            'unfinished_by_stage': by_stage,
+            'dead_letters': dead_letters,
+            'open_windows': windows[0],
+            'buffered_messages': windows[1],
+        }
@@ -0,0 +1,174 @@
+"""
+JSON Repair
+Tolerant parser that recovers the JSON object from an LLM reply: markdown
+fences, surrounding prose, trailing commas, single quotes, Python literals,
+raw newlines in strings and output truncated mid-object
+"""
+import json
+import re
+
+FENCE_RE = re.compile(r'```(?:json)?\s*(.*?)(?:```|$)', re.DOTALL | re.IGNORECASE)
+LITERAL_RE = re.compile(r'(None|True|False)\b')
+LITERALS = {'None': 'null', 'True': 'true', 'False': 'false'}
+# A bare token (number or literal) at the end of truncated output
+TRAILING_TOKEN_RE = re.compile(r'([:,\[])\s*([^\s:,\[\]{}"]+)$')
+COMPLETE_TOKENS = ('null', 'true', 'false')
+
+
+class JSONRepairError(ValueError):
+    """The reply does not contain a recoverable JSON object"""
+
+
+def parse_json_object(text):
+    """
+    Parse the JSON object in a model reply, repairing it if needed
+
+    Args:
+        text: Raw reply text
+
+    Returns:
+        tuple: (dict, list of repairs applied; empty when the reply was valid JSON)
+
+    Raises:
+        JSONRepairError: When no object can be recovered
+    """
+    text = (text or '').strip()
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            return data, []
+    except ValueError:
+        pass
+
+    repairs = []
+    match = FENCE_RE.search(text)
+    if match:
+        text = match.group(1).strip()
+        repairs.append('fence')
+
+    start = text.find('{')
+    if start < 0:
+        raise JSONRepairError('No JSON object in response')
+    if start > 0:
+        repairs.append('prose')
+
+    repaired, fixes, rest = _repair(text[start:])
+    if rest.strip():
+        repairs.append('prose')
+    repairs.extend(sorted(fixes))
+
+    try:
+        data = json.loads(repaired)
+    except ValueError as e:
+        raise JSONRepairError(f'Unrecoverable JSON: {str(e)}') from e
+    if not isinstance(data, dict):
+        raise JSONRepairError('Response JSON is not an object')
+    return data, sorted(set(repairs))
+
+
+def _repair(text):
+    """
+    Normalise one JSON object starting at text[0] == '{'
+
+    Returns:
+        tuple: (repaired JSON text, set of fixes, text after the object)
+    """
+    out = []
+    stack = []
+    fixes = set()
+    quote = None
+    string_start = 0
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if quote:
+            if ch == '\\':
+                # \' is only valid inside Python-style single-quoted strings
+                out.append("'" if text[i + 1:i + 2] == "'" else text[i:i + 2])
+                i += 2
+                continue
+            if ch == quote:
+                out.append('"')
+                quote = None
+            elif ch == '"':
+                out.append('\\"')
+            elif ch == '\n':
+                out.append('\\n')
+                fixes.add('newline')
+            else:
+                out.append(ch)
+            i += 1
+            continue
+
+        if ch in '"\'':
+            if ch == "'":
+                fixes.add('quotes')
+            quote = ch
+            string_start = len(out)
+            out.append('"')
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+            out.append(ch)
+        elif ch in '}]':
+            if _strip_trailing_comma(out):
+                fixes.add('trailing_comma')
+            if stack:
+                stack.pop()
+            out.append(ch)
+            if not stack:
+                return ''.join(out), fixes, text[i + 1:]
+        else:
+            literal = LITERAL_RE.match(text, i)
+            if literal and not (i and text[i - 1].isalnum()):
+                out.append(LITERALS[literal.group(1)])
+                fixes.add('literals')
+                i = literal.end()
+                continue
+            out.append(ch)
+        i += 1
+
+    # Truncated: drop the unfinished string or token, then close the brackets
+    fixes.add('truncated')
+    if quote:
+        del out[string_start:]
+    repaired = ''.join(out).rstrip()
+    token = TRAILING_TOKEN_RE.search(repaired)
+    if token and token.group(2) not in COMPLETE_TOKENS:
+        # A number may have been cut off mid-value ("phone": 12), so it is not data
+        repaired = repaired[:token.start(2)].rstrip()
+    while True:
+        if repaired.endswith(','):
+            repaired = repaired[:-1].rstrip()
+        elif repaired.endswith(':'):
+            # Remove the key whose value was cut off
+            repaired = repaired[:_string_start(repaired[:-1].rstrip())].rstrip()
+        elif repaired.endswith('"') and stack and stack[-1] == '}' and \
+                repaired[:_string_start(repaired)].rstrip().endswith(('{', ',')):
+            # A key cut off before its colon
+            repaired = repaired[:_string_start(repaired)].rstrip()
+        else:
+            break
+    return repaired + ''.join(reversed(stack)), fixes, ''
+
+
+def _string_start(text):
+    """Index of the opening quote of the string that ends text"""
+    index = len(text) - 2
+    while index >= 0:
+        if text[index] == '"':
+            backslashes = len(text[:index]) - len(text[:index].rstrip('\\'))
+            if backslashes % 2 == 0:
+                return index
+        index -= 1
+    return 0
+
+
+def _strip_trailing_comma(out):
+    """Remove a comma directly before a closing bracket"""
+    index = len(out) - 1
+    while index >= 0 and out[index].isspace():
+        index -= 1
+    if index >= 0 and out[index] == ',':
+        del out[index]
+        return True
+    return False
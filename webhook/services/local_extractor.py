@@ -0,0 +1,228 @@
+"""
+Local Extractor
+Fast regex/heuristic extraction of CV fields that follow fixed patterns,
+used before escalating the remaining fields to Gemini
+"""
+import logging
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+CV_FIELDS = ('name', 'email', 'phone', 'linkedin', 'skills')
+
+EMAIL_RE = re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}')
+LINKEDIN_RE = re.compile(r'(?:https?://)?(?:[a-z]{2,3}\.)?linkedin\.com/in/[A-Za-z0-9_%-]+/?', re.IGNORECASE)
+PHONE_RE = re.compile(r'(?<![\w+])\+?\d[\d\s().-]{5,}\d')
+YEAR_RANGE_RE = re.compile(r'^\d{4}\s*[-–]\s*\d{4}$')
+PHONE_LABEL_RE = re.compile(r'(phone|mobile|tel|cell|contact|whatsapp)\W*$', re.IGNORECASE)
+NAME_WORD_RE = re.compile(r"^[A-Z][A-Za-z'.-]*$")
+NAME_LABEL_RE = re.compile(r'^(?:full\s+)?name\s*[:\-]\s*(.+)$', re.IGNORECASE)
+SKILLS_HEADING_RE = re.compile(
+    r'^(technical\s+|core\s+|key\s+)?(skills|competencies|technologies)\b[^:]*:?\s*$', re.IGNORECASE
+)
+BULLET_RE = re.compile(r'^[\s•*·\-–]+')
+
+NOT_A_NAME = {
+    'curriculum', 'vitae', 'resume', 'cv', 'profile', 'summary', 'contact',
+    # Job titles often open a CV in place of the name
+    'senior', 'junior', 'lead', 'principal', 'staff', 'chief', 'head', 'associate', 'assistant',
+    'intern', 'trainee', 'engineer', 'developer', 'programmer', 'architect', 'analyst', 'scientist',
+    'designer', 'manager', 'director', 'consultant', 'specialist', 'administrator', 'coordinator',
+    'officer', 'executive', 'accountant', 'technician', 'teacher', 'nurse', 'software', 'data',
+    'product', 'project', 'web', 'frontend', 'backend', 'full', 'stack', 'devops', 'sales', 'marketing',
+}
+MAX_SKILLS = 10
+
+
+def _looks_like_name(text):
+    """2-4 capitalized words, none of them a heading or job title word"""
+    words = text.split()
+    return 2 <= len(words) <= 4 and all(
+        NAME_WORD_RE.match(word) and word.lower().strip('.') not in NOT_A_NAME for word in words
+    )
+
+
+def _matches_email(name, email):
+    """Whether the email's local part is built from the name (priya.sharma, psharma, sharmap...)"""
+    local = re.sub(r'[^a-z]', '', email.split('@')[0].lower())
+    words = [re.sub(r'[^a-z]', '', word.lower()) for word in name.split()]
+    words = [word for word in words if len(word) > 1]
+    if len(words) < 2 or not local:
+        return False
+    first, last = words[0], words[-1]
+    return (
+        sum(1 for word in words if word in local) >= 2
+        or local in (first[0] + last, first + last[0], last + first[0])
+    )
+
+
+class LocalExtractor:
+    """Regex/heuristic extractor with a per-field confidence score"""
+
+    def __init__(self, threshold=0.85):
+        """
+        Args:
+            threshold: Minimum confidence for a local value to be accepted
+        """
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.complete = 0
+        self.resolved = {field: 0 for field in CV_FIELDS}
+
+    def extract(self, cv_text):
+        """
+        Extract candidate values for every field
+
+        Args:
+            cv_text: Raw CV text
+
+        Returns:
+            dict: field -> {'value': str or None, 'confidence': float}
+        """
+        lines = [line.strip() for line in (cv_text or '').splitlines()]
+        return {
+            'email': self._extract_email(cv_text),
+            'phone': self._extract_phone(cv_text),
+            'linkedin': self._extract_linkedin(cv_text),
+            'name': self._extract_name(lines),
+            'skills': self._extract_skills(lines),
+        }
+
+    def resolve(self, cv_text):
+        """
+        Split fields into those resolved locally and those needing Gemini
+
+        Returns:
+            tuple: (dict of resolved field values, list of unresolved field names)
+        """
+        candidates = self.extract(cv_text)
+        resolved = {}
+        unresolved = []
+        for field in CV_FIELDS:
+            candidate = candidates[field]
+            if candidate['confidence'] >= self.threshold:
+                resolved[field] = candidate['value']
+            else:
+                unresolved.append(field)
+
+        with self._lock:
+            self.calls += 1
+            if not unresolved:
+                self.complete += 1
+            for field in resolved:
+                self.resolved[field] += 1
+
+        return resolved, unresolved
+
+    def _extract_email(self, cv_text):
+        matches = list(dict.fromkeys(m.group(0).rstrip('.') for m in EMAIL_RE.finditer(cv_text or '')))
+        if not matches:
+            # The pattern is exhaustive: no match means the CV has no email
+            return {'value': None, 'confidence': 0.9}
+        return {'value': matches[0], 'confidence': 0.95 if len(matches) == 1 else 0.85}
+
+    def _extract_linkedin(self, cv_text):
+        match = LINKEDIN_RE.search(cv_text or '')
+        if not match:
+            return {'value': None, 'confidence': 0.9}
+
+        url = match.group(0).rstrip('/')
+        if not url.lower().startswith('http'):
+            url = f'https://{url}'
+        return {'value': url, 'confidence': 0.95}
+
+    def _extract_phone(self, cv_text):
+        text = cv_text or ''
+        best = {'value': None, 'confidence': 0.0}
+        for match in PHONE_RE.finditer(text):
+            value = match.group(0).strip()
+            digits = re.sub(r'\D', '', value)
+            if not 7 <= len(digits) <= 15 or YEAR_RANGE_RE.match(value):
+                continue
+
+            prefix = text[max(0, match.start() - 20):match.start()]
+            if PHONE_LABEL_RE.search(prefix):
+                confidence = 0.95
+            elif value.startswith('+'):
+                confidence = 0.9
+            else:
+                confidence = 0.7
+
+            if confidence > best['confidence']:
+                best = {'value': value, 'confidence': confidence}
+
+        return best
+
+    def _extract_name(self, lines):
+        non_empty = [line for line in lines if line]
+        if not non_empty:
+            return {'value': None, 'confidence': 0.0}
+
+        # An explicit "Name:" label near the top is the strongest signal
+        for line in non_empty[:10]:
+            label = NAME_LABEL_RE.match(line)
+            if label and _looks_like_name(label.group(1).strip()):
+                return {'value': label.group(1).strip(), 'confidence': 0.95}
+
+        first = non_empty[0]
+        if not _looks_like_name(first):
+            return {'value': None, 'confidence': 0.0}
+
+        # Capitalized words on top could still be a title or a heading; only
+        # an email address built from them confirms the name
+        email = EMAIL_RE.search(' '.join(non_empty[:10]))
+        if email and _matches_email(first, email.group(0)):
+            return {'value': first, 'confidence': 0.9}
+        following = ' '.join(non_empty[1:4])
+        has_contact = EMAIL_RE.search(following) or PHONE_RE.search(following)
+        return {'value': first, 'confidence': 0.7 if has_contact else 0.6}
+
+    def _extract_skills(self, lines):
+        skills = []
+        in_section = False
+        for line in lines:
+            if not in_section:
+                in_section = bool(SKILLS_HEADING_RE.match(line))
+                continue
+
+            if not line:
+                if skills:
+                    break
+                continue
+
+            is_bullet = bool(BULLET_RE.match(line))
+            if not is_bullet and (line.endswith(':') or line.isupper()):
+                break
+
+            item = BULLET_RE.sub('', line)
+            if ':' in item:
+                item = item.split(':', 1)[1]
+            for skill in item.split(','):
+                skill = skill.strip(' .;')
+                if skill and skill not in skills:
+                    skills.append(skill)
+
+        if not skills:
+            return {'value': None, 'confidence': 0.0}
+
+        return {
+            'value': ', '.join(skills[:MAX_SKILLS]),
+            'confidence': 0.85 if len(skills) >= 3 else 0.5,
+        }
+
+    def get_stats(self):
+        """
+        Get per-field local hit rates
+
+        Returns:
+            dict: calls, calls fully resolved locally and per-field hit counts
+        """
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'resolved_locally': self.complete,
+                'local_hit_rate': round(self.complete / self.calls, 4) if self.calls else None,
+                'field_hits': dict(self.resolved),
+            }
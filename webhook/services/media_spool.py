@@ -0,0 +1,360 @@
+"""
+Media Spool
+Manages temporary media files under MEDIA_TEMP_DIR: small downloads stay in
+memory, larger ones spill to disk within a total-size quota. Files are
+written atomically (temp file then rename), deleted when the job closes
+them, and evicted by age or least recent use when a crashed process left
+them behind. Each spilled file is flock()ed by its owner until closed, so
+other processes never delete a file that is still being parsed
+"""
+import io
+import logging
+import os
+import shutil
+import threading
+import time
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+PARTIAL_SUFFIX = '.partial'
+CLEANUP_INTERVAL = 60
+# Files of other processes are only evicted after this long without writes
+# (and, where flock is available, only once no process holds their lock)
+MIN_IDLE_SECONDS = 60
+
+
+class SpoolFull(Exception):
+    """The spool quota cannot fit the file even after eviction"""
+
+
+class SpoolFile:
+    """Readable/writable binary buffer that spills from memory to a spool file"""
+
+    def __init__(self, spool, key, spill_threshold):
+        self.spool = spool
+        self.key = key
+        self.spill_threshold = spill_threshold
+        self.size = 0
+        # Most bytes held in memory at once (at most spill_threshold)
+        self.peak_memory_bytes = 0
+        self.path = None
+        self._partial_path = None
+        self._buffer = io.BytesIO()
+        self._reserved = 0
+
+    @property
+    def spilled(self):
+        return self._partial_path is not None or self.path is not None
+
+    def write(self, data):
+        if not self.spilled and self.size + len(data) > self.spill_threshold:
+            self._spill()
+        if self.spilled:
+            self.spool._reserve(len(data))
+            self._reserved += len(data)
+        self._buffer.write(data)
+        self.size += len(data)
+        if not self.spilled:
+            self.peak_memory_bytes = max(self.peak_memory_bytes, self.size)
+        return len(data)
+
+    def _spill(self):
+        """Move the in-memory bytes to a partial file in the spool"""
+        self._partial_path = self.spool._new_path(self.key, PARTIAL_SUFFIX)
+        self.spool._reserve(self.size)
+        self._reserved += self.size
+        file = open(self._partial_path, 'w+b')
+        # Held until close(); the lock follows the file through the rename
+        if fcntl:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        # getbuffer() writes the bytes without another in-memory copy
+        with self._buffer.getbuffer() as view:
+            file.write(view)
+        self._buffer.close()
+        self._buffer = file
+        self.spool._register(self._partial_path, self)
+
+    def finish(self):
+        """Complete the write: publish a spilled file atomically and rewind"""
+        if self._partial_path is not None:
+            self._buffer.flush()
+            self.path = self._partial_path[:-len(PARTIAL_SUFFIX)]
+            os.replace(self._partial_path, self.path)
+            self.spool._rename(self._partial_path, self.path)
+            self._partial_path = None
+        self._buffer.seek(0)
+
+    def read(self, size=-1):
+        return self._buffer.read(size)
+
+    def seek(self, offset, whence=0):
+        return self._buffer.seek(offset, whence)
+
+    def tell(self):
+        return self._buffer.tell()
+
+    def close(self):
+        """Release the buffer and delete the spool file"""
+        if self._buffer.closed:
+            return
+        self._buffer.close()
+        for path in (self._partial_path, self.path):
+            if path:
+                self.spool._remove(path, self._reserved)
+        self._partial_path = None
+        self.path = None
+        self._reserved = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MediaSpool:
+    """Quota-bounded directory of spilled media files"""
+
+    def __init__(self, root, max_bytes=500 * 1024 * 1024, max_age_seconds=3600, media_root=None):
+        """
+        Args:
+            root: Spool directory
+            max_bytes: Total size quota for spooled files
+            max_age_seconds: Files left behind longer than this are deleted
+            media_root: Directory whose total size and free disk space are reported
+        """
+        self.root = str(root)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.media_root = str(media_root or root)
+        self._lock = threading.Lock()
+        self._active = {}
+        self._used = 0
+        self._last_cleanup = 0.0
+        self._media_root_total = None
+        self._media_root_at = 0.0
+        self._sequence = 0
+        self.spills = 0
+        self.age_evictions = 0
+        self.lru_evictions = 0
+        self.rejections = 0
+        os.makedirs(self.root, exist_ok=True)
+        self.cleanup()
+
+    def open(self, key, spill_threshold):
+        """
+        Open a buffer for a job
+
+        Args:
+            key: Job identifier used in the spool file name (e.g. media ID)
+            spill_threshold: Bytes kept in memory before spilling to disk
+
+        Returns:
+            SpoolFile: Call finish() after writing and close() when the job ends
+        """
+        if time.monotonic() - self._last_cleanup > CLEANUP_INTERVAL:
+            self.cleanup()
+        return SpoolFile(self, key, spill_threshold)
+
+    def _new_path(self, key, suffix):
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+        safe_key = ''.join(c if c.isalnum() or c in '-_' else '_' for c in str(key))[:64]
+        return os.path.join(self.root, f'{safe_key}-{os.getpid()}-{sequence}.pdf{suffix}')
+
+    def _register(self, path, spool_file):
+        with self._lock:
+            self._active[path] = spool_file
+            self.spills += 1
+
+    def _rename(self, old_path, new_path):
+        with self._lock:
+            spool_file = self._active.pop(old_path, None)
+            if spool_file is not None:
+                self._active[new_path] = spool_file
+
+    def _remove(self, path, reserved):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._active.pop(path, None)
+            self._used = max(self._used - reserved, 0)
+
+    def _reserve(self, nbytes):
+        """
+        Account for bytes about to be written, evicting stale files if needed
+
+        Raises:
+            SpoolFull: When the quota cannot fit the bytes
+        """
+        with self._lock:
+            if self._used + nbytes <= self.max_bytes:
+                self._used += nbytes
+                return
+
+        self._evict_lru(nbytes)
+
+        with self._lock:
+            if self._used + nbytes > self.max_bytes:
+                self.rejections += 1
+                raise SpoolFull(
+                    f'Media spool quota of {self.max_bytes} bytes exceeded ({self._used} in use)'
+                )
+            self._used += nbytes
+
+    def _scan(self):
+        """List (path, size, mtime) of spool files"""
+        entries = []
+        try:
+            with os.scandir(self.root) as iterator:
+                for entry in iterator:
+                    if entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        entries.append((entry.path, stat.st_size, stat.st_mtime))
+        except FileNotFoundError:
+            pass
+        return entries
+
+    @staticmethod
+    def _remove_unlocked(path):
+        """
+        Delete a file no process holds open through a SpoolFile
+
+        Returns:
+            bool: Whether the file was deleted
+        """
+        if not fcntl:
+            try:
+                os.remove(path)
+                return True
+            except FileNotFoundError:
+                return False
+        try:
+            with open(path, 'rb') as file:
+                try:
+                    fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return False
+                os.remove(path)
+                return True
+        except FileNotFoundError:
+            return False
+
+    def _evict_lru(self, needed):
+        """Delete least recently written files not owned by this process"""
+        now = time.time()
+        with self._lock:
+            active = set(self._active)
+        candidates = sorted(
+            (entry for entry in self._scan() if entry[0] not in active and now - entry[2] > MIN_IDLE_SECONDS),
+            key=lambda entry: entry[2]
+        )
+        for path, size, _ in candidates:
+            with self._lock:
+                if self._used + needed <= self.max_bytes:
+                    return
+            if not self._remove_unlocked(path):
+                continue
+            logger.warning(f'Evicted spooled media {path} to stay under quota')
+            with self._lock:
+                self._used = max(self._used - size, 0)
+                self.lru_evictions += 1
+
+    def cleanup(self):
+        """Delete files older than max_age_seconds and resync disk usage"""
+        now = time.time()
+        with self._lock:
+            active = set(self._active)
+            self._last_cleanup = time.monotonic()
+
+        used = 0
+        for path, size, mtime in self._scan():
+            if path not in active and now - mtime > self.max_age_seconds and self._remove_unlocked(path):
+                with self._lock:
+                    self.age_evictions += 1
+                continue
+            used += size
+
+        with self._lock:
+            # Files still being written by this process count with their reservations
+            self._used = max(used, sum(spool_file._reserved for spool_file in self._active.values()))
+
+    def _media_root_bytes(self):
+        """Total size of MEDIA_ROOT, walked at most once per CLEANUP_INTERVAL"""
+        with self._lock:
+            if self._media_root_total is not None and time.monotonic() - self._media_root_at < CLEANUP_INTERVAL:
+                return self._media_root_total
+
+        total = 0
+        for directory, _, files in os.walk(self.media_root):
+            for name in files:
+                try:
+                    total += os.lstat(os.path.join(directory, name)).st_size
+                except FileNotFoundError:
+                    pass
+
+        with self._lock:
+            self._media_root_total = total
+            self._media_root_at = time.monotonic()
+        return total
+
+    def get_stats(self):
+        """
+        Get spool occupancy statistics
+
+        Returns:
+            dict: Spool files and bytes against the quota, evictions,
+                rejections, MEDIA_ROOT size and free disk space
+        """
+        entries = self._scan()
+        spool_bytes = sum(size for _, size, _ in entries)
+        media_root_bytes = self._media_root_bytes()
+        try:
+            disk = shutil.disk_usage(self.media_root)
+            disk_free, disk_total = disk.free, disk.total
+        except OSError:
+            disk_free, disk_total = None, None
+
+        with self._lock:
+            return {
+                'files': len(entries),
+                'bytes': spool_bytes,
+                'max_bytes': self.max_bytes,
+                'utilization': round(spool_bytes / self.max_bytes, 4) if self.max_bytes else None,
+                'active_files': len(self._active),
+                'spills': self.spills,
+                'age_evictions': self.age_evictions,
+                'lru_evictions': self.lru_evictions,
+                'quota_rejections': self.rejections,
+                'media_root_bytes': media_root_bytes,
+                'disk_free_bytes': disk_free,
+                'disk_total_bytes': disk_total,
+            }
+
+
+_spool = None
+_spool_lock = threading.Lock()
+
+
+def get_media_spool():
+    """Get the shared media spool configured from settings"""
+    global _spool
+    if _spool is None:
+        with _spool_lock:
+            if _spool is None:
+                _spool = MediaSpool(
+                    settings.MEDIA_TEMP_DIR,
+                    max_bytes=settings.MEDIA_SPOOL_MAX_BYTES,
+                    max_age_seconds=settings.MEDIA_SPOOL_MAX_AGE,
+                    media_root=settings.MEDIA_ROOT
+                )
+    return _spool
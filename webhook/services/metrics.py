@@ -0,0 +1,71 @@
+"""
+Metrics helpers
+Lightweight in-process counters and latency tracking for the services
+"""
+import threading
+from collections import deque
+
+
+def _pick(samples, pct):
+    """Return the pct percentile of an already sorted list of samples"""
+    index = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+    return samples[index]
+
+
+class LatencyTracker:
+    """Keeps a rolling window of durations and reports summary statistics"""
+
+    def __init__(self, window=1000):
+        self._samples = deque(maxlen=window)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        """Record a single duration in seconds"""
+        with self._lock:
+            self._samples.append(seconds)
+            self._count += 1
+
+    @property
+    def count(self):
+        """Number of durations recorded"""
+        with self._lock:
+            return self._count
+
+    def percentile(self, pct):
+        """
+        Return the given percentile (0-100) of the current window
+
+        Returns:
+            float: Duration in seconds or None if nothing was recorded
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+
+        if not samples:
+            return None
+
+        return _pick(samples, pct)
+
+    def get_stats(self):
+        """
+        Summarise the recorded durations in milliseconds
+
+        Returns:
+            dict: count, avg, p50, p95, p99 and max latency
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self._count
+
+        if not samples:
+            return {'count': count}
+
+        return {
+            'count': count,
+            'avg_ms': round(sum(samples) / len(samples) * 1000, 2),
+            'p50_ms': round(_pick(samples, 50) * 1000, 2),
+            'p95_ms': round(_pick(samples, 95) * 1000, 2),
+            'p99_ms': round(_pick(samples, 99) * 1000, 2),
+            'max_ms': round(samples[-1] * 1000, 2),
+        }
@@ -0,0 +1,381 @@
+"""
+Outbound Queue
+Durable queue of outgoing WhatsApp messages. Messages are persisted in
+SQLite and sent by a background dispatcher that throttles each sending
+phone number with a token bucket, keeps every recipient's messages in
+order and retries 429/5xx responses and connection failures with backoff.
+A message whose request may have reached WhatsApp (e.g. a read timeout) is
+never resent. The buckets live in the same database, so the rate holds
+across all processes sharing the queue
+"""
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from .http_client import RETRY_STATUSES, _not_sent, _retry_after_seconds
+from .metrics import LatencyTracker
+from .rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbound_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    phone_number_id TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    body TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_until REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbound_status_idx ON outbound_messages (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS outbound_recipient_idx ON outbound_messages (recipient, status);
+CREATE TABLE IF NOT EXISTS send_buckets (
+    phone_number_id TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class OutboundQueue:
+    """SQLite-backed send queue drained by a rate-limited background dispatcher"""
+
+    def __init__(self, db_path, send_fn, rate_per_second=20.0, burst=20, workers=4,
+                 max_attempts=8, backoff_base=2.0, backoff_max=600.0, claim_seconds=120,
+                 poll_interval=2.0, retention_seconds=7 * 24 * 3600):
+        """
+        Args:
+            db_path: Path to the SQLite database holding queued messages
+            send_fn: Callable invoked as send_fn(phone_number_id, recipient, body);
+                it must raise on failure (requests.HTTPError carries the status)
+            rate_per_second: Sustained sends per second per phone number ID,
+                shared by every process using db_path
+            burst: Sends allowed back to back before the rate applies
+            workers: Concurrent sends
+            max_attempts: Attempts before a message is marked dead
+            backoff_base: First retry delay in seconds, doubled per attempt
+            backoff_max: Upper bound for the retry delay, including Retry-After
+            claim_seconds: How long a dispatcher owns a claimed message before
+                another process may send it again
+            poll_interval: Seconds between polls for due retries
+            retention_seconds: How long dead and unknown-outcome messages are
+                kept for inspection
+        """
+        self.db_path = str(db_path)
+        self.send_fn = send_fn
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.claim_seconds = claim_seconds
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._executor = None
+        self._in_flight = 0
+        self._last_purge = 0
+        self.enqueued = 0
+        self.sent = 0
+        self.retries = 0
+        self.dead = 0
+        self.unknown = 0
+        self.throttled = 0
+        self.queue_delay = LatencyTracker()
+        self.send_latency = LatencyTracker()
+
+    def _connection(self):
+        """Get the SQLite connection for the current thread, creating the schema on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def start(self):
+        """Start the dispatcher thread if it is not running yet"""
+        with self._lock:
+            if self._thread:
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='outbound-send')
+            self._thread = threading.Thread(target=self._run, name='outbound-dispatcher', daemon=True)
+            self._thread.start()
+
+    def enqueue(self, phone_number_id, recipient, body):
+        """
+        Durably queue a message for sending
+
+        Args:
+            phone_number_id: Business phone number ID to send from
+            recipient: Recipient phone number
+            body: Message text
+
+        Returns:
+            int: Queued message ID
+        """
+        now = time.time()
+        cursor = self._connection().execute(
+            'INSERT INTO outbound_messages '
+            '(phone_number_id, recipient, body, next_attempt_at, created_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (str(phone_number_id), str(recipient), body, now, now, now)
+        )
+        with self._lock:
+            self.enqueued += 1
+        self.start()
+        self._wakeup.set()
+        return cursor.lastrowid
+
+    def pending(self):
+        """Number of messages waiting to be sent"""
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM outbound_messages WHERE status = 'pending'"
+        ).fetchone()[0]
+
+    def _run(self):
+        """Claim due messages while send slots are free and hand them to the senders"""
+        while True:
+            with self._lock:
+                free = self.workers - self._in_flight
+
+            batch = []
+            wait = None
+            if free > 0:
+                try:
+                    batch, wait = self._claim(free)
+                except Exception as e:
+                    logger.error(f'Error claiming outbound messages: {str(e)}', exc_info=True)
+
+            if not batch:
+                self._purge_if_due()
+                # Throttled messages become sendable as soon as a token is free
+                self._wakeup.wait(min(wait, self.poll_interval) if wait is not None else self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            for message in batch:
+                with self._lock:
+                    self._in_flight += 1
+                self._executor.submit(self._deliver, message)
+
+    def _claim(self, limit):
+        """
+        Claim up to limit due messages that fit their send bucket
+
+        Only the oldest unsent message of each recipient is claimable, so a
+        recipient's messages go out in order and a retrying message holds
+        back the ones queued after it. Dead messages do not block. Tokens
+        are taken in the claim transaction, so concurrent dispatchers share
+        each phone number's rate.
+
+        Returns:
+            tuple: (claimed messages, seconds until a throttled message may
+                be sent or None)
+        """
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(
+                "SELECT * FROM outbound_messages AS message WHERE "
+                "message.status = 'pending' AND message.next_attempt_at <= ? "
+                "AND (message.claimed_until IS NULL OR message.claimed_until < ?) "
+                "AND NOT EXISTS (SELECT 1 FROM outbound_messages AS earlier WHERE "
+                "earlier.recipient = message.recipient AND earlier.id < message.id "
+                "AND earlier.status = 'pending') "
+                "ORDER BY message.id LIMIT ?",
+                (now, now, limit)
+            ).fetchall()
+
+            buckets = {}
+            claimed = []
+            wait = None
+            for row in rows:
+                phone_number_id = row['phone_number_id']
+                if phone_number_id not in buckets:
+                    buckets[phone_number_id] = self._load_bucket(conn, phone_number_id, now)
+                bucket = buckets[phone_number_id]
+                bucket_wait = bucket.wait_time(1, now)
+                if bucket_wait:
+                    wait = bucket_wait if wait is None else min(wait, bucket_wait)
+                    continue
+                bucket.take(1)
+                claimed.append(row)
+
+            for phone_number_id, bucket in buckets.items():
+                conn.execute(
+                    'INSERT OR REPLACE INTO send_buckets (phone_number_id, tokens, updated_at) VALUES (?, ?, ?)',
+                    (phone_number_id, bucket.tokens, bucket.updated_at)
+                )
+            if claimed:
+                ids = [row['id'] for row in claimed]
+                conn.execute(
+                    f'UPDATE outbound_messages SET claimed_until = ?, attempts = attempts + 1, '
+                    f'updated_at = ? WHERE id IN ({",".join("?" * len(ids))})',
+                    [now + self.claim_seconds, now] + ids
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        if wait is not None:
+            with self._lock:
+                self.throttled += len(rows) - len(claimed)
+        return [dict(row, attempts=row['attempts'] + 1) for row in claimed], wait
+
+    def _load_bucket(self, conn, phone_number_id, now):
+        """Token bucket of a phone number ID as stored by the last claim (wall-clock times)"""
+        bucket = TokenBucket(self.burst, per_seconds=self.burst / self.rate_per_second)
+        bucket.updated_at = now
+        row = conn.execute(
+            'SELECT tokens, updated_at FROM send_buckets WHERE phone_number_id = ?', (phone_number_id,)
+        ).fetchone()
+        if row is not None:
+            bucket.tokens = row['tokens']
+            bucket.updated_at = min(row['updated_at'], now)
+        return bucket
+
+    def _deliver(self, message):
+        """Send one claimed message and record the outcome"""
+        started = time.monotonic()
+        try:
+            self.send_fn(message['phone_number_id'], message['recipient'], message['body'])
+        except Exception as e:
+            self._failed(message, e)
+        else:
+            self.send_latency.record(time.monotonic() - started)
+            self.queue_delay.record(time.time() - message['created_at'])
+            self._connection().execute('DELETE FROM outbound_messages WHERE id = ?', (message['id'],))
+            with self._lock:
+                self.sent += 1
+            logger.info(f'Message {message["id"]} sent to {message["recipient"]}')
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._wakeup.set()
+
+    def _failed(self, message, error):
+        """
+        Schedule a retry for transient errors, otherwise mark the message dead
+
+        Only 429/5xx responses and failures before the request reached the
+        server are retried. Messages are not idempotent, so when the request
+        may have been delivered (read timeout, dropped connection) the message
+        is marked 'unknown' instead of risking a duplicate.
+        """
+        response = getattr(error, 'response', None)
+        status = getattr(response, 'status_code', None)
+        retryable = status in RETRY_STATUSES or (status is None and _not_sent(error))
+        now = time.time()
+
+        if not retryable and status is None and isinstance(error, requests.RequestException):
+            self._connection().execute(
+                "UPDATE outbound_messages SET status = 'unknown', claimed_until = NULL, "
+                "last_error = ?, updated_at = ? WHERE id = ?",
+                (str(error), now, message['id'])
+            )
+            with self._lock:
+                self.unknown += 1
+            logger.error(
+                f'Message {message["id"]} to {message["recipient"]} may have been delivered, '
+                f'not resending: {str(error)}'
+            )
+            return
+
+        if not retryable or message['attempts'] >= self.max_attempts:
+            self._connection().execute(
+                "UPDATE outbound_messages SET status = 'dead', claimed_until = NULL, "
+                "last_error = ?, updated_at = ? WHERE id = ?",
+                (str(error), now, message['id'])
+            )
+            with self._lock:
+                self.dead += 1
+            logger.error(
+                f'Giving up on message {message["id"]} to {message["recipient"]} '
+                f'after {message["attempts"]} attempts: {str(error)}'
+            )
+            return
+
+        retry_after = _retry_after_seconds(response) if response is not None else None
+        delay = min(
+            self.backoff_max,
+            retry_after if retry_after is not None
+            else random.uniform(0.5, 1.0) * self.backoff_base * 2 ** (message['attempts'] - 1)
+        )
+        self._connection().execute(
+            'UPDATE outbound_messages SET claimed_until = NULL, next_attempt_at = ?, '
+            'last_error = ?, updated_at = ? WHERE id = ?',
+            (now + delay, str(error), now, message['id'])
+        )
+        with self._lock:
+            self.retries += 1
+        logger.warning(
+            f'Sending message {message["id"]} to {message["recipient"]} failed '
+            f'({status or str(error)}), retrying in {delay:.1f}s'
+        )
+
+    def _purge_if_due(self):
+        """Drop old dead and unknown-outcome messages at most once an hour"""
+        if time.monotonic() - self._last_purge < 3600 and self._last_purge:
+            return
+        self._last_purge = time.monotonic()
+
+        try:
+            self._connection().execute(
+                "DELETE FROM outbound_messages WHERE status IN ('dead', 'unknown') AND updated_at < ?",
+                (time.time() - self.retention_seconds,)
+            )
+        except Exception as e:
+            logger.error(f'Error purging dead outbound messages: {str(e)}', exc_info=True)
+
+    def get_stats(self):
+        """
+        Get queue statistics
+
+        Returns:
+            dict: Pending, dead and unknown-outcome messages, send/retry
+                counts, throttling, queue delay and send latency
+        """
+        try:
+            counts = dict(self._connection().execute(
+                'SELECT status, COUNT(*) FROM outbound_messages GROUP BY status'
+            ).fetchall())
+        except Exception as e:
+            logger.error(f'Error reading outbound queue: {str(e)}', exc_info=True)
+            counts = {}
+
+        with self._lock:
+            return {
+                'pending': counts.get('pending', 0),
+                'dead': counts.get('dead', 0),
+                'unknown': counts.get('unknown', 0),
+                'in_flight': self._in_flight,
+                'enqueued': self.enqueued,
+                'sent': self.sent,
+                'retries': self.retries,
+                'given_up': self.dead,
+                'delivery_unknown': self.unknown,
+                'throttled': self.throttled,
+                'rate_per_second': self.rate_per_second,
+                'queue_delay': self.queue_delay.get_stats(),
+                'send_latency': self.send_latency.get_stats(),
+            }
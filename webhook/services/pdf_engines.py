@@ -0,0 +1,235 @@
+"""
+PDF Engines
+Registry of PDF text extraction engines behind one page-iterator interface,
+so the engine and its fallback order can be chosen by configuration
+"""
+import importlib.util
+import io
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class EngineUnavailable(Exception):
+    """The engine cannot extract this document; try the next one"""
+
+
+class PDFEngine:
+    """Base engine: yields the text of each page, parsing pages lazily"""
+
+    name = None
+    # Module that must be importable for the engine to be available
+    requires = None
+    # Remote engines do I/O instead of CPU work and run in the calling process
+    remote = False
+
+    def is_available(self):
+        """Whether the engine's dependencies are installed and configured"""
+        return self.requires is None or importlib.util.find_spec(self.requires) is not None
+
+    def iter_pages(self, source):
+        """
+        Yield page text
+
+        Args:
+            source: PDF bytes, a file path or a readable binary file object
+        """
+        raise NotImplementedError
+
+    def get_stats(self):
+        """Engine specific statistics, or None"""
+        return None
+
+    @staticmethod
+    def _as_file(source):
+        """Source for readers accepting a path or a file object"""
+        if isinstance(source, (bytes, bytearray)):
+            return io.BytesIO(source)
+        return source
+
+    @staticmethod
+    def _as_bytes(source):
+        if isinstance(source, (bytes, bytearray)):
+            return bytes(source)
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as file:
+                return file.read()
+        source.seek(0)
+        return source.read()
+
+
+class PyPDF2Engine(PDFEngine):
+    name = 'pypdf2'
+    requires = 'PyPDF2'
+
+    def iter_pages(self, source):
+        import PyPDF2
+
+        for page in PyPDF2.PdfReader(self._as_file(source)).pages:
+            yield page.extract_text() or ''
+
+
+class PypdfEngine(PDFEngine):
+    """pypdf, the maintained successor of PyPDF2"""
+
+    name = 'pypdf'
+    requires = 'pypdf'
+
+    def iter_pages(self, source):
+        import pypdf
+
+        for page in pypdf.PdfReader(self._as_file(source)).pages:
+            yield page.extract_text() or ''
+
+
+class PyMuPDFEngine(PDFEngine):
+    """MuPDF bindings (C library, usually the fastest)"""
+
+    name = 'pymupdf'
+    requires = 'fitz'
+
+    def iter_pages(self, source):
+        import fitz
+
+        if isinstance(source, (str, os.PathLike)):
+            document = fitz.open(source, filetype='pdf')
+        else:
+            document = fitz.open(stream=self._as_bytes(source), filetype='pdf')
+        with document:
+            for page in document:
+                yield page.get_text()
+
+
+class PdfminerEngine(PDFEngine):
+    """pdfminer.six layout analysis (slow, best on multi-column layouts)"""
+
+    name = 'pdfminer'
+    requires = 'pdfminer'
+
+    def iter_pages(self, source):
+        from pdfminer.high_level import extract_pages
+        from pdfminer.layout import LTTextContainer
+
+        for page_layout in extract_pages(self._as_file(source)):
+            yield ''.join(
+                element.get_text() for element in page_layout if isinstance(element, LTTextContainer)
+            )
+
+
+class AdobeEngine(PDFEngine):
+    """
+    Adobe PDF Services (remote)
+
+    NOTE: This is a placeholder until the official Adobe PDF Services SDK is
+    set up; it authenticates and then defers to the next engine
+    """
+
+    name = 'adobe'
+    remote = True
+
+    def __init__(self):
+        from django.conf import settings
+        from .token_cache import TokenCache
+
+        # One IMS token per worker process, shared by all threads; it is only
+        # kept fresh in the background while the engine is configured
+        self.tokens = TokenCache(
+            self._request_access_token,
+            refresh_margin=settings.ADOBE_TOKEN_REFRESH_MARGIN,
+            name='Adobe IMS token',
+            background_refresh=self.name in settings.PDF_ENGINES and self.is_available()
+        )
+
+    def is_available(self):
+        from django.conf import settings
+        return bool(settings.ADOBE_CLIENT_ID and settings.ADOBE_CLIENT_SECRET)
+
+    def get_access_token(self):
+        """Get the cached IMS access token, fetching it only when needed"""
+        return self.tokens.get()
+
+    def _request_access_token(self):
+        """
+        Request a new IMS access token
+
+        Returns:
+            tuple: (access_token, expires_in seconds)
+        """
+        from django.conf import settings
+        from .http_client import get_http_client
+
+        token_url = 'https://ims-na1.adobelogin.com/ims/token/v3'
+        token_data = {
+            'client_id': settings.ADOBE_CLIENT_ID,
+            'client_secret': settings.ADOBE_CLIENT_SECRET,
+            'grant_type': 'client_credentials',
+            'scope': 'openid,AdobeID,read_organizations'
+        }
+
+        # Fetching a token has no side effects, so timeouts and 5xx are retried
+        token_response = get_http_client().post(token_url, data=token_data, idempotent=True)
+        token_response.raise_for_status()
+        token_json = token_response.json()
+        return token_json.get('access_token'), token_json.get('expires_in', 0)
+
+    def iter_pages(self, source):
+        self.get_access_token()
+
+        # Upload PDF
+        # Note: Full implementation requires Adobe PDF Extract API
+        # This is a placeholder for the complete flow
+        raise EngineUnavailable('Adobe PDF Services integration requires full SDK setup')
+
+    def get_stats(self):
+        return {'token': self.tokens.get_stats()}
+
+
+ENGINES = {}
+_instances = {}
+_lock = threading.Lock()
+
+
+def register_engine(engine_class):
+    """Register an engine class under its name (usable as a class decorator)"""
+    ENGINES[engine_class.name] = engine_class
+    return engine_class
+
+
+for _engine_class in (AdobeEngine, PyPDF2Engine, PypdfEngine, PyMuPDFEngine, PdfminerEngine):
+    register_engine(_engine_class)
+
+
+def get_engine(name):
+    """
+    Get the shared instance of a registered engine
+
+    Raises:
+        KeyError: When no engine is registered under the name
+    """
+    with _lock:
+        if name not in _instances:
+            _instances[name] = ENGINES[name]()
+        return _instances[name]
+
+
+def available_engines(names=None):
+    """
+    Get the available engines in order
+
+    Args:
+        names: Engine names in preference order (defaults to all registered)
+
+    Returns:
+        list: PDFEngine instances whose dependencies are present
+    """
+    engines = []
+    for name in names or ENGINES:
+        if name not in ENGINES:
+            logger.warning(f'Unknown PDF engine: {name}')
+            continue
+        engine = get_engine(name)
+        if engine.is_available():
+            engines.append(engine)
+    return engines
@@ -1,99 +1,236 @@
 """
 PDF Service
-Handles PDF text extraction using Adobe PDF Services API
+Handles PDF text extraction with the configured engines (see pdf_engines)
 """
-import os
 import logging
-import requests
-import json
+import threading
 from django.conf import settings
+from .process_pool import ProcessPool, TaskFailed
+from .local_extractor import LocalExtractor
+from .pdf_engines import available_engines, get_engine, EngineUnavailable
 
 logger = logging.getLogger(__name__)
 
 
+def _fields_found(extractor, page_text, stop_fields, threshold):
+    """Stop fields that can be read from one page's text with enough confidence"""
+    found = extractor.extract(page_text)
+    return {
+        field for field in stop_fields
+        if found[field]['value'] and found[field]['confidence'] >= threshold
+    }
+
+
+def read_pdf_pages(source, engine='pypdf2', max_pages=0, max_chars=0, stop_fields=(), threshold=0.85):
+    """
+    Extract page text until the stop fields are found or a budget is reached
+    
+    Pages after the stop point are never parsed. Module level so it can run
+    in a pool worker process.
+    
+    Args:
+        source: PDF bytes, a file path or a readable binary file object
+        engine: Name of a registered PDF engine
+        max_pages: Stop after this many pages (0 for no limit)
+        max_chars: Stop once this many characters were read (0 for no limit)
+        stop_fields: Stop once the local extractor finds all of these fields
+        threshold: Local extractor confidence needed for a stop field
+        
+    Returns:
+        dict: text, pages_read and stopped ('fields', 'max_pages',
+            'max_chars' or None when the whole document was read)
+    """
+    parts = []
+    chars = 0
+    stopped = None
+    # Each page is checked on its own so the cost stays linear in the pages read
+    extractor = LocalExtractor() if stop_fields else None
+    missing = set(stop_fields)
+    for page_text in get_engine(engine).iter_pages(source):
+        parts.append(page_text)
+        chars += len(page_text)
+        
+        if missing:
+            missing -= _fields_found(extractor, page_text, missing, threshold)
+        if stop_fields and not missing:
+            stopped = 'fields'
+        elif max_pages and len(parts) >= max_pages:
+            stopped = 'max_pages'
+        elif max_chars and chars >= max_chars:
+            stopped = 'max_chars'
+        if stopped:
+            break
+    
+    return {
+        'text': '\n'.join(parts),
+        'pages_read': len(parts),
+        'stopped': stopped,
+    }
+
+
+def read_pdf_text(source, engine='pypdf2'):
+    """
+    Extract the text of every page
+    
+    Args:
+        source: PDF bytes, a file path or a readable binary file object
+        engine: Name of a registered PDF engine
+        
+    Returns:
+        str: Text of all pages
+    """
+    return read_pdf_pages(source, engine)['text']
+
+
+def _read_pdf_pages_job(job):
+    """Pool entry point: job is a dict of read_pdf_pages arguments"""
+    return read_pdf_pages(job.pop('source'), **job)
+
+
 class PDFService:
     """Service for PDF text extraction"""
     
     def __init__(self):
-        self.client_id = settings.ADOBE_CLIENT_ID
-        self.client_secret = settings.ADOBE_CLIENT_SECRET
+        self.engines = available_engines(settings.PDF_ENGINES)
+        if not self.engines:
+            logger.error(f'No PDF engine available from {settings.PDF_ENGINES}')
+        self.pool = None
+        if settings.PDF_POOL_ENABLED:
+            self.pool = ProcessPool(
+                _read_pdf_pages_job,
+                workers=settings.PDF_POOL_WORKERS,
+                timeout=settings.PDF_EXTRACTION_TIMEOUT,
+                memory_limit_mb=settings.PDF_WORKER_MEMORY_MB,
+                max_tasks_per_worker=settings.PDF_WORKER_MAX_TASKS,
+                start_method=settings.PDF_POOL_START_METHOD
+            )
+        self.max_pages = settings.PDF_MAX_PAGES
+        self.max_chars = settings.PDF_MAX_CHARS
+        self.stop_fields = tuple(settings.PDF_EARLY_STOP_FIELDS)
+        self.stop_threshold = settings.CV_LOCAL_EXTRACTION_THRESHOLD
+        self._stats_lock = threading.Lock()
+        self.documents = 0
+        self.pages_read = 0
+        self.stopped = {}
+        self.engine_used = {}
+        self.engine_errors = {}
+        self.read_from_disk = 0
+        self.peak_bytes_loaded = 0
         
     def extract_text(self, pdf_path):
         """
-        Extract text from PDF file using Adobe PDF Services API
+        Extract text from a PDF with the configured engines
         
-        For MVP: Using a simpler approach with PyPDF2 as fallback
-        Adobe PDF Services requires more complex setup
+        Engines are tried in PDF_ENGINES order and the next one is used when
+        an engine fails. Local engines parse in the process pool when
+        enabled, so a malformed or very large PDF cannot pin the calling
+        worker. Files on disk (including spilled spool files) are handed to
+        the engines by path; only in-memory buffers are read into bytes.
         
         Args:
-            pdf_path: Path to PDF file
+            pdf_path: Path to PDF file or a readable binary file object
             
         Returns:
-            str: Extracted text
+            str: Extracted text, or None when every engine failed
+            
+        Raises:
+            TaskFailed: When the PDF exceeded the extraction time or memory limit
         """
         try:
-            # Try Adobe PDF Services if credentials are configured
-            if self.client_id and self.client_secret:
-                return self._extract_with_adobe(pdf_path)
-            else:
-                # Fallback to PyPDF2
-                return self._extract_with_pypdf2(pdf_path)
-                
+            source = self._source(pdf_path)
         except Exception as e:
-            logger.error(f'Error extracting PDF text: {str(e)}', exc_info=True)
+            logger.error(f'Error reading PDF: {str(e)}', exc_info=True)
             return None
-    
-    def _extract_with_adobe(self, pdf_path):
-        """
-        Extract text using Adobe PDF Services API
         
-        NOTE: This is a simplified implementation
-        For production, use the official Adobe PDF Services SDK
-        """
-        try:
-            # Get access token
-            token_url = 'https://ims-na1.adobelogin.com/ims/token/v3'
-            token_data = {
-                'client_id': self.client_id,
-                'client_secret': self.client_secret,
-                'grant_type': 'client_credentials',
-                'scope': 'openid,AdobeID,read_organizations'
-            }
-            
-            token_response = requests.post(token_url, data=token_data)
-            token_response.raise_for_status()
-            access_token = token_response.json().get('access_token')
+        for engine in self.engines:
+            try:
+                result = self._run_engine(engine, source)
+            except TaskFailed as e:
+                if e.limit_exceeded:
+                    raise
+                self._record_error(engine, e)
+                continue
+            except EngineUnavailable as e:
+                logger.warning(f'PDF engine {engine.name} skipped: {str(e)}')
+                continue
+            except Exception as e:
+                self._record_error(engine, e)
+                continue
             
-            # Upload PDF
-            # Note: Full implementation requires Adobe PDF Extract API
-            # This is a placeholder for the complete flow
-            
-            logger.warning('Adobe PDF Services integration requires full SDK setup')
-            return self._extract_with_pypdf2(pdf_path)
-            
-        except Exception as e:
-            logger.error(f'Adobe API error: {str(e)}', exc_info=True)
-            return self._extract_with_pypdf2(pdf_path)
+            text = result['text']
+            self._record(engine, result)
+            logger.info(
+                f'Extracted {len(text)} characters from {result["pages_read"]} pages using {engine.name}'
+                f'{" (stopped: " + result["stopped"] + ")" if result["stopped"] else ""}'
+            )
+            return text.strip()
+        
+        logger.error('No PDF engine could extract the document')
+        return None
     
-    def _extract_with_pypdf2(self, pdf_path):
+    def _source(self, pdf_path):
+        """Path of a file on disk, or the bytes of an in-memory buffer"""
+        path = pdf_path if not hasattr(pdf_path, 'read') else getattr(pdf_path, 'path', None)
+        if path is not None:
+            with self._stats_lock:
+                self.read_from_disk += 1
+            return str(path)
+        
+        pdf_path.seek(0)
+        data = pdf_path.read()
+        with self._stats_lock:
+            self.peak_bytes_loaded = max(self.peak_bytes_loaded, len(data))
+        return data
+    
+    def _run_engine(self, engine, source):
+        """Run one engine: local engines in the process pool, remote ones here"""
+        options = {
+            'engine': engine.name,
+            'max_pages': self.max_pages,
+            'max_chars': self.max_chars,
+            'stop_fields': self.stop_fields,
+            'threshold': self.stop_threshold,
+        }
+        if self.pool is None or engine.remote:
+            return read_pdf_pages(source, **options)
+        return self.pool.run({'source': source, **options})
+    
+    def _record(self, engine, result):
+        """Track the engine used, pages read and why extraction stopped early"""
+        with self._stats_lock:
+            self.documents += 1
+            self.pages_read += result['pages_read']
+            self.engine_used[engine.name] = self.engine_used.get(engine.name, 0) + 1
+            if result['stopped']:
+                self.stopped[result['stopped']] = self.stopped.get(result['stopped'], 0) + 1
+    
+    def _record_error(self, engine, error):
+        logger.error(f'PDF engine {engine.name} failed: {str(error)}')
+        with self._stats_lock:
+            self.engine_errors[engine.name] = self.engine_errors.get(engine.name, 0) + 1
+    
+    def get_stats(self):
         """
-        Fallback: Extract text using PyPDF2
+        Get PDF extraction statistics
+        
+        Returns:
+            dict: Engines, pages read, early stops by reason, documents parsed from
+                disk, the largest document loaded into memory and process pool statistics
         """
-        try:
-            import PyPDF2
-            
-            text = ''
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text()
-            
-            logger.info(f'Extracted {len(text)} characters using PyPDF2')
-            return text.strip()
-            
-        except ImportError:
-            logger.error('PyPDF2 not installed. Install with: pip install PyPDF2')
-            return None
-        except Exception as e:
-            logger.error(f'PyPDF2 extraction error: {str(e)}', exc_info=True)
-            return None
+        with self._stats_lock:
+            return {
+                'engines': [engine.name for engine in self.engines],
+                'documents': self.documents,
+                'pages_read': self.pages_read,
+                'avg_pages_read': round(self.pages_read / self.documents, 2) if self.documents else None,
+                'early_stops': dict(self.stopped),
+                'engine_used': dict(self.engine_used),
+                'engine_errors': dict(self.engine_errors),
+                'read_from_disk': self.read_from_disk,
+                'peak_bytes_loaded': self.peak_bytes_loaded,
+                'engine_stats': {
+                    engine.name: engine.get_stats()
+                    for engine in self.engines if engine.get_stats() is not None
+                },
+                'pool': self.pool.get_stats() if self.pool is not None else None,
+            }
@@ -0,0 +1,273 @@
+"""
+Process Pool
+Bounded pool of worker processes for CPU-bound work such as PDF parsing,
+with hard per-task wall-clock and memory limits, cancellation and worker
+recycling after a number of tasks
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from .metrics import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 0.05
+
+
+class TaskFailed(Exception):
+    """A pooled task did not produce a result"""
+
+    def __init__(self, reason, message):
+        """
+        Args:
+            reason: One of 'timeout', 'memory', 'cancelled', 'crashed', 'error'
+            message: Human readable description
+        """
+        super().__init__(message)
+        self.reason = reason
+
+    @property
+    def limit_exceeded(self):
+        """Whether the task hit a hard limit (retrying it will not help)"""
+        return self.reason in ('timeout', 'memory')
+
+
+def _worker_main(conn, target, memory_limit_mb):
+    """Worker process loop: run target on each payload received over the pipe"""
+    if memory_limit_mb:
+        try:
+            import resource
+            limit = memory_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass
+
+    while True:
+        try:
+            payload = conn.recv()
+        except (EOFError, OSError):
+            return
+        if payload is None:
+            return
+
+        try:
+            result = ('ok', target(payload))
+        except MemoryError:
+            result = ('memory', f'Memory limit of {memory_limit_mb} MB exceeded')
+        except Exception as e:
+            result = ('error', f'{type(e).__name__}: {str(e)}')
+
+        try:
+            conn.send(result)
+        except MemoryError:
+            conn.send(('memory', f'Memory limit of {memory_limit_mb} MB exceeded'))
+
+
+class _Worker:
+    """A worker process and the parent's end of its pipe"""
+
+    def __init__(self, context, target, memory_limit_mb):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, target, memory_limit_mb),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+
+    def stop(self, kill=False):
+        """Ask the worker to exit, or kill it when it is stuck"""
+        if not kill:
+            try:
+                self.conn.send(None)
+            except (OSError, ValueError):
+                kill = True
+        if kill:
+            self.process.kill()
+        self.process.join(timeout=1 if not kill else 5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=5)
+        self.conn.close()
+
+
+class ProcessPool:
+    """Runs a picklable module-level function in recycled worker processes"""
+
+    def __init__(self, target, workers=None, timeout=30.0, memory_limit_mb=512,
+                 max_tasks_per_worker=50, start_method='spawn'):
+        """
+        Args:
+            target: Module-level function called with each payload
+            workers: Maximum concurrent worker processes (defaults to CPU count)
+            timeout: Default wall-clock seconds per task before the worker is killed
+            memory_limit_mb: Address space limit per worker (0 to disable)
+            max_tasks_per_worker: Replace a worker after this many tasks
+            start_method: multiprocessing start method ('spawn' is safe with threads)
+        """
+        self.target = target
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.context = multiprocessing.get_context(start_method)
+        self._lock = threading.Lock()
+        self._reset()
+        self._stats_lock = threading.Lock()
+        self.latency = LatencyTracker()
+        self.tasks = 0
+        self.completed = 0
+        self.failures = {}
+        self.recycled = 0
+        atexit.register(self.shutdown)
+
+    def _reset(self):
+        """Forget workers inherited from a parent process"""
+        self._pid = os.getpid()
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._idle = []
+        self._busy = set()
+        self._closing = threading.Event()
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+    def run(self, payload, timeout=None, cancel_event=None):
+        """
+        Run target(payload) in a worker process
+
+        Args:
+            payload: Picklable argument for the target function
+            timeout: Wall-clock seconds for this task (defaults to the pool's)
+            cancel_event: Optional threading.Event; setting it kills the task
+
+        Returns:
+            Whatever the target returned
+
+        Raises:
+            TaskFailed: On timeout, memory limit, cancellation, crash or error
+        """
+        self._check_pid()
+        timeout = timeout or self.timeout
+        with self._stats_lock:
+            self.tasks += 1
+
+        self._slots.acquire()
+        worker = None
+        healthy = False
+        started = time.monotonic()
+        try:
+            worker = self._checkout()
+            worker.tasks += 1
+            worker.conn.send(payload)
+
+            deadline = started + timeout
+            while not worker.conn.poll(POLL_INTERVAL):
+                if self._closing.is_set() or (cancel_event is not None and cancel_event.is_set()):
+                    raise TaskFailed('cancelled', 'Task was cancelled')
+                if not worker.process.is_alive():
+                    raise TaskFailed('crashed', f'Worker exited with code {worker.process.exitcode}')
+                if time.monotonic() >= deadline:
+                    raise TaskFailed('timeout', f'Task exceeded {timeout:.0f}s')
+
+            try:
+                status, result = worker.conn.recv()
+            except (EOFError, OSError):
+                raise TaskFailed('crashed', f'Worker exited with code {worker.process.exitcode}')
+
+            if status != 'ok':
+                # A worker that ran out of memory may be in a bad state
+                healthy = status == 'error'
+                raise TaskFailed(status, result)
+
+            healthy = True
+            self.latency.record(time.monotonic() - started)
+            with self._stats_lock:
+                self.completed += 1
+            return result
+
+        except TaskFailed as e:
+            with self._stats_lock:
+                self.failures[e.reason] = self.failures.get(e.reason, 0) + 1
+            logger.warning(f'Pooled task failed ({e.reason}): {str(e)}')
+            raise
+        except (OSError, ValueError) as e:
+            with self._stats_lock:
+                self.failures['crashed'] = self.failures.get('crashed', 0) + 1
+            raise TaskFailed('crashed', f'Worker pipe failed: {str(e)}')
+        finally:
+            if worker is not None:
+                self._checkin(worker, healthy)
+            self._slots.release()
+
+    def _checkout(self):
+        """Take an idle worker or start a new one"""
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    self._busy.add(worker)
+                    return worker
+                worker.conn.close()
+        worker = _Worker(self.context, self.target, self.memory_limit_mb)
+        with self._lock:
+            self._busy.add(worker)
+        return worker
+
+    def _checkin(self, worker, healthy):
+        """Return a worker to the pool, or replace it when spent or unhealthy"""
+        with self._lock:
+            self._busy.discard(worker)
+            keep = (
+                healthy
+                and not self._closing.is_set()
+                and worker.tasks < self.max_tasks_per_worker
+            )
+            if keep:
+                self._idle.append(worker)
+                return
+
+        if healthy:
+            with self._stats_lock:
+                self.recycled += 1
+        worker.stop(kill=not healthy)
+
+    def shutdown(self):
+        """Cancel running tasks and stop all worker processes"""
+        if self._pid != os.getpid():
+            return
+        self._closing.set()
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
+
+    def get_stats(self):
+        """
+        Get pool statistics
+
+        Returns:
+            dict: Worker counts, task outcomes by failure reason and task latency
+        """
+        with self._lock:
+            idle = len(self._idle)
+            busy = len(self._busy)
+        with self._stats_lock:
+            return {
+                'max_workers': self.workers,
+                'idle_workers': idle,
+                'busy_workers': busy,
+                'tasks': self.tasks,
+                'completed': self.completed,
+                'failures': dict(self.failures),
+                'recycled_workers': self.recycled,
+                'latency': self.latency.get_stats(),
+            }
@@ -0,0 +1,295 @@
+"""
+Rate Limiter
+Token-bucket limits for requests per minute, tokens per minute and a
+daily request budget, kept in SQLite so every worker process draws from the
+same quota
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quota_buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS quota_days (
+    day INTEGER PRIMARY KEY,
+    used INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS quota_requests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    requested_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS quota_requests_time_idx ON quota_requests (requested_at);
+"""
+
+
+class QuotaExceeded(Exception):
+    """Raised when a call cannot be scheduled within the allowed wait"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Token bucket that lets callers reserve capacity ahead of time"""
+
+    def __init__(self, capacity, per_seconds=60.0):
+        """
+        Args:
+            capacity: Bucket size (e.g. requests or tokens per window)
+            per_seconds: Seconds it takes to refill the full capacity
+        """
+        self.capacity = float(capacity)
+        self.rate = self.capacity / per_seconds
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now):
+        """Add the tokens accumulated since the last update"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount, now):
+        """Seconds until amount can be taken (callers must hold the limiter lock)"""
+        self.refill(now)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        """Take amount, going into debt so later callers queue behind this one"""
+        self.tokens -= amount
+
+    def give(self, amount):
+        """Return amount taken for a call that was never made"""
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """Schedules calls against RPM, TPM and daily request budgets shared by every process using db_path"""
+
+    def __init__(self, db_path, requests_per_minute, tokens_per_minute, requests_per_day, max_wait=30.0):
+        """
+        Args:
+            db_path: Path to the SQLite database holding the budgets
+            requests_per_minute: Allowed requests per minute (0 disables)
+            tokens_per_minute: Allowed input+output tokens per minute (0 disables)
+            requests_per_day: Allowed requests per UTC day (0 disables)
+            max_wait: Longest a caller may be delayed in-process before the
+                call is rejected with QuotaExceeded to be rescheduled later
+        """
+        self.db_path = db_path
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_day = requests_per_day
+        self.max_wait = max_wait
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.granted = 0
+        self.delayed = 0
+        self.deferred = 0
+        self.refunded = 0
+
+    def _connection(self):
+        """Get the SQLite connection for the current thread, creating the schema on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _load_buckets(self, conn, now):
+        """RPM and TPM buckets as stored by the last reservation (wall-clock times)"""
+        buckets = {}
+        for name, capacity in (('rpm', self.requests_per_minute), ('tpm', self.tokens_per_minute)):
+            if not capacity:
+                continue
+            bucket = TokenBucket(capacity)
+            bucket.updated_at = now
+            row = conn.execute('SELECT tokens, updated_at FROM quota_buckets WHERE name = ?', (name,)).fetchone()
+            if row is not None:
+                bucket.tokens = min(row['tokens'], bucket.capacity)
+                bucket.updated_at = min(row['updated_at'], now)
+            buckets[name] = bucket
+        return buckets
+
+    def _save_buckets(self, conn, buckets):
+        for name, bucket in buckets.items():
+            conn.execute(
+                'INSERT OR REPLACE INTO quota_buckets (name, tokens, updated_at) VALUES (?, ?, ?)',
+                (name, bucket.tokens, bucket.updated_at)
+            )
+
+    @staticmethod
+    def _day_used(conn, day):
+        row = conn.execute('SELECT used FROM quota_days WHERE day = ?', (day,)).fetchone()
+        return row['used'] if row else 0
+
+    def acquire(self, tokens=0):
+        """
+        Reserve one request and the given number of tokens, sleeping if needed
+
+        Args:
+            tokens: Estimated tokens for the call
+
+        Raises:
+            QuotaExceeded: When the call cannot start within max_wait seconds
+        """
+        wait = self._reserve(tokens, self.max_wait)
+        if wait:
+            logger.info(f'Rate limiter delaying call by {wait:.2f}s')
+            time.sleep(wait)
+
+    def try_acquire(self, tokens=0):
+        """
+        Reserve one request only if it can start right away
+
+        Used for optional calls (e.g. hedged requests) that should never
+        wait for, or be deferred by, the budgets.
+
+        Returns:
+            bool: Whether the request was reserved
+        """
+        try:
+            self._reserve(tokens, 0.0, optional=True)
+            return True
+        except QuotaExceeded:
+            return False
+
+    def refund(self, tokens=0):
+        """
+        Return a reservation whose request was never sent
+
+        Args:
+            tokens: Tokens reserved with it
+        """
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            buckets = self._load_buckets(conn, now)
+            for name, amount in (('rpm', 1), ('tpm', tokens)):
+                if name in buckets:
+                    buckets[name].refill(now)
+                    buckets[name].give(amount)
+            self._save_buckets(conn, buckets)
+            conn.execute('UPDATE quota_days SET used = MAX(used - 1, 0) WHERE day = ?', (int(now // 86400),))
+            conn.execute('DELETE FROM quota_requests WHERE id = (SELECT MAX(id) FROM quota_requests)')
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        with self._lock:
+            self.refunded += 1
+
+    def _reserve(self, tokens, max_wait, optional=False):
+        """
+        Take a request and tokens from the shared budgets in one transaction
+
+        Returns:
+            float: Seconds the caller must wait before starting
+
+        Raises:
+            QuotaExceeded: When the wait would exceed max_wait
+        """
+        now = time.time()
+        day = int(now // 86400)
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if self.requests_per_day and self._day_used(conn, day) >= self.requests_per_day:
+                raise QuotaExceeded('Daily request budget exhausted', 86400 - now % 86400)
+
+            buckets = self._load_buckets(conn, now)
+            wait = 0.0
+            if 'rpm' in buckets:
+                wait = max(wait, buckets['rpm'].wait_time(1, now))
+            if 'tpm' in buckets:
+                # A single call larger than the bucket only needs a full bucket
+                tpm = buckets['tpm']
+                wait = max(wait, tpm.wait_time(min(tokens, tpm.capacity), now))
+
+            if wait > max_wait:
+                raise QuotaExceeded(f'Rate limit reached, next slot in {wait:.1f}s', wait)
+
+            if 'rpm' in buckets:
+                buckets['rpm'].take(1)
+            if 'tpm' in buckets:
+                buckets['tpm'].take(tokens)
+            self._save_buckets(conn, buckets)
+            conn.execute(
+                'INSERT INTO quota_days (day, used) VALUES (?, 1) '
+                'ON CONFLICT(day) DO UPDATE SET used = used + 1',
+                (day,)
+            )
+            conn.execute('DELETE FROM quota_days WHERE day < ?', (day - 1,))
+            conn.execute('INSERT INTO quota_requests (requested_at) VALUES (?)', (now,))
+            conn.execute('DELETE FROM quota_requests WHERE requested_at < ?', (now - 3600,))
+            conn.execute('COMMIT')
+        except QuotaExceeded:
+            conn.execute('ROLLBACK')
+            if not optional:
+                with self._lock:
+                    self.deferred += 1
+            raise
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        with self._lock:
+            self.granted += 1
+            if wait:
+                self.delayed += 1
+        return wait
+
+    def get_stats(self):
+        """
+        Get remaining quota (shared by all processes) and projected time until
+        the daily budget runs out; call counters are this process's
+
+        Returns:
+            dict: Remaining requests/tokens and projection based on the last hour
+        """
+        now = time.time()
+        conn = self._connection()
+        buckets = self._load_buckets(conn, now)
+        for bucket in buckets.values():
+            bucket.refill(now)
+        day_used = self._day_used(conn, int(now // 86400))
+        requests_last_hour = conn.execute(
+            'SELECT COUNT(*) FROM quota_requests WHERE requested_at >= ?', (now - 3600,)
+        ).fetchone()[0]
+
+        remaining_today = max(self.requests_per_day - day_used, 0) if self.requests_per_day else None
+        hourly_rate = requests_last_hour / 3600.0
+        projected = None
+        if remaining_today is not None and hourly_rate:
+            projected = round(remaining_today / hourly_rate)
+
+        with self._lock:
+            return {
+                'remaining_requests_minute': int(buckets['rpm'].tokens) if 'rpm' in buckets else None,
+                'remaining_tokens_minute': int(buckets['tpm'].tokens) if 'tpm' in buckets else None,
+                'remaining_requests_today': remaining_today,
+                'requests_last_hour': requests_last_hour,
+                'projected_seconds_until_exhausted': projected,
+                'granted': self.granted,
+                'delayed': self.delayed,
+                'deferred': self.deferred,
+                'refunded': self.refunded,
+            }
@@ -5,11 +5,24 @@ Handles data storage in Google Sheets
 import json
 import logging
 import os
-from datetime import datetime
+import re
+import threading
+import time
+from datetime import datetime, timezone
 from django.conf import settings
+from .write_buffer import WriteBehindBuffer
+from .candidate_index import CandidateIndex
+from . import startup_cache
 
 logger = logging.getLogger(__name__)
 
+TOKEN_CACHE_NAME = 'sheets_token.json'
+
+# Column positions of the identifying fields (1-based, see _ensure_headers)
+EMAIL_COLUMN = 2
+PHONE_COLUMN = 3
+INDEX_RANGE = 'B:C'
+
 
 class SheetsService:
     """Service for Google Sheets operations"""
@@ -18,7 +31,45 @@ class SheetsService:
         self.credentials_path = settings.GOOGLE_SHEETS_CREDENTIALS_PATH
         self.sheet_id = settings.GOOGLE_SHEET_ID
         self.sheet = None
-        self._initialize_sheet()
+        self.status = 'pending'
+        self._init_lock = threading.Lock()
+        self._last_attempt = None
+        self.write_buffer = None
+        self.index = CandidateIndex(refresh_seconds=settings.SHEETS_INDEX_REFRESH_SECONDS)
+        if settings.SHEETS_BATCH_WRITES:
+            self.write_buffer = WriteBehindBuffer(
+                settings.SHEETS_BUFFER_DB_PATH,
+                self._write_rows,
+                max_rows=settings.SHEETS_FLUSH_MAX_ROWS,
+                max_delay=settings.SHEETS_FLUSH_MAX_DELAY
+            )
+    
+    def initialize(self):
+        """
+        Connect to the sheet if that has not happened yet
+        
+        Called lazily on first use or from a background thread at startup so
+        importing the service never waits on Google. A failed attempt is
+        retried after SHEETS_INIT_RETRY_SECONDS.
+        
+        Returns:
+            bool: True if the sheet is ready
+        """
+        if self.sheet:
+            return True
+        
+        with self._init_lock:
+            if self.sheet:
+                return True
+            if (self._last_attempt is not None
+                    and time.monotonic() - self._last_attempt < settings.SHEETS_INIT_RETRY_SECONDS):
+                return False
+            
+            self._last_attempt = time.monotonic()
+            self.status = 'initializing'
+            self._initialize_sheet()
+            self.status = 'ready' if self.sheet else 'failed'
+            return self.sheet is not None
     
     def _initialize_sheet(self):
         """Initialize Google Sheets connection"""
@@ -49,25 +100,63 @@ class SheetsService:
                 )
                 logger.info(f'Google Sheets credentials loaded from {self.credentials_path}')
             
-            # Authorize and open the sheet
+            # Authorize (reusing another worker's token if still valid) and open the sheet
             client = gspread.authorize(credentials)
+            self._restore_token(client, credentials)
             self.sheet = client.open_by_key(self.sheet_id).sheet1
+            self._save_token(client, credentials)
             
             # Initialize headers if needed
             self._ensure_headers()
             
             logger.info('Google Sheets initialized successfully')
             
+            # Flush rows left in the buffer by a previous process
+            if self.write_buffer and self.write_buffer.pending():
+                self.write_buffer.start()
+            
         except ImportError:
             logger.error('gspread or oauth2client not installed')
         except FileNotFoundError:
             logger.error(f'Credentials file not found: {self.credentials_path}')
         except Exception as e:
             logger.error(f'Error initializing Google Sheets: {str(e)}', exc_info=True)
-            logger.error(f'Error initializing Google Sheets: {str(e)}', exc_info=True)
+    
+    def _restore_token(self, client, credentials):
+        """Load a cached OAuth access token shared by all workers"""
+        try:
+            cached = startup_cache.read_json(TOKEN_CACHE_NAME)
+            account = getattr(credentials, 'service_account_email', None)
+            if not cached or cached.get('account') != account or cached['expiry'] < time.time() + 60:
+                return
+            
+            client.auth.token = cached['token']
+            client.auth.expiry = datetime.utcfromtimestamp(cached['expiry'])
+            logger.info('Reusing cached Google OAuth token')
+        except Exception as e:
+            logger.warning(f'Could not restore cached Google OAuth token: {str(e)}')
+    
+    def _save_token(self, client, credentials):
+        """Share the current OAuth access token with other workers"""
+        try:
+            auth = client.auth
+            if not getattr(auth, 'token', None) or not getattr(auth, 'expiry', None):
+                return
+            
+            startup_cache.write_json(TOKEN_CACHE_NAME, {
+                'account': getattr(credentials, 'service_account_email', None),
+                'token': auth.token,
+                'expiry': auth.expiry.replace(tzinfo=timezone.utc).timestamp(),
+            })
+        except Exception as e:
+            logger.warning(f'Could not cache Google OAuth token: {str(e)}')
     
     def _ensure_headers(self):
-        """Ensure the sheet has proper headers"""
+        """Ensure the sheet has proper headers (checked once per sheet across workers)"""
+        marker = f'sheets_headers_{self.sheet_id}.json'
+        if startup_cache.read_json(marker):
+            return
+        
         try:
             if self.sheet:
                 # Check if first row is empty
@@ -86,13 +175,16 @@ class SheetsService:
                     ]
                     self.sheet.insert_row(headers, 1)
                     logger.info('Headers added to Google Sheet')
+                
+                startup_cache.write_json(marker, {'checked_at': time.time()})
                     
         except Exception as e:
             logger.error(f'Error ensuring headers: {str(e)}', exc_info=True)
     
     def append_cv_data(self, cv_data):
         """
-        Append CV data to Google Sheets
+        Append CV data to Google Sheets, updating the candidate's existing
+        row when the email or phone is already in the sheet
         
         Args:
             cv_data: Dictionary containing CV information
@@ -101,7 +193,7 @@ class SheetsService:
             bool: Success status
         """
         try:
-            if not self.sheet:
+            if not self.initialize():
                 logger.error('Google Sheets not initialized')
                 return False
             
@@ -116,12 +208,140 @@ class SheetsService:
                 datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')
             ]
             
-            # Append row
-            self.sheet.append_row(row)
+            # Buffer the row for a batched append_rows call
+            if self.write_buffer:
+                self.write_buffer.add(row)
+                logger.info(f'CV data buffered for Google Sheets: {cv_data.get("name", "Unknown")}')
+                return True
+            
+            # Append or update the row
+            self._write_rows([row])
             
-            logger.info(f'CV data appended to Google Sheets: {cv_data.get("name", "Unknown")}')
+            logger.info(f'CV data saved to Google Sheets: {cv_data.get("name", "Unknown")}')
             return True
             
         except Exception as e:
             logger.error(f'Error appending to Google Sheets: {str(e)}', exc_info=True)
             return False
+    
+    def _load_index(self):
+        """Load the email/phone columns once and index them by row number"""
+        values = self.sheet.get(INDEX_RANGE)
+        self.index.load(values[1:], first_row=2)
+        logger.info(f'Indexed {max(len(values) - 1, 0)} candidate rows')
+    
+    def _write_rows(self, rows):
+        """
+        Upsert a batch of rows (raises on failure)
+        
+        Rows for candidates already in the sheet are updated in place with one
+        batch_update call (empty values leave the stored cell untouched); the
+        rest are appended with one append_rows call. Repeated candidates within
+        the batch collapse to their latest row.
+        
+        Candidates the index does not know are appended without reading the
+        sheet; the index is reloaded every SHEETS_INDEX_REFRESH_SECONDS to pick
+        up rows written by other workers. Rows about to be updated are read
+        back first, and a row that no longer holds that candidate (deleted or
+        moved by hand) triggers a reload before anything is written.
+        """
+        if not self.initialize():
+            raise RuntimeError('Google Sheets not initialized')
+        
+        if self.index.needs_load():
+            self._load_index()
+        
+        updates, appends = self._plan_rows(rows)
+        stale = self._stale_rows(updates)
+        if stale:
+            logger.warning(f'Candidate index is stale (rows {stale} changed), reloading')
+            self._load_index()
+            updates, appends = self._plan_rows(rows)
+        
+        if updates:
+            # Only overwrite cells with new values so a resubmission missing
+            # e.g. the email keeps the one already stored
+            self.sheet.batch_update([
+                {'range': f'{chr(65 + column)}{row_number}', 'values': [[value]]}
+                for row_number, row in updates.items()
+                for column, value in enumerate(row)
+                if value not in ('', None)
+            ])
+            logger.info(f'Updated {len(updates)} existing candidate rows')
+        
+        if appends:
+            response = self.sheet.append_rows(appends)
+            first_row = self._first_appended_row(response)
+            if first_row is None:
+                self.index.invalidate()
+            else:
+                for offset, row in enumerate(appends):
+                    self.index.add(row[EMAIL_COLUMN - 1], row[PHONE_COLUMN - 1], first_row + offset)
+    
+    def _plan_rows(self, rows):
+        """
+        Split rows into in-place updates and appends using the index
+        
+        Returns:
+            tuple: ({row_number: row}, [rows to append])
+        """
+        updates = {}
+        appends = []
+        append_positions = {}
+        for row in rows:
+            email, phone = row[EMAIL_COLUMN - 1], row[PHONE_COLUMN - 1]
+            row_number = self.index.lookup(email, phone)
+            if row_number:
+                updates[row_number] = row
+                continue
+            
+            keys = self.index.keys(email, phone)
+            position = next((append_positions[key] for key in keys if key in append_positions), None)
+            if position is None:
+                position = len(appends)
+                appends.append(row)
+            else:
+                appends[position] = row
+            for key in keys:
+                append_positions[key] = position
+        return updates, appends
+    
+    def _stale_rows(self, updates):
+        """
+        Read back the email/phone cells of the rows about to be updated
+        
+        Returns:
+            list: Row numbers that no longer hold the indexed candidate
+        """
+        if not updates:
+            return []
+        
+        row_numbers = list(updates)
+        columns = f'{chr(64 + EMAIL_COLUMN)}{{0}}:{chr(64 + PHONE_COLUMN)}{{0}}'
+        results = self.sheet.batch_get([columns.format(row_number) for row_number in row_numbers])
+        
+        stale = []
+        for row_number, values in zip(row_numbers, results):
+            stored = list(values[0]) + ['', ''] if values else ['', '']
+            row = updates[row_number]
+            expected = set(self.index.keys(row[EMAIL_COLUMN - 1], row[PHONE_COLUMN - 1]))
+            if not expected & set(self.index.keys(stored[0], stored[1])):
+                stale.append(row_number)
+        return stale
+    
+    @staticmethod
+    def _first_appended_row(response):
+        """Parse the first row number from an append response ('Sheet1!A5:G7')"""
+        try:
+            updated_range = response['updates']['updatedRange']
+            return int(re.match(r'[A-Z]+(\d+)', updated_range.split('!')[-1]).group(1))
+        except Exception:
+            return None
+    
+    def get_stats(self):
+        """Get readiness, write buffer and candidate index statistics"""
+        return {
+            'status': self.status,
+            'write_buffer': self.write_buffer.get_stats() if self.write_buffer else None,
+            'index': self.index.get_stats(),
+        }
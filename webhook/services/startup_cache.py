@@ -0,0 +1,47 @@
+"""
+Startup Cache
+Small JSON files under MEDIA_ROOT shared by all worker processes, used to
+skip repeated startup work (header checks, OAuth token fetches)
+"""
+import json
+import logging
+import os
+import tempfile
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _path(name):
+    return os.path.join(str(settings.STARTUP_CACHE_DIR), name)
+
+
+def read_json(name):
+    """
+    Read a cached JSON document
+
+    Returns:
+        dict: Cached data or None if missing or unreadable
+    """
+    try:
+        with open(_path(name), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f'Ignoring unreadable startup cache {name}: {str(e)}')
+        return None
+
+
+def write_json(name, data):
+    """Atomically write a JSON document readable only by the current user"""
+    try:
+        directory = str(settings.STARTUP_CACHE_DIR)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f'.{name}.')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, _path(name))
+    except Exception as e:
+        logger.warning(f'Could not write startup cache {name}: {str(e)}')
@@ -0,0 +1,193 @@
+"""
+Text Compactor
+Shrinks CV text before it is sent to Gemini: normalizes whitespace, drops
+repeated page headers/footers and boilerplate, and trims low-relevance
+sections to fit a token budget
+"""
+import re
+from collections import Counter
+
+# Explicit page markers: "Page 3", "Page 3 of 5", "3 of 5", "3 / 5" (a bare
+# number may be an unlabeled phone number or a year, so it is never a marker)
+PAGE_MARKER_RE = re.compile(r'^(page\s*)?(\d+)(?:\s*(?:of|/)\s*(\d+))?$', re.IGNORECASE)
+BOILERPLATE_RE = re.compile(
+    r'^(curriculum vitae|resume|r[ée]sum[ée]|references (are )?available (up)?on request\.?|'
+    r'i hereby declare.*|declaration:?.*|confidential)$',
+    re.IGNORECASE
+)
+HEADING_RE = re.compile(r'^[A-Za-z][A-Za-z &/-]{2,40}:?$')
+
+# Section relevance by requested field; sections not listed score 1
+SECTION_KEYWORDS = {
+    'contact': ('name', 'email', 'phone', 'linkedin'),
+    'personal': ('name', 'email', 'phone', 'linkedin'),
+    'skill': ('skills',),
+    'competenc': ('skills',),
+    'technolog': ('skills',),
+    'tool': ('skills',),
+    'summary': ('skills',),
+    'profile': ('skills', 'linkedin'),
+}
+LOW_VALUE_KEYWORDS = ('reference', 'hobbies', 'interests', 'declaration', 'publications')
+# Lines that may hold a requested contact field are never dropped
+FIELD_LINE_PATTERNS = {
+    'email': re.compile(r'@'),
+    'phone': re.compile(r'\+?\d[\d\s().-]{5,}\d'),
+    'linkedin': re.compile(r'linkedin', re.IGNORECASE),
+}
+
+
+def estimate_tokens(text):
+    """Estimate the token count of a text locally (~4 characters per token)"""
+    return len(text or '') // 4 + 1
+
+
+def normalize_whitespace(text):
+    """Collapse runs of spaces and blank lines"""
+    lines = [re.sub(r'[ \t ]+', ' ', line).strip() for line in (text or '').splitlines()]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+
+def _holds_field(line, fields):
+    """Whether a line may hold one of the requested contact fields"""
+    return any(pattern.search(line) for field, pattern in FIELD_LINE_PATTERNS.items() if field in fields)
+
+
+def _is_page_marker(line, totals):
+    """Whether a line is a page marker; bare "N of M" needs its total M on several lines"""
+    match = PAGE_MARKER_RE.match(line)
+    if not match:
+        return False
+    if match.group(1):
+        return True
+    if match.group(3) is None:
+        return False
+    number, total = int(match.group(2)), int(match.group(3))
+    return 0 < number <= total and totals[total] >= min(total, 2)
+
+
+def remove_boilerplate(text, fields=()):
+    """Drop page markers and boilerplate lines"""
+    lines = text.split('\n')
+    totals = Counter(
+        int(match.group(3)) for match in map(PAGE_MARKER_RE.match, lines)
+        if match and match.group(3) is not None
+    )
+    kept = [
+        line for line in lines
+        if _holds_field(line, fields)
+        or not (_is_page_marker(line, totals) or BOILERPLATE_RE.match(line))
+    ]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(kept)).strip()
+
+
+def remove_repeated_lines(text, min_repeats=3, fields=()):
+    """Keep only the first copy of short lines repeated on every page (headers/footers)"""
+    lines = text.split('\n')
+    counts = Counter(line for line in lines if line and len(line) <= 80)
+    repeated = {line for line, count in counts.items() if count >= min_repeats}
+
+    kept = []
+    seen = set()
+    for line in lines:
+        if line in repeated and line in seen and not _holds_field(line, fields):
+            continue
+        seen.add(line)
+        kept.append(line)
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(kept)).strip()
+
+
+def split_sections(text):
+    """
+    Split CV text into (heading, body) sections
+
+    The text before the first heading is returned with heading None; it
+    usually holds the candidate's name and contact details.
+    """
+    sections = []
+    heading = None
+    body = []
+    previous_blank = True
+    for line in text.split('\n'):
+        is_heading = (
+            HEADING_RE.match(line)
+            and (line.isupper() or line.endswith(':') or previous_blank)
+            and len(line.split()) <= 4
+        )
+        if is_heading and (body or heading is not None):
+            sections.append((heading, '\n'.join(body).strip()))
+            heading, body = line, []
+        elif is_heading:
+            heading = line
+        else:
+            body.append(line)
+        previous_blank = not line
+
+    sections.append((heading, '\n'.join(body).strip()))
+    return sections
+
+
+def _section_score(heading, fields):
+    """Relevance of a section to the requested fields"""
+    if heading is None:
+        return 10
+
+    lowered = heading.lower()
+    if any(keyword in lowered for keyword in LOW_VALUE_KEYWORDS):
+        return 0
+
+    score = 1
+    for keyword, keyword_fields in SECTION_KEYWORDS.items():
+        if keyword in lowered:
+            score = max(score, 2 + sum(1 for field in keyword_fields if field in fields))
+    return score
+
+
+def compact_cv_text(cv_text, fields, token_budget):
+    """
+    Compact CV text for prompting
+
+    Args:
+        cv_text: Raw CV text
+        fields: Field names that will be requested from Gemini
+        token_budget: Maximum estimated tokens to keep (0 disables trimming)
+
+    Returns:
+        str: Compacted CV text
+    """
+    text = remove_boilerplate(normalize_whitespace(cv_text), fields)
+    if not token_budget or estimate_tokens(text) <= token_budget:
+        return text
+
+    # Only under budget pressure: drop repeated headers/footers
+    text = remove_repeated_lines(text, fields=fields)
+    if estimate_tokens(text) <= token_budget:
+        return text
+
+    sections = split_sections(text)
+    ranked = sorted(
+        range(len(sections)),
+        key=lambda index: (-_section_score(sections[index][0], fields), index)
+    )
+
+    selected = {}
+    remaining = token_budget
+    for index in ranked:
+        heading, body = sections[index]
+        block = f'{heading}\n{body}' if heading else body
+        cost = estimate_tokens(block)
+        if remaining > 0 and cost <= remaining:
+            selected[index] = block
+            remaining -= cost
+            continue
+        kept = ''
+        if remaining > 50:
+            # Keep the start of the section; the most useful lines come first
+            kept = block[:remaining * 4].rsplit('\n', 1)[0]
+            remaining = 0
+        # Contact lines of a trimmed section still reach Gemini
+        kept_lines = set(kept.split('\n'))
+        salvaged = [line for line in block.split('\n') if line not in kept_lines and _holds_field(line, fields)]
+        selected[index] = '\n'.join(filter(None, [kept] + salvaged))
+
+    return '\n\n'.join(selected[index] for index in sorted(selected) if selected[index])
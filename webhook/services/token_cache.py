@@ -0,0 +1,208 @@
+"""
+Token Cache
+Process-wide cache for OAuth-style access tokens with single-flight fetching
+and an optional background refresh shortly before a token that is in use
+expires
+"""
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY = 30
+MAX_RETRY_DELAY = 600
+# Floor for the background refresh interval, and how long a token without
+# a lifetime is cached
+MIN_REFRESH_INTERVAL = 60
+# Consecutive background refresh failures before refreshing is left to get()
+MAX_REFRESH_FAILURES = 3
+
+
+class TokenCache:
+    """Caches one access token shared by every thread in the process"""
+
+    def __init__(self, fetch_fn, refresh_margin=300, name='token', background_refresh=True):
+        """
+        Args:
+            fetch_fn: Callable returning (token, expires_in_seconds); it must
+                raise on failure
+            refresh_margin: Refresh in the background this many seconds
+                before expiry; tokens living less than twice the margin are
+                refreshed at half their lifetime instead. get() keeps
+                returning the cached token until it actually expires
+            name: Label used in logs
+            background_refresh: Refresh tokens on a daemon timer; only
+                tokens used since the last fetch are refreshed, so the timer
+                stops when the token is no longer needed
+        """
+        self.fetch_fn = fetch_fn
+        self.refresh_margin = refresh_margin
+        self.name = name
+        self.background_refresh = background_refresh
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._reset()
+        self.fetches = 0
+        self.background_refreshes = 0
+        self.hits = 0
+        self.waits = 0
+        self.errors = 0
+
+    def _reset(self):
+        """Forget the token and timer inherited from a parent process"""
+        self._pid = os.getpid()
+        self._token = None
+        self._expires_at = 0.0
+        self._timer = None
+        self._failures = 0
+        self._used = False
+
+    def get(self):
+        """
+        Get a valid token, fetching it when missing or expired
+
+        Concurrent callers never fetch in parallel: one thread fetches and
+        the others wait for its result.
+
+        Returns:
+            str: Access token
+
+        Raises:
+            Exception: Whatever fetch_fn raised when no valid token is cached
+        """
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+        token = self._valid_token()
+        if token is not None:
+            with self._lock:
+                self.hits += 1
+                self._used = True
+            return token
+
+        with self._fetch_lock:
+            # Another thread may have fetched while this one waited
+            token = self._valid_token()
+            if token is not None:
+                with self._lock:
+                    self.waits += 1
+                    self._used = True
+                return token
+            return self._fetch()
+
+    def invalidate(self):
+        """Drop the cached token (e.g. after the API rejected it)"""
+        with self._lock:
+            self._token = None
+            self._expires_at = 0.0
+
+    def stop(self):
+        """Cancel the background refresh; get() still fetches on demand"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def _valid_token(self):
+        with self._lock:
+            if self._token is not None and time.monotonic() < self._expires_at:
+                return self._token
+            return None
+
+    def _fetch(self):
+        """Fetch and store a token; the caller holds _fetch_lock"""
+        try:
+            token, expires_in = self.fetch_fn()
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+
+        expires_in = float(expires_in or 0)
+        with self._lock:
+            self._token = token
+            self._expires_at = time.monotonic() + (expires_in or MIN_REFRESH_INTERVAL)
+            self._failures = 0
+            self._used = False
+            self.fetches += 1
+        if not expires_in:
+            # No lifetime given: fetched again on demand, not in the background
+            logger.info(f'Fetched {self.name} without a lifetime, caching it for {MIN_REFRESH_INTERVAL}s')
+            return token
+
+        logger.info(f'Fetched {self.name}, valid for {expires_in:.0f}s')
+        if self.background_refresh:
+            self._schedule(self._refresh_delay(expires_in))
+        return token
+
+    def _refresh_delay(self, expires_in):
+        """Seconds until the background refresh of a token valid for expires_in"""
+        if expires_in > 2 * self.refresh_margin:
+            delay = expires_in - self.refresh_margin
+        else:
+            delay = expires_in / 2
+        return max(delay, MIN_REFRESH_INTERVAL)
+
+    def _schedule(self, delay):
+        """Start the background refresh timer"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(delay, self._refresh)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _refresh(self):
+        """
+        Background refresh before expiry
+
+        A token nobody used since it was fetched is left to expire. On
+        failure the old token is kept and the refresh is retried with
+        exponential backoff while the token is still valid, at most
+        MAX_REFRESH_FAILURES times in a row.
+        """
+        with self._fetch_lock:
+            with self._lock:
+                self._timer = None
+                if self._pid != os.getpid() or not self._used:
+                    return
+            try:
+                self._fetch()
+                with self._lock:
+                    self.background_refreshes += 1
+            except Exception as e:
+                with self._lock:
+                    remaining = self._expires_at - time.monotonic()
+                    self._failures += 1
+                    failures = self._failures
+                    delay = min(RETRY_DELAY * 2 ** (failures - 1), MAX_RETRY_DELAY)
+                logger.warning(f'Background refresh of {self.name} failed: {str(e)}')
+                if failures >= MAX_REFRESH_FAILURES:
+                    logger.warning(f'Stopped refreshing {self.name} after {failures} failures')
+                elif remaining > delay:
+                    self._schedule(delay)
+
+    def get_stats(self):
+        """
+        Get token cache statistics
+
+        Returns:
+            dict: Fetch counts, cache hits, waits on an in-flight fetch,
+                seconds until the cached token expires and whether a
+                background refresh is scheduled
+        """
+        with self._lock:
+            remaining = self._expires_at - time.monotonic() if self._token is not None else None
+            return {
+                'fetches': self.fetches,
+                'background_refreshes': self.background_refreshes,
+                'hits': self.hits,
+                'waits': self.waits,
+                'errors': self.errors,
+                'expires_in_seconds': round(remaining, 1) if remaining is not None else None,
+                'refresh_scheduled': self._timer is not None,
+            }
@@ -2,13 +2,24 @@
 WhatsApp Service
 Handles communication with WhatsApp Business API
 """
-import os
+import hashlib
 import logging
-import requests
+import threading
+from collections import namedtuple
 from django.conf import settings
+from .http_client import get_http_client
+from .async_http_client import get_async_http_client
+from .media_spool import get_media_spool
+from .outbound_queue import OutboundQueue
 
 logger = logging.getLogger(__name__)
 
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+DownloadedMedia = namedtuple('DownloadedMedia', ['file', 'sha256', 'size'])
+# Returned by download_media for files over WHATSAPP_MEDIA_MAX_BYTES (retrying will not help)
+MEDIA_TOO_LARGE = 'too_large'
+
 
 class WhatsAppService:
     """Service for WhatsApp Business API operations"""
@@ -17,52 +28,223 @@ class WhatsAppService:
         self.access_token = settings.WHATSAPP_ACCESS_TOKEN
         self.phone_number_id = settings.WHATSAPP_PHONE_NUMBER_ID
         self.base_url = f"https://graph.facebook.com/v18.0/{self.phone_number_id}"
-        
-    def download_media(self, media_id):
+        self.http = get_http_client()
+        self.max_media_bytes = settings.WHATSAPP_MEDIA_MAX_BYTES
+        self.spill_threshold = settings.MEDIA_SPILL_THRESHOLD
+        self.spool = get_media_spool()
+        self._stats_lock = threading.Lock()
+        self.downloads = 0
+        self.bytes_downloaded = 0
+        self.largest_download = 0
+        self.peak_buffer_bytes = 0
+        self.spilled = 0
+        self.rejected_too_large = 0
+        self.outbound = None
+        if settings.WHATSAPP_OUTBOUND_QUEUE:
+            self.outbound = OutboundQueue(
+                settings.WHATSAPP_OUTBOUND_DB_PATH,
+                self.deliver_message,
+                rate_per_second=settings.WHATSAPP_SEND_RATE_PER_SECOND,
+                burst=settings.WHATSAPP_SEND_BURST,
+                workers=settings.WHATSAPP_SEND_WORKERS,
+                max_attempts=settings.WHATSAPP_SEND_MAX_ATTEMPTS
+            )
+    
+    def get_media_info(self, media_id):
         """
-        Download media file from WhatsApp
+        Get the download URL and declared metadata of a media file
         
         Args:
             media_id: WhatsApp media ID
             
         Returns:
-            str: Path to downloaded file or None
+            dict: url, sha256, file_size and mime_type as reported by the
+                Graph API, or None
         """
         try:
-            # Get media URL
             url = f"https://graph.facebook.com/v18.0/{media_id}"
             headers = {
                 'Authorization': f'Bearer {self.access_token}'
             }
             
-            response = requests.get(url, headers=headers)
+            response = self.http.get(url, headers=headers)
             response.raise_for_status()
             
             media_data = response.json()
-            media_url = media_data.get('url')
-            
-            if not media_url:
+            if not media_data.get('url'):
                 logger.error('No media URL in response')
                 return None
+            return media_data
+            
+        except Exception as e:
+            logger.error(f'Error getting media info: {str(e)}', exc_info=True)
+            return None
+    
+    def download_media(self, media_id, media_info=None):
+        """
+        Stream a media file from WhatsApp into a size-capped buffer
+        
+        The file stays in memory up to MEDIA_SPILL_THRESHOLD bytes and only
+        spills to the quota-managed media spool when it is larger.
+        Files above WHATSAPP_MEDIA_MAX_BYTES are rejected. The SHA-256 of the
+        bytes is computed while they stream in.
+        
+        Args:
+            media_id: WhatsApp media ID
+            media_info: Result of get_media_info, fetched when not given
+            
+        Returns:
+            DownloadedMedia: Readable binary file positioned at the start (the
+                caller must close it), its sha256 hex digest and size;
+                MEDIA_TOO_LARGE when the file is over the limit, or None when
+                the download failed
+        """
+        buffer = None
+        try:
+            media_data = media_info or self.get_media_info(media_id)
+            if media_data is None:
+                return None
+            media_url = media_data['url']
+            headers = {
+                'Authorization': f'Bearer {self.access_token}'
+            }
+            
+            if not self._check_declared_size(media_id, media_data):
+                return MEDIA_TOO_LARGE
             
-            # Download the file
-            media_response = requests.get(media_url, headers=headers)
-            media_response.raise_for_status()
+            # Stream the file into a spool buffer
+            buffer = self.spool.open(media_id, self.spill_threshold)
+            size = 0
+            digest = hashlib.sha256()
+            with self.http.get(media_url, headers=headers, stream=True) as media_response:
+                media_response.raise_for_status()
+                for chunk in media_response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    size = self._append_chunk(media_id, buffer, digest, size, chunk)
+                    if size is None:
+                        return MEDIA_TOO_LARGE
             
-            # Save to temp file
-            os.makedirs('media/temp', exist_ok=True)
-            file_path = f'media/temp/{media_id}.pdf'
+            return self._finish_download(media_id, buffer, digest, size)
             
-            with open(file_path, 'wb') as f:
-                f.write(media_response.content)
+        except Exception as e:
+            if buffer is not None:
+                buffer.close()
+            logger.error(f'Error downloading media: {str(e)}', exc_info=True)
+            return None
+    
+    async def get_media_info_async(self, media_id):
+        """Async variant of get_media_info (uses the pooled httpx client)"""
+        try:
+            response = await get_async_http_client().get(
+                f"https://graph.facebook.com/v18.0/{media_id}",
+                headers={'Authorization': f'Bearer {self.access_token}'}
+            )
+            response.raise_for_status()
             
-            logger.info(f'Downloaded media to {file_path}')
-            return file_path
+            media_data = response.json()
+            if not media_data.get('url'):
+                logger.error('No media URL in response')
+                return None
+            return media_data
             
         except Exception as e:
+            logger.error(f'Error getting media info: {str(e)}', exc_info=True)
+            return None
+    
+    async def download_media_async(self, media_id, media_info=None):
+        """Async variant of download_media (uses the pooled httpx client)"""
+        buffer = None
+        try:
+            media_data = media_info or await self.get_media_info_async(media_id)
+            if media_data is None:
+                return None
+            if not self._check_declared_size(media_id, media_data):
+                return MEDIA_TOO_LARGE
+            
+            # Spool writes are memory copies or small buffered disk writes
+            buffer = self.spool.open(media_id, self.spill_threshold)
+            size = 0
+            digest = hashlib.sha256()
+            async with get_async_http_client().stream(
+                'GET', media_data['url'], headers={'Authorization': f'Bearer {self.access_token}'}
+            ) as media_response:
+                media_response.raise_for_status()
+                async for chunk in media_response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    size = self._append_chunk(media_id, buffer, digest, size, chunk)
+                    if size is None:
+                        return MEDIA_TOO_LARGE
+            
+            return self._finish_download(media_id, buffer, digest, size)
+            
+        except Exception as e:
+            if buffer is not None:
+                buffer.close()
             logger.error(f'Error downloading media: {str(e)}', exc_info=True)
             return None
     
+    def _check_declared_size(self, media_id, media_data):
+        """Reject media whose declared size is over the limit"""
+        if int(media_data.get('file_size') or 0) > self.max_media_bytes:
+            self._record_rejected()
+            logger.error(f'Media {media_id} is {media_data["file_size"]} bytes, over the size limit')
+            return False
+        return True
+    
+    def _append_chunk(self, media_id, buffer, digest, size, chunk):
+        """
+        Hash and buffer a downloaded chunk
+        
+        Returns:
+            int: New size, or None when the limit was exceeded (the buffer is closed)
+        """
+        size += len(chunk)
+        if size > self.max_media_bytes:
+            self._record_rejected()
+            logger.error(f'Media {media_id} exceeded {self.max_media_bytes} bytes, aborting')
+            buffer.close()
+            return None
+        digest.update(chunk)
+        buffer.write(chunk)
+        return size
+    
+    def _finish_download(self, media_id, buffer, digest, size):
+        buffer.finish()
+        self._record_download(size, buffer.peak_memory_bytes)
+        logger.info(f'Downloaded media {media_id}: {size} bytes'
+                    f'{" (spilled to disk)" if size > self.spill_threshold else ""}')
+        return DownloadedMedia(buffer, digest.hexdigest(), size)
+    
+    def _record_download(self, size, memory_bytes):
+        """Track download sizes and the memory the buffer actually held"""
+        with self._stats_lock:
+            self.downloads += 1
+            self.bytes_downloaded += size
+            self.largest_download = max(self.largest_download, size)
+            self.peak_buffer_bytes = max(self.peak_buffer_bytes, memory_bytes)
+            if size > self.spill_threshold:
+                self.spilled += 1
+    
+    def _record_rejected(self):
+        with self._stats_lock:
+            self.rejected_too_large += 1
+    
+    def get_stats(self):
+        """
+        Get media download statistics
+        
+        Returns:
+            dict: Download counts, bytes, spills and peak in-memory bytes per document
+        """
+        with self._stats_lock:
+            return {
+                'downloads': self.downloads,
+                'bytes_downloaded': self.bytes_downloaded,
+                'largest_download_bytes': self.largest_download,
+                'peak_buffer_bytes': self.peak_buffer_bytes,
+                'spill_threshold_bytes': self.spill_threshold,
+                'spilled_to_disk': self.spilled,
+                'rejected_too_large': self.rejected_too_large,
+            }
+    
     def send_message(self, to_number, message):
         """
         Send a text message via WhatsApp
@@ -75,22 +257,59 @@ class WhatsAppService:
             bool: Success status
         """
         try:
-            url = f"{self.base_url}/messages"
-            headers = {
-                'Authorization': f'Bearer {self.access_token}',
-                'Content-Type': 'application/json'
-            }
+            url, data, headers = self._message_request(to_number, message)
+            response = self.http.post(url, json=data, headers=headers)
+            response.raise_for_status()
             
-            data = {
-                'messaging_product': 'whatsapp',
-                'to': to_number,
-                'type': 'text',
-                'text': {
-                    'body': message
-                }
-            }
+            logger.info(f'Message sent to {to_number}')
+            return True
             
-            response = requests.post(url, json=data, headers=headers)
+        except Exception as e:
+            logger.error(f'Error sending message: {str(e)}', exc_info=True)
+            return False
+    
+    def queue_message(self, to_number, message):
+        """
+        Queue a text message for the background sender
+        
+        The message is persisted before this returns and sent with rate
+        limiting and retries; without the outbound queue it is sent directly.
+        
+        Args:
+            to_number: Recipient phone number
+            message: Message text
+            
+        Returns:
+            bool: Whether the message was queued (or sent)
+        """
+        if self.outbound is None:
+            return self.send_message(to_number, message)
+        
+        try:
+            message_id = self.outbound.enqueue(self.phone_number_id, to_number, message)
+            logger.info(f'Message {message_id} to {to_number} queued')
+            return True
+            
+        except Exception as e:
+            logger.error(f'Error queueing message: {str(e)}', exc_info=True)
+            return False
+    
+    def deliver_message(self, phone_number_id, to_number, message):
+        """
+        Send one queued message with a single attempt (the queue retries)
+        
+        Raises:
+            requests.RequestException: When the send fails
+        """
+        url, data, headers = self._message_request(to_number, message, phone_number_id)
+        response = self.http.post(url, json=data, headers=headers, max_retries=0)
+        response.raise_for_status()
+    
+    async def send_message_async(self, to_number, message):
+        """Async variant of send_message (uses the pooled httpx client)"""
+        try:
+            url, data, headers = self._message_request(to_number, message)
+            response = await get_async_http_client().post(url, json=data, headers=headers)
             response.raise_for_status()
             
             logger.info(f'Message sent to {to_number}')
@@ -99,3 +318,21 @@ class WhatsAppService:
         except Exception as e:
             logger.error(f'Error sending message: {str(e)}', exc_info=True)
             return False
+    
+    def _message_request(self, to_number, message, phone_number_id=None):
+        """URL, JSON body and headers of a text message request"""
+        url = f"https://graph.facebook.com/v18.0/{phone_number_id or self.phone_number_id}/messages"
+        headers = {
+            'Authorization': f'Bearer {self.access_token}',
+            'Content-Type': 'application/json'
+        }
+        
+        data = {
+            'messaging_product': 'whatsapp',
+            'to': to_number,
+            'type': 'text',
+            'text': {
+                'body': message
+            }
+        }
+        return url, data, headers
@@ -0,0 +1,290 @@
+"""
+Write Buffer
+Durable write-behind buffer that batches rows and flushes them with a
+single call when a row count or maximum delay is reached. A row the
+destination keeps rejecting is isolated and moved to a dead-letter table
+instead of blocking the rows behind it
+"""
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from .metrics import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buffered_rows (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    row TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    claimed_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS dead_rows (
+    id INTEGER PRIMARY KEY,
+    row TEXT NOT NULL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    failed_at REAL NOT NULL
+);
+"""
+
+
+def _status(error):
+    """HTTP status carried by a flush_fn exception, if any"""
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+class WriteBehindBuffer:
+    """Rows are persisted in SQLite first and flushed in batches by a background thread"""
+
+    def __init__(self, db_path, flush_fn, max_rows=20, max_delay=5.0, claim_seconds=120, max_attempts=3):
+        """
+        Args:
+            db_path: Path to the SQLite database holding buffered rows
+            flush_fn: Callable receiving a list of rows; it must raise on failure
+            max_rows: Flush as soon as this many rows are buffered
+            max_delay: Flush rows that have waited this many seconds
+            claim_seconds: How long a flushing process owns its rows before
+                another process may flush them again
+            max_attempts: Rejections (HTTP 400) of a single row before it is
+                moved to the dead_rows table
+        """
+        self.db_path = str(db_path)
+        self.flush_fn = flush_fn
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.claim_seconds = claim_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._failures = 0
+        self.flushes = 0
+        self.rows_flushed = 0
+        self.last_flush_size = 0
+        self.errors = 0
+        self.quota_errors = 0
+        self.rejected = 0
+        self.dead = 0
+        self.flush_latency = LatencyTracker()
+
+    def _connection(self):
+        """Get the SQLite connection for the current thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            try:
+                # Buffers created before rejected rows were tracked
+                conn.execute('ALTER TABLE buffered_rows ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0')
+            except sqlite3.OperationalError:
+                pass
+            self._local.conn = conn
+        return conn
+
+    def start(self):
+        """Start the flusher thread and register a final flush at shutdown"""
+        with self._lock:
+            if self._thread:
+                return
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+        atexit.register(self.flush)
+
+    def add(self, row):
+        """Durably buffer a row for the next flush"""
+        self._connection().execute(
+            'INSERT INTO buffered_rows (row, created_at) VALUES (?, ?)',
+            (json.dumps(row), time.time())
+        )
+        self.start()
+        if self.pending() >= self.max_rows:
+            self._wakeup.set()
+
+    def pending(self):
+        """Number of rows waiting to be flushed"""
+        return self._connection().execute('SELECT COUNT(*) FROM buffered_rows').fetchone()[0]
+
+    def _run(self):
+        """Flush when enough rows are buffered or the oldest row is due"""
+        while True:
+            self._wakeup.wait(self._next_wait())
+            self._wakeup.clear()
+            try:
+                self.flush(only_due=True)
+            except Exception as e:
+                logger.error(f'Error flushing buffered rows: {str(e)}', exc_info=True)
+
+    def _next_wait(self):
+        """Seconds until the next flush check, backing off after failures"""
+        if self._failures:
+            return min(300, self.max_delay * 2 ** self._failures)
+        return self.max_delay
+
+    def flush(self, only_due=False):
+        """
+        Write buffered rows with a single flush_fn call per batch
+
+        Args:
+            only_due: Skip the flush unless max_rows are buffered or the
+                oldest row has waited max_delay seconds; applies to every
+                batch, so a forced flush drains the whole buffer
+        """
+        with self._flush_lock:
+            while True:
+                batch = self._claim_batch(only_due)
+                if not batch:
+                    return
+
+                ids = [row_id for row_id, _, _ in batch]
+                rows = [row for _, row, _ in batch]
+                started = time.monotonic()
+                try:
+                    self.flush_fn(rows)
+                except Exception as e:
+                    if _status(e) == 400:
+                        # The data was rejected, not the call: retry the rows one by one
+                        self._reject(batch, e)
+                        continue
+                    self._release(ids)
+                    self._record_error(e)
+                    logger.error(f'Flush of {len(rows)} rows failed, will retry: {str(e)}')
+                    return
+
+                self.flush_latency.record(time.monotonic() - started)
+                self._connection().execute(
+                    f'DELETE FROM buffered_rows WHERE id IN ({",".join("?" * len(ids))})', ids
+                )
+                with self._lock:
+                    self._failures = 0
+                    self.flushes += 1
+                    self.rows_flushed += len(rows)
+                    self.last_flush_size = len(rows)
+                logger.info(f'Flushed {len(rows)} buffered rows')
+
+    def _claim_batch(self, only_due):
+        """
+        Claim up to max_rows unclaimed rows so other processes skip them
+
+        A row that was part of a rejected batch is claimed on its own, so
+        the row the destination refuses can be told apart from the others.
+        """
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(
+                'SELECT id, row, created_at, attempts FROM buffered_rows '
+                'WHERE claimed_until IS NULL OR claimed_until < ? ORDER BY id LIMIT ?',
+                (now, self.max_rows)
+            ).fetchall()
+            if rows and rows[0][3]:
+                rows = rows[:1]
+
+            if rows and only_due and len(rows) < self.max_rows and rows[0][2] > now - self.max_delay:
+                rows = []
+
+            if rows:
+                ids = [row[0] for row in rows]
+                conn.execute(
+                    f'UPDATE buffered_rows SET claimed_until = ? '
+                    f'WHERE id IN ({",".join("?" * len(ids))})',
+                    [now + self.claim_seconds] + ids
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        return [(row[0], json.loads(row[1]), row[3]) for row in rows]
+
+    def _release(self, ids):
+        """Return claimed rows to the buffer after a failed flush"""
+        self._connection().execute(
+            f'UPDATE buffered_rows SET claimed_until = NULL WHERE id IN ({",".join("?" * len(ids))})',
+            ids
+        )
+
+    def _reject(self, batch, error):
+        """Count a rejection against each row; a single row rejected max_attempts times is dead-lettered"""
+        now = time.time()
+        conn = self._connection()
+        with self._lock:
+            self.errors += 1
+            self.rejected += 1
+
+        if len(batch) == 1 and batch[0][2] + 1 >= self.max_attempts:
+            row_id, row, _ = batch[0]
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(
+                    'INSERT OR REPLACE INTO dead_rows (id, row, error, created_at, failed_at) '
+                    'SELECT id, row, ?, created_at, ? FROM buffered_rows WHERE id = ?',
+                    (str(error), now, row_id)
+                )
+                conn.execute('DELETE FROM buffered_rows WHERE id = ?', (row_id,))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            with self._lock:
+                self.dead += 1
+            logger.error(f'Giving up on buffered row {row_id} after {self.max_attempts} rejections: {str(error)}')
+            return
+
+        ids = [row_id for row_id, _, _ in batch]
+        conn.execute(
+            f'UPDATE buffered_rows SET claimed_until = NULL, attempts = attempts + 1 '
+            f'WHERE id IN ({",".join("?" * len(ids))})',
+            ids
+        )
+        logger.warning(f'Flush of {len(batch)} rows rejected, retrying them one by one: {str(error)}')
+
+    def _record_error(self, error):
+        """Count flush errors, separating quota (HTTP 429) errors"""
+        status = _status(error)
+        with self._lock:
+            self._failures += 1
+            self.errors += 1
+            if status == 429:
+                self.quota_errors += 1
+
+    def get_stats(self):
+        """
+        Get buffer and flush statistics
+
+        Returns:
+            dict: Pending and dead-lettered rows, flush counts and sizes,
+                errors and flush latency
+        """
+        try:
+            pending = self.pending()
+            dead_rows = self._connection().execute('SELECT COUNT(*) FROM dead_rows').fetchone()[0]
+        except Exception as e:
+            logger.error(f'Error reading write buffer: {str(e)}', exc_info=True)
+            pending = dead_rows = None
+
+        with self._lock:
+            return {
+                'pending_rows': pending,
+                'dead_rows': dead_rows,
+                'flushes': self.flushes,
+                'rows_flushed': self.rows_flushed,
+                'avg_flush_size': round(self.rows_flushed / self.flushes, 2) if self.flushes else None,
+                'last_flush_size': self.last_flush_size,
+                'errors': self.errors,
+                'quota_errors': self.quota_errors,
+                'rejected_flushes': self.rejected,
+                'rows_given_up': self.dead,
+                'flush_latency': self.flush_latency.get_stats(),
+            }
@@ -0,0 +1,32 @@
+import json
+import subprocess
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+
+class BenchmarkStartupTests(SimpleTestCase):
+    def test_reports_numeric_ready_time(self):
+        calls = []
+
+        def run(args, **kwargs):
+            calls.append(kwargs['env'])
+            output = json.dumps({'import_ms': 400.0, 'first_response_ms': 450.0, 'ready_ms': 900.0, 'failed': []})
+            return subprocess.CompletedProcess(args, 0, stdout=output + '\n', stderr='')
+
+        stdout = StringIO()
+        with mock.patch('webhook.management.commands.benchmark_startup.subprocess.run', side_effect=run):
+            call_command('benchmark_startup', runs=2, stdout=stdout)
+
+        # The `python -c` child must start the services that make it ready
+        self.assertTrue(all(env['BACKGROUND_SERVICES'] == 'True' for env in calls))
+        self.assertIn('Average ready: 900 ms', stdout.getvalue())
+
+    def test_boot_script_starts_background_services(self):
+        stdout = StringIO()
+        call_command('benchmark_startup', runs=1, timeout=10, stdout=stdout)
+        output = stdout.getvalue()
+        # Without the services starting, readiness stays 'pending' until the timeout
+        self.assertRegex(output, r'ready (\d+ ms|failed \()')
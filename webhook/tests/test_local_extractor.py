@@ -0,0 +1,28 @@
+from django.test import SimpleTestCase
+
+from webhook.services.local_extractor import LocalExtractor
+
+
+class LocalExtractorNameTests(SimpleTestCase):
+    def setUp(self):
+        self.extractor = LocalExtractor(threshold=0.85)
+
+    def test_title_on_first_line_is_not_resolved(self):
+        resolved, unresolved = self.extractor.resolve(
+            'Senior Software Engineer\npriya.sharma@example.com\n+91 98765 43210\n\nSkills\nPython, Go, SQL'
+        )
+        self.assertNotIn('name', resolved)
+        self.assertIn('name', unresolved)
+
+    def test_name_matching_email_is_resolved(self):
+        resolved, _ = self.extractor.resolve('Priya Sharma\nBengaluru\npriya.sharma@example.com')
+        self.assertEqual(resolved['name'], 'Priya Sharma')
+
+    def test_labelled_name_is_resolved(self):
+        resolved, _ = self.extractor.resolve('Senior Software Engineer\nName: Priya Sharma\nps@example.com')
+        self.assertEqual(resolved['name'], 'Priya Sharma')
+
+    def test_unconfirmed_first_line_goes_to_gemini(self):
+        resolved, unresolved = self.extractor.resolve('Acme Holdings Group\nhr@acme.example\n+1 555 010 9999')
+        self.assertNotIn('name', resolved)
+        self.assertIn('name', unresolved)
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from webhook.services.media_spool import MediaSpool, SpoolFull
+
+
+class MediaSpoolEvictionTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+
+    def _age(self, path, seconds):
+        past = time.time() - seconds
+        os.utime(path, (past, past))
+
+    def test_file_in_use_by_another_process_is_not_evicted(self):
+        # Separate spools stand in for separate worker processes
+        owner = MediaSpool(self.root, max_bytes=1000)
+        other = MediaSpool(self.root, max_bytes=1000)
+
+        spool_file = owner.open('media-1', spill_threshold=10)
+        spool_file.write(b'x' * 600)
+        spool_file.finish()
+        self._age(spool_file.path, 3600)
+
+        other.cleanup()
+        other._reserve(300)
+        with self.assertRaises(SpoolFull):
+            other._reserve(300)
+        self.assertTrue(os.path.exists(spool_file.path))
+        spool_file.close()
+
+    def test_orphaned_file_is_evicted(self):
+        path = os.path.join(self.root, 'media-2-999-1.pdf')
+        with open(path, 'wb') as file:
+            file.write(b'x' * 600)
+        self._age(path, 120)
+
+        spool = MediaSpool(self.root, max_bytes=1000, max_age_seconds=3600)
+        spool._reserve(600)
+
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(spool.get_stats()['lru_evictions'], 1)
+
+    def test_media_root_size_is_cached(self):
+        spool = MediaSpool(self.root, max_bytes=1000)
+        self.assertEqual(spool.get_stats()['media_root_bytes'], 0)
+        with open(os.path.join(self.root, 'other.bin'), 'wb') as file:
+            file.write(b'x' * 10)
+        self.assertEqual(spool.get_stats()['media_root_bytes'], 0)
@@ -0,0 +1,48 @@
+import os
+import tempfile
+
+import requests
+from django.test import SimpleTestCase
+from urllib3.exceptions import NewConnectionError
+
+from webhook.services.outbound_queue import OutboundQueue
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f'{status} error', response=response)
+
+
+def connection_refused():
+    reason = NewConnectionError(None, 'Connection refused')
+    return requests.ConnectionError(type('Failure', (), {'reason': reason})())
+
+
+class OutboundFailureTests(SimpleTestCase):
+    def send_failing(self, error):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        def send(phone_number_id, recipient, body):
+            raise error
+
+        queue = OutboundQueue(os.path.join(directory.name, 'outbound.sqlite3'), send)
+        queue.enqueue('100', '15550001111', 'Thanks')
+        claimed, _ = queue._claim(1)
+        queue._in_flight = 1
+        queue._deliver(claimed[0])
+        return queue.get_stats()
+
+    def test_read_timeout_is_not_resent(self):
+        stats = self.send_failing(requests.ReadTimeout('read timed out'))
+        self.assertEqual((stats['pending'], stats['unknown'], stats['retries']), (0, 1, 0))
+
+    def test_connect_failures_are_retried(self):
+        for error in (requests.ConnectTimeout('connect timed out'), connection_refused()):
+            stats = self.send_failing(error)
+            self.assertEqual((stats['pending'], stats['retries']), (1, 1))
+
+    def test_retry_statuses_are_retried_and_others_dead(self):
+        self.assertEqual(self.send_failing(http_error(503))['retries'], 1)
+        self.assertEqual(self.send_failing(http_error(400))['dead'], 1)
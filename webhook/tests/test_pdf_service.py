@@ -0,0 +1,47 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from webhook.services import pdf_service
+from webhook.services.local_extractor import LocalExtractor
+
+
+class FakeEngine:
+    def __init__(self, pages):
+        self.pages = pages
+        self.parsed = 0
+
+    def iter_pages(self, source):
+        for page in self.pages:
+            self.parsed += 1
+            yield page
+
+
+class EarlyStopTests(SimpleTestCase):
+    def read(self, pages, **kwargs):
+        engine = FakeEngine(pages)
+        spy = mock.patch.object(LocalExtractor, 'extract', autospec=True, side_effect=LocalExtractor.extract)
+        with mock.patch.object(pdf_service, 'get_engine', return_value=engine), spy as extract:
+            result = pdf_service.read_pdf_pages(b'%PDF', stop_fields=('name', 'email', 'phone'), **kwargs)
+        return result, engine, [call.args[1] for call in extract.call_args_list]
+
+    def test_fields_spread_over_pages_stop_once_all_are_found(self):
+        pages = [
+            'Priya Sharma\npriya.sharma@example.com\nBengaluru',
+            'Experience\nAcme Corp 2019-2024\nPhone: +91 98765 43210',
+            'Education\nIIT Delhi',
+        ]
+        result, engine, checked = self.read(pages)
+
+        self.assertEqual(result['stopped'], 'fields')
+        self.assertEqual(result['pages_read'], 2)
+        self.assertEqual(engine.parsed, 2)
+        # Only the new page is checked, not the text read so far
+        self.assertEqual(checked, pages[:2])
+
+    def test_reads_everything_when_a_field_is_missing(self):
+        pages = ['Senior Software Engineer\nps@example.com', 'Skills\nPython']
+        result, _, _ = self.read(pages)
+
+        self.assertIsNone(result['stopped'])
+        self.assertEqual(result['text'], '\n'.join(pages))
@@ -0,0 +1,50 @@
+import os
+import tempfile
+
+from django.test import SimpleTestCase
+
+from webhook.services.rate_limiter import QuotaExceeded, RateLimiter
+
+
+class SharedRateLimiterTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.db_path = os.path.join(directory.name, 'quota.sqlite3')
+
+    def limiter(self, **kwargs):
+        options = {'requests_per_minute': 3, 'tokens_per_minute': 0, 'requests_per_day': 100, 'max_wait': 0}
+        options.update(kwargs)
+        return RateLimiter(self.db_path, **options)
+
+    def test_processes_share_the_per_minute_budget(self):
+        # Two limiters on one database stand in for two worker processes
+        first, second = self.limiter(), self.limiter()
+        first.acquire()
+        second.acquire()
+        first.acquire()
+
+        with self.assertRaises(QuotaExceeded):
+            second.acquire()
+        self.assertFalse(first.try_acquire())
+        self.assertEqual(second.get_stats()['remaining_requests_today'], 97)
+
+    def test_daily_budget_is_shared(self):
+        first, second = self.limiter(requests_per_day=2), self.limiter(requests_per_day=2)
+        first.acquire()
+        second.acquire()
+
+        with self.assertRaises(QuotaExceeded):
+            first.acquire()
+
+    def test_refund_returns_the_reservation(self):
+        first, second = self.limiter(), self.limiter()
+        for _ in range(3):
+            first.acquire()
+        first.refund()
+
+        second.acquire()
+        stats = second.get_stats()
+        self.assertEqual(stats['remaining_requests_today'], 97)
+        self.assertEqual(stats['requests_last_hour'], 3)
+        self.assertEqual(first.get_stats()['refunded'], 1)
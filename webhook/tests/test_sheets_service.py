@@ -0,0 +1,61 @@
+from django.test import SimpleTestCase, override_settings
+
+from webhook.services.sheets_service import SheetsService
+
+
+class FakeSheet:
+    """Worksheet stand-in holding rows A:G, header included"""
+
+    def __init__(self, rows):
+        self.rows = [['Name', 'Email', 'Phone', 'LinkedIn', 'Skills', 'WhatsApp Number', 'Timestamp']] + rows
+        self.full_reads = 0
+
+    def get(self, range_name):
+        self.full_reads += 1
+        return [row[1:3] for row in self.rows]
+
+    def batch_get(self, ranges):
+        results = []
+        for range_name in ranges:
+            row_number = int(range_name.split(':')[0][1:])
+            results.append([self.rows[row_number - 1][1:3]] if row_number <= len(self.rows) else [])
+        return results
+
+    def batch_update(self, data):
+        for item in data:
+            column, row_number = ord(item['range'][0]) - 65, int(item['range'][1:])
+            self.rows[row_number - 1][column] = item['values'][0][0]
+
+    def append_rows(self, rows):
+        first = len(self.rows) + 1
+        self.rows.extend(list(row) for row in rows)
+        return {'updates': {'updatedRange': f'Sheet1!A{first}:G{len(self.rows)}'}}
+
+
+def row(name, email, phone):
+    return [name, email, phone, '', 'Python', '+100', '2026-01-01 00:00:00 UTC']
+
+
+@override_settings(SHEETS_BATCH_WRITES=False)
+class SheetsUpsertTests(SimpleTestCase):
+    def setUp(self):
+        self.service = SheetsService()
+        self.service.sheet = FakeSheet([row('Ana', 'ana@example.com', '5550001111')])
+
+    def test_unknown_candidate_is_appended_without_reading_the_sheet(self):
+        self.service._write_rows([row('Ana', 'ana@example.com', '5550001111')])
+        self.service._write_rows([row('Bo', 'bo@example.com', '5550002222')])
+
+        self.assertEqual(self.service.sheet.full_reads, 1)
+        self.assertEqual([r[0] for r in self.service.sheet.rows[1:]], ['Ana', 'Bo'])
+
+    def test_moved_row_reloads_the_index_instead_of_overwriting(self):
+        self.service._write_rows([row('Ana', 'ana@example.com', '5550001111')])
+        # Someone inserts a row above Ana by hand
+        self.service.sheet.rows.insert(1, row('Cy', 'cy@example.com', '5550003333'))
+
+        self.service._write_rows([row('Ana Lima', 'ana@example.com', '')])
+
+        names = [r[0] for r in self.service.sheet.rows[1:]]
+        self.assertEqual(names, ['Cy', 'Ana Lima'])
+        self.assertEqual(self.service.sheet.full_reads, 2)
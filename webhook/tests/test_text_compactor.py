@@ -0,0 +1,34 @@
+from django.test import SimpleTestCase
+
+from webhook.services.text_compactor import compact_cv_text
+
+FIELDS = ('name', 'email', 'phone', 'linkedin', 'skills')
+
+
+class CompactCVTextTests(SimpleTestCase):
+    def test_keeps_unlabeled_phone_and_year_lines(self):
+        text = (
+            'Priya Sharma\nBengaluru\n9876543210\npriya@example.com\n\n'
+            'Experience\nAcme Corp\n2019\n2021\nGlobex\n2021\n2023\nGlobex\n2023\n2024'
+        )
+        compacted = compact_cv_text(text, FIELDS, 2000)
+        for line in ('9876543210', '2019', '2021', '2023', '2024'):
+            self.assertIn(line, compacted.split('\n'))
+
+    def test_keeps_repeated_headings_under_budget(self):
+        text = '\n'.join(f'Job {index}\nResponsibilities:\nShipped things' for index in range(4))
+        self.assertEqual(compact_cv_text(text, FIELDS, 2000).count('Responsibilities:'), 4)
+
+    def test_drops_explicit_page_markers(self):
+        text = 'Priya Sharma\nPage 1 of 2\nExperience\nAcme Corp\n2 / 2\nSkills\nPython'
+        lines = compact_cv_text(text, FIELDS, 2000).split('\n')
+        self.assertNotIn('Page 1 of 2', lines)
+        self.assertNotIn('2 / 2', lines)
+        self.assertIn('Acme Corp', lines)
+
+    def test_keeps_contact_lines_when_trimming(self):
+        filler = '\n'.join(f'Led project {index} with a long description of the work' for index in range(200))
+        text = f'Priya Sharma\n\nHobbies\n{filler}\n+91 98765 43210\n\nSkills\nPython'
+        compacted = compact_cv_text(text, FIELDS, 300)
+        self.assertIn('+91 98765 43210', compacted)
+        self.assertIn('Python', compacted)
@@ -0,0 +1,55 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from webhook.services import token_cache
+from webhook.services.pdf_engines import AdobeEngine
+from webhook.services.token_cache import TokenCache
+
+
+class TokenCacheRefreshTests(SimpleTestCase):
+    def setUp(self):
+        # Run timers by hand instead of waiting for them
+        patcher = mock.patch.object(token_cache.threading, 'Timer')
+        self.timer = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unused_token_is_not_refreshed(self):
+        fetch = mock.Mock(return_value=('token', 3600))
+        cache = TokenCache(fetch)
+        cache.get()
+
+        cache._refresh()
+
+        self.assertEqual(fetch.call_count, 1)
+        self.assertFalse(cache.get_stats()['refresh_scheduled'])
+
+    def test_stops_after_repeated_failures(self):
+        fetch = mock.Mock(return_value=('token', 36000))
+        cache = TokenCache(fetch)
+        cache.get()
+        fetch.side_effect = RuntimeError('IMS down')
+
+        for _ in range(token_cache.MAX_REFRESH_FAILURES):
+            cache.get()
+            cache._refresh()
+
+        self.assertEqual(fetch.call_count, 1 + token_cache.MAX_REFRESH_FAILURES)
+        self.assertFalse(cache.get_stats()['refresh_scheduled'])
+        self.assertEqual(cache.get(), 'token')
+
+    def test_stop_cancels_the_timer(self):
+        cache = TokenCache(mock.Mock(return_value=('token', 3600)))
+        cache.get()
+        self.assertTrue(cache.get_stats()['refresh_scheduled'])
+
+        cache.stop()
+
+        self.timer.return_value.cancel.assert_called_once()
+        self.assertFalse(cache.get_stats()['refresh_scheduled'])
+
+    @override_settings(PDF_ENGINES=['pypdf2'], ADOBE_CLIENT_ID='id', ADOBE_CLIENT_SECRET='secret')
+    def test_adobe_refresh_only_when_engine_enabled(self):
+        self.assertFalse(AdobeEngine().tokens.background_refresh)
+        with self.settings(PDF_ENGINES=['adobe', 'pypdf2']):
+            self.assertTrue(AdobeEngine().tokens.background_refresh)
@@ -1,7 +1,16 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.WEBHOOK_ASYNC:
+    from . import async_views
+    webhook_view = async_views.whatsapp_webhook
+else:
+    webhook_view = views.whatsapp_webhook
+
 urlpatterns = [
-    path('whatsapp/', views.whatsapp_webhook, name='whatsapp_webhook'),
+    path('whatsapp/', webhook_view, name='whatsapp_webhook'),
     path('health/', views.health_check, name='health_check'),
+    path('ready/', views.readiness_check, name='readiness_check'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
@@ -4,13 +4,25 @@ Handles incoming messages and files from WhatsApp Business API
 """
 import json
 import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
-from .services.whatsapp_service import WhatsAppService
+from .services.whatsapp_service import WhatsAppService, MEDIA_TOO_LARGE
 from .services.pdf_service import PDFService
 from .services.gemini_service import GeminiService
 from .services.sheets_service import SheetsService
+from .services.job_queue import JobQueue
+from .services.job_store import JobStore
+from .services.dedup_service import MessageDeduplicator
+from .services.document_store import DocumentStore
+from .services.rate_limiter import QuotaExceeded
+from .services.http_client import get_http_client
+from .services.process_pool import TaskFailed
+from .services.media_spool import get_media_spool
+from .services.coalescer import create_coalescer, COALESCED_TYPE
 
 logger = logging.getLogger(__name__)
 
@@ -18,13 +30,109 @@ whatsapp_service = WhatsAppService()
 pdf_service = PDFService()
 gemini_service = GeminiService()
 sheets_service = SheetsService()
+message_deduplicator = MessageDeduplicator(
+    settings.DEDUP_DB_PATH,
+    ttl_seconds=settings.DEDUP_TTL_SECONDS,
+    max_memory_entries=settings.DEDUP_MEMORY_ENTRIES
+)
+document_store = DocumentStore(
+    settings.DOCUMENT_STORE_DB_PATH,
+    max_entries=settings.DOCUMENT_STORE_MAX_ENTRIES,
+    max_bytes=settings.DOCUMENT_STORE_MAX_BYTES
+) if settings.DOCUMENT_STORE_ENABLED else None
+
+# Bounded pool used to fan out batches in synchronous mode
+batch_executor = ThreadPoolExecutor(
+    max_workers=settings.WEBHOOK_BATCH_CONCURRENCY,
+    thread_name_prefix='cv-batch'
+)
+
+# Ordered stages of the CV pipeline, persisted per job by the durable queue
+PIPELINE_STAGES = ['received', 'extracted', 'parsed', 'stored', 'confirmed']
+
+PDF_TOO_COMPLEX_MESSAGE = (
+    "❌ Sorry, your PDF is too large or complex to read. "
+    "Please send a smaller or simpler file."
+)
+
+FILE_TOO_LARGE_MESSAGE = (
+    "❌ Sorry, your file is too large. "
+    f"Please send a PDF under {settings.WHATSAPP_MEDIA_MAX_BYTES / (1024 * 1024):.3g} MB."
+)
 
 
 def health_check(request):
-    """Simple health check endpoint for Render"""
+    """Simple health check endpoint for Render (liveness)"""
     return JsonResponse({'status': 'ok'})
 
 
+def readiness_check(request):
+    """Report whether external services finished initializing"""
+    services = {
+        'gemini': 'ready' if gemini_service.is_ready() else 'pending',
+        'sheets': sheets_service.status,
+    }
+    ready = all(status == 'ready' for status in services.values())
+    return JsonResponse(
+        {'status': 'ready' if ready else 'starting', 'services': services},
+        status=200 if ready else 503
+    )
+
+
+def _initialize_services():
+    """Warm up external clients off the request path"""
+    gemini_service.warm_up()
+    sheets_service.initialize()
+
+
+def start_background_services():
+    """
+    Start this process's background threads (WebhookConfig.ready calls this in
+    server processes; management commands start what they need themselves)
+    """
+    # Connect to Google in the background so worker boot never waits on it
+    if settings.SERVICES_BACKGROUND_INIT:
+        threading.Thread(target=_initialize_services, name='service-init', daemon=True).start()
+
+    # Resume unfinished jobs and coalescing windows as soon as the server
+    # starts (the async webhook always queues, on its own runner)
+    if settings.WEBHOOK_WORKER_MODE == 'thread':
+        if settings.WEBHOOK_ASYNC:
+            from . import async_views
+            async_views.runner.start()
+        elif settings.WEBHOOK_BACKGROUND_PROCESSING or coalescer:
+            job_queue.start()
+
+    # Send messages left in the outbound queue by a previous process
+    if whatsapp_service.outbound and whatsapp_service.outbound.pending():
+        whatsapp_service.outbound.start()
+
+
+def metrics(request):
+    """Expose background processing statistics"""
+    async_stats = None
+    if settings.WEBHOOK_ASYNC:
+        from . import async_views
+        async_stats = async_views.get_stats()
+
+    return JsonResponse({
+        'background_processing': settings.WEBHOOK_BACKGROUND_PROCESSING,
+        'worker_mode': settings.WEBHOOK_WORKER_MODE,
+        'async': async_stats,
+        'job_queue': job_queue.get_stats(),
+        'dedup': message_deduplicator.get_stats(),
+        'coalescer': coalescer.get_stats() if coalescer else None,
+        'gemini': gemini_service.get_stats(),
+        'sheets': sheets_service.get_stats(),
+        'http': get_http_client().get_stats(),
+        'media': whatsapp_service.get_stats(),
+        'outbound': whatsapp_service.outbound.get_stats() if whatsapp_service.outbound else None,
+        'spool': get_media_spool().get_stats(),
+        'pdf': pdf_service.get_stats(),
+        'documents': document_store.get_stats() if document_store else None,
+    })
+
+
 @csrf_exempt
 def whatsapp_webhook(request):
     """
@@ -64,24 +172,39 @@ def handle_incoming_message(request):
         body = json.loads(request.body.decode('utf-8'))
         logger.info(f'Received webhook: {json.dumps(body, indent=2)}')
         
-        # Extract message data
-        entry = body.get('entry', [])
-        if not entry:
-            return JsonResponse({'status': 'no_entry'})
+        batch, status = extract_batch(body)
+        if not batch:
+            return JsonResponse({'status': status})
         
-        changes = entry[0].get('changes', [])
-        if not changes:
-            return JsonResponse({'status': 'no_changes'})
+        # Skip redeliveries of messages we already accepted
+        batch = [
+            (message, value) for message, value in batch
+            if not message_deduplicator.is_duplicate(message.get('id'))
+        ]
         
-        value = changes[0].get('value', {})
-        messages = value.get('messages', [])
+        if not batch:
+            logger.info('Ignoring duplicate webhook delivery')
+            return JsonResponse({'status': 'duplicate'})
         
-        if not messages:
-            return JsonResponse({'status': 'no_messages'})
+        # Persist messages for the worker pool and acknowledge immediately
+        # (text/PDF fragments wait there until the sender goes quiet)
+        if settings.WEBHOOK_BACKGROUND_PROCESSING or coalescer:
+            for index, (message, value) in enumerate(batch):
+                try:
+                    queued = job_queue.enqueue(message, value)
+                except Exception:
+                    forget_messages(batch[index:])
+                    raise
+                if not queued:
+                    # Meta redelivers after a 503; let the unqueued messages through again
+                    forget_messages(batch[index:])
+                    return JsonResponse({'status': 'queue_full'}, status=503)
+            
+            if settings.WEBHOOK_WORKER_MODE == 'thread':
+                job_queue.start()
+            return JsonResponse({'status': 'queued'})
         
-        # Process each message
-        for message in messages:
-            process_message(message, value)
+        process_batch(batch)
         
         return JsonResponse({'status': 'success'})
         
@@ -90,76 +213,393 @@ def handle_incoming_message(request):
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
 
+def extract_batch(body):
+    """
+    Collect (message, value) pairs from every entry and change of a webhook body
+    
+    Returns:
+        tuple: (batch, status) where status explains an empty batch
+    """
+    entries = body.get('entry', [])
+    if not entries:
+        return [], 'no_entry'
+    
+    changes = [change for entry in entries for change in entry.get('changes', [])]
+    if not changes:
+        return [], 'no_changes'
+    
+    batch = [
+        (message, change.get('value', {}))
+        for change in changes
+        for message in change.get('value', {}).get('messages', [])
+    ]
+    return batch, 'no_messages'
+
+
+def forget_messages(batch):
+    """Unmark messages that were deduplicated but not accepted"""
+    for message, _ in batch:
+        message_deduplicator.forget(message.get('id'))
+
+
+def process_batch(batch):
+    """
+    Process a webhook batch concurrently, one task per sender
+    
+    Messages from the same sender run in order inside their task so a
+    candidate's fragments are never reordered.
+    
+    Args:
+        batch: List of (message, value) tuples in delivery order
+    """
+    by_sender = OrderedDict()
+    for message, value in batch:
+        by_sender.setdefault(message.get('from'), []).append((message, value))
+    
+    if len(by_sender) == 1:
+        _process_sender_messages(batch)
+        return
+    
+    futures = [
+        batch_executor.submit(_process_sender_messages, items)
+        for items in by_sender.values()
+    ]
+    for future in futures:
+        future.result()
+
+
+def _process_sender_messages(items):
+    """Process one sender's messages sequentially"""
+    for message, value in items:
+        process_message(message, value)
+
+
 def process_message(message, value):
     """
     Process individual WhatsApp message
     """
+    state = {}
+    try:
+        run_pipeline(message, value, state)
+    except QuotaExceeded as e:
+        # Out of Gemini quota: hand the message to the job queue for later
+        _defer_message(message, value, state, e.retry_after, e)
+    except Exception as e:
+        # A stage failed (Gemini timeout, Sheets or WhatsApp error); nothing
+        # retries synchronous runs, so the job queue resumes the message with
+        # its usual backoff and dead-letters it after JOB_MAX_ATTEMPTS
+        logger.error(f'Error processing message: {str(e)}', exc_info=True)
+        _defer_message(message, value, state, settings.JOB_RETRY_BASE_DELAY, e)
+
+
+def _defer_message(message, value, state, delay, error):
+    """Resume a synchronously processed message from the job queue after its last completed stage"""
+    logger.warning(f'Deferring message from {message.get("from")}: {str(error)}')
+    try:
+        job_queue.defer(message, value, state, delay)
+    except Exception as e:
+        logger.error(f'Error deferring message: {str(e)}', exc_info=True)
+        return
+    if settings.WEBHOOK_WORKER_MODE == 'thread':
+        job_queue.start()
+
+
+def confirmation_message(cv_data):
+    """Reply sent to the candidate once their CV was processed (or failed)"""
+    if cv_data:
+        return (
+            f"✅ Thank you! Your CV has been received and processed.\n\n"
+            f"Name: {cv_data.get('name', 'N/A')}\n"
+            f"Email: {cv_data.get('email', 'N/A')}\n"
+            f"Phone: {cv_data.get('phone', 'N/A')}"
+        )
+    return "❌ Sorry, we couldn't process your CV. Please try again or send a different format."
+
+
+def _reached(state, stage):
+    """Check whether the pipeline already completed the given stage"""
+    return PIPELINE_STAGES.index(state.get('stage', 'received')) >= PIPELINE_STAGES.index(stage)
+
+
+class PipelineIO:
+    """
+    I/O used by the pipeline stages, blocking variant
+    
+    The stages (run_stages) are written once as coroutines and do all I/O
+    through this interface. Worker threads use this class, whose calls
+    block and never suspend, so run_pipeline drives the stages without an
+    event loop; the ASGI runner passes async_views.AsyncPipelineIO instead.
+    """
+    
+    async def call(self, fn, *args, **kwargs):
+        """Blocking library call (SQLite, gspread)"""
+        return fn(*args, **kwargs)
+    
+    async def cpu(self, fn, *args, **kwargs):
+        """CPU-bound call (PDF parsing)"""
+        return fn(*args, **kwargs)
+    
+    async def get_media_info(self, media_id):
+        return whatsapp_service.get_media_info(media_id)
+    
+    async def download_media(self, media_id, media_info):
+        return whatsapp_service.download_media(media_id, media_info)
+    
+    async def extract_cv_data(self, cv_text):
+        return gemini_service.extract_cv_data(cv_text)
+    
+    async def send(self, to_number, message):
+        # Queued durably; the outbound queue handles rate limits and retries
+        return whatsapp_service.queue_message(to_number, message)
+
+
+def _run_sync(coroutine):
+    """Run a coroutine whose awaits never suspend (the stages with PipelineIO)"""
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coroutine.close()
+    raise RuntimeError('Pipeline stage suspended while running with blocking I/O')
+
+
+async def _advance(state, stage, checkpoint, io):
+    """Record a completed stage and persist it when running from the job queue"""
+    state['stage'] = stage
+    if checkpoint:
+        await io.call(checkpoint, state)
+
+
+async def _give_up(state, from_number, reply, checkpoint, io):
+    """Tell the sender why their document cannot be processed and finish the message"""
+    await io.send(from_number, reply)
+    await _advance(state, 'confirmed', checkpoint, io)
+
+
+async def _use_known_document(state, digest, downloaded, from_number, checkpoint, io):
+    """
+    Reuse the text (and extraction result) of a previously processed PDF
+    
+    Returns:
+        bool: Whether the document was known and the state was advanced
+    """
+    if not document_store:
+        return False
+    known = await io.call(document_store.get, digest, gemini_service.result_version(), downloaded=downloaded)
+    if known is None:
+        return False
+    
+    state['digest'] = digest
+    state['cv_text'] = known['cv_text']
+    await _advance(state, 'extracted', checkpoint, io)
+    if known['cv_data'] is not None:
+        state['cv_data'] = dict(known['cv_data'], whatsapp_number=from_number)
+        await _advance(state, 'parsed', checkpoint, io)
+    return True
+
+
+async def _part_text(message, io):
+    """
+    Text of one part of a coalesced message, downloading and parsing PDFs
+    
+    Returns:
+        str: Part text, or None for unsupported or unreadable documents
+    """
+    if message.get('type') == 'text':
+        return message.get('text', {}).get('body', '')
+    
+    document = message.get('document', {})
+    if 'pdf' not in document.get('mime_type', '').lower():
+        logger.warning(f'Unsupported document type: {document.get("mime_type")}')
+        return None
+    
+    media_id = document.get('id')
+    media_info = await io.get_media_info(media_id)
+    if media_info is None:
+        raise RuntimeError('Failed to get PDF media info')
+    
+    # Only the stored text is reused; the combined CV gets its own extraction
+    if document_store:
+        known = await io.call(document_store.get, media_info.get('sha256'), None, downloaded=False)
+        if known:
+            return known['cv_text']
+    
+    media = await io.download_media(media_id, media_info)
+    if media is None:
+        raise RuntimeError('Failed to download PDF file')
+    if media == MEDIA_TOO_LARGE:
+        logger.warning(f'Skipping media {media_id}: over the size limit')
+        return None
+    
     try:
-        message_type = message.get('type')
-        from_number = message.get('from')
+        if document_store:
+            known = await io.call(document_store.get, media.sha256, None)
+            if known:
+                return known['cv_text']
         
+        try:
+            cv_text = await io.cpu(pdf_service.extract_text, media.file)
+        except TaskFailed as e:
+            logger.warning(f'Skipping media {media_id}: {str(e)}')
+            return None
+        if cv_text is None:
+            raise RuntimeError(f'Failed to extract text from media {media_id}')
+        if document_store and cv_text:
+            await io.call(document_store.put_text, media.sha256, cv_text, media.size)
+        return cv_text
+    finally:
+        media.file.close()
+
+
+def run_pipeline(message, value, state=None, checkpoint=None):
+    """
+    Run the CV pipeline for a message, resuming after the last completed stage
+    
+    Args:
+        message: WhatsApp message dict
+        value: Webhook change value the message belongs to
+        state: Stage results from a previous attempt (digest, cv_text, cv_data)
+        checkpoint: Optional callable invoked with the state after each stage
+        
+    Raises:
+        RuntimeError: When a stage fails and the message should be retried
+    """
+    return _run_sync(run_stages(message, state, checkpoint, PipelineIO()))
+
+
+async def run_stages(message, state, checkpoint, io):
+    """
+    The CV pipeline stages, shared by the sync and async execution paths
+    
+    Args:
+        message: WhatsApp message dict
+        state: Stage results from a previous attempt, updated in place
+        checkpoint: Optional callable invoked with the state after each stage
+        io: PipelineIO implementation the stages do their I/O through
+    """
+    state = state if state is not None else {}
+    message_type = message.get('type')
+    from_number = message.get('from')
+    
+    if state.get('stage'):
+        logger.info(f'Resuming message from {from_number} after stage: {state["stage"]}')
+    else:
         logger.info(f'Processing message type: {message_type} from {from_number}')
+    
+    # Handle text messages
+    if message_type == 'text':
+        if not _reached(state, 'extracted'):
+            state['cv_text'] = message.get('text', {}).get('body', '')
+            logger.info(f'Received text message: {state["cv_text"][:100]}...')
+            await _advance(state, 'extracted', checkpoint, io)
+    
+    # Handle fragments combined by the coalescer
+    elif message_type == COALESCED_TYPE:
+        if not _reached(state, 'extracted'):
+            parts = message.get('parts', [])
+            logger.info(f'Received {len(parts)} coalesced messages')
+            texts = [await _part_text(part, io) for part in parts]
+            state['cv_text'] = '\n\n'.join(text for text in texts if text)
+            await _advance(state, 'extracted', checkpoint, io)
+    
+    # Handle document (PDF) messages
+    elif message_type == 'document':
+        mime_type = message.get('document', {}).get('mime_type', '')
         
-        cv_text = None
+        if 'pdf' not in mime_type.lower():
+            logger.warning(f'Unsupported document type: {mime_type}')
+            return
         
-        # Handle text messages
-        if message_type == 'text':
-            cv_text = message.get('text', {}).get('body', '')
-            logger.info(f'Received text message: {cv_text[:100]}...')
+        media_id = message.get('document', {}).get('id')
         
-        # Handle document (PDF) messages
-        elif message_type == 'document':
-            mime_type = message.get('document', {}).get('mime_type', '')
+        if not _reached(state, 'extracted'):
+            logger.info(f'Received PDF document: {media_id}')
+            media_info = await io.get_media_info(media_id)
+            if media_info is None:
+                raise RuntimeError('Failed to get PDF media info')
             
-            if 'pdf' in mime_type.lower():
-                media_id = message.get('document', {}).get('id')
-                logger.info(f'Received PDF document: {media_id}')
-                
-                # Download the file
-                file_path = whatsapp_service.download_media(media_id)
-                
-                if file_path:
-                    # Extract text from PDF
-                    cv_text = pdf_service.extract_text(file_path)
-                    logger.info(f'Extracted text from PDF: {len(cv_text)} characters')
-                else:
-                    logger.error('Failed to download PDF file')
-                    return
+            # A copy of a document seen before skips the download (the Graph
+            # API declares the file's SHA-256)
+            if await _use_known_document(state, media_info.get('sha256'), False, from_number, checkpoint, io):
+                logger.info(f'Media {media_id} matches a known document, skipping download')
             else:
-                logger.warning(f'Unsupported document type: {mime_type}')
-                return
-        
-        else:
-            logger.warning(f'Unsupported message type: {message_type}')
-            return
-        
-        # Extract structured data using Gemini
-        if cv_text:
-            cv_data = gemini_service.extract_cv_data(cv_text)
-            
-            if cv_data:
-                # Add WhatsApp number and timestamp
-                cv_data['whatsapp_number'] = from_number
-                
-                # Save to Google Sheets
-                sheets_service.append_cv_data(cv_data)
-                
-                logger.info(f'CV data saved successfully for {from_number}')
+                # Stream the file into memory (spilling to disk only if large)
+                media = await io.download_media(media_id, media_info)
+                if media is None:
+                    raise RuntimeError('Failed to download PDF file')
+                if media == MEDIA_TOO_LARGE:
+                    # Retrying will not make the file smaller
+                    await _give_up(state, from_number, FILE_TOO_LARGE_MESSAGE, checkpoint, io)
+                    return
                 
-                # Send confirmation message
-                whatsapp_service.send_message(
-                    from_number,
-                    f"✅ Thank you! Your CV has been received and processed.\n\n"
-                    f"Name: {cv_data.get('name', 'N/A')}\n"
-                    f"Email: {cv_data.get('email', 'N/A')}\n"
-                    f"Phone: {cv_data.get('phone', 'N/A')}"
-                )
-            else:
-                logger.error('Failed to extract CV data')
-                whatsapp_service.send_message(
-                    from_number,
-                    "❌ Sorry, we couldn't process your CV. Please try again or send a different format."
+                try:
+                    if not await _use_known_document(state, media.sha256, True, from_number, checkpoint, io):
+                        # Extract text from PDF
+                        try:
+                            cv_text = await io.cpu(pdf_service.extract_text, media.file)
+                        except TaskFailed as e:
+                            # Too slow or too large to parse; retrying will not help
+                            logger.warning(f'Giving up on media {media_id}: {str(e)}')
+                            await _give_up(state, from_number, PDF_TOO_COMPLEX_MESSAGE, checkpoint, io)
+                            return
+                        if cv_text is None:
+                            raise RuntimeError(f'Failed to extract text from media {media_id}')
+                        logger.info(f'Extracted text from PDF: {len(cv_text)} characters')
+                        if document_store and cv_text:
+                            await io.call(document_store.put_text, media.sha256, cv_text, media.size)
+                        state['digest'] = media.sha256
+                        state['cv_text'] = cv_text
+                        await _advance(state, 'extracted', checkpoint, io)
+                finally:
+                    media.file.close()
+    
+    else:
+        logger.warning(f'Unsupported message type: {message_type}')
+        return
+    
+    if not state.get('cv_text'):
+        return
+    
+    # Extract structured data using Gemini
+    if not _reached(state, 'parsed'):
+        cv_data = await io.extract_cv_data(state['cv_text'])
+        if cv_data:
+            if document_store and state.get('digest'):
+                await io.call(
+                    document_store.put_result, state['digest'], cv_data, gemini_service.result_version()
                 )
-        
-    except Exception as e:
-        logger.error(f'Error processing message: {str(e)}', exc_info=True)
+            # Add WhatsApp number and timestamp
+            cv_data['whatsapp_number'] = from_number
+        state['cv_data'] = cv_data
+        await _advance(state, 'parsed', checkpoint, io)
+    
+    cv_data = state.get('cv_data')
+    
+    # Save to Google Sheets
+    if not _reached(state, 'stored'):
+        if cv_data:
+            if not await io.call(sheets_service.append_cv_data, cv_data):
+                raise RuntimeError('Failed to save CV data to Google Sheets')
+            logger.info(f'CV data saved successfully for {from_number}')
+        await _advance(state, 'stored', checkpoint, io)
+    
+    # Send confirmation message
+    if not _reached(state, 'confirmed'):
+        if not cv_data:
+            logger.error('Failed to extract CV data')
+        if not await io.send(from_number, confirmation_message(cv_data)):
+            raise RuntimeError(f'Failed to queue confirmation to {from_number}')
+        await _advance(state, 'confirmed', checkpoint, io)
+
+
+# Per-sender aggregation of CV fragments in the job store (None when disabled)
+coalescer = create_coalescer()
+
+job_queue = JobQueue(
+    run_pipeline,
+    JobStore(settings.JOB_QUEUE_DB_PATH, lease_seconds=settings.JOB_LEASE_SECONDS, coalescer=coalescer),
+    worker_count=settings.WEBHOOK_WORKER_COUNT,
+    max_size=settings.WEBHOOK_QUEUE_MAX_SIZE,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+    retry_base_delay=settings.JOB_RETRY_BASE_DELAY
+)